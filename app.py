@@ -1,40 +1,49 @@
+import contextlib
+import os
+
 import gradio as gr
-from utils import driver, driver_resource
+
+import config
+import metrics
+from utils import adriver_expand, adriver_resource, adriver_stream, awarmup, driver_load
 
 # -----------------------------
 # Callback for initial suggestion
 # -----------------------------
-def on_submit(age, background, interest):
-    # Get LLM-generated study plan, reason, and resources
-    diagram, reason, outcome = driver(age, background, interest)
-
-    return (
-        gr.update(value=diagram, visible=True),      # studyflow_diagram
-        gr.update(value=reason, visible=True),       # topic_reason
-        gr.update(value=outcome, visible=True),      # topic_outcome
-        gr.update(visible=False),                    # hide submit
-        gr.update(visible=True),                     # show feedback section
-        gr.update(visible=True),                     # show revised submission button
-        gr.update(visible=True),                     # show original section
-        gr.update(visible=False),                    # hide revised section
-        gr.update(visible=True),                     # show resource button
-    )
+async def on_submit(age, background, interest, plan_state):
+    # Stream the LLM-generated study plan, reason, and resources as they arrive
+    async for diagram, reason, outcome, new_plan_state in adriver_stream(age, background, interest):
+        yield (
+            gr.update(value=diagram, visible=True),      # studyflow_diagram
+            gr.update(value=reason, visible=True),       # topic_reason
+            gr.update(value=outcome, visible=True),      # topic_outcome
+            gr.update(visible=False),                    # hide submit
+            gr.update(visible=True),                     # show feedback section
+            gr.update(visible=True),                     # show revised submission button
+            gr.update(visible=True),                     # show original section
+            gr.update(visible=False),                    # hide revised section
+            gr.update(visible=True),                     # show resource button
+            new_plan_state or plan_state,                # keep last plan on clarify/error
+        )
 
 # -----------------------------
 # Callback for revised suggestion based on feedback
 # -----------------------------
-def on_feedback(age, background, interest, userFeedback):
+async def on_feedback(age, background, interest, userFeedback, plan_state):
     # Optionally send feedback to model
-    diagram, reason, outcome = driver(age, background, interest, userFeedback)
-
-    return (
-        gr.update(value=diagram, visible=True),      # revisedStudyflow_diagram
-        gr.update(value=reason, visible=True),       # revisedTopic_reason
-        gr.update(value=outcome, visible=True),      # revisedTopic_outcome
-        gr.update(visible=False),                    # hide submitWithFeedback
-        gr.update(visible=False),                    # hide original section
-        gr.update(visible=True),                     # show revised section
-    )
+    # Passing the current plan lets the driver drop its now-stale grasp-check prefetch
+    async for diagram, reason, outcome, new_plan_state in adriver_stream(
+        age, background, interest, userFeedback, previous_plan_state=plan_state
+    ):
+        yield (
+            gr.update(value=diagram, visible=True),      # revisedStudyflow_diagram
+            gr.update(value=reason, visible=True),       # revisedTopic_reason
+            gr.update(value=outcome, visible=True),      # revisedTopic_outcome
+            gr.update(visible=False),                    # hide submitWithFeedback
+            gr.update(visible=False),                    # hide original section
+            gr.update(visible=True),                     # show revised section
+            new_plan_state or plan_state,                # resources follow the revised plan
+        )
 
 # -----------------------------
 # Helpers for dummy resource button
@@ -42,12 +51,12 @@ def on_feedback(age, background, interest, userFeedback):
 # def getResouces():
 #     return "Here are some resources to help you get started with your learning path."
 
-def getResouces():
-    resources, questions = driver_resource()
+async def getResouces(plan_state):
+    resources, questions = await adriver_resource(plan_state)
     return resources, questions
 
-def on_Resource():
-    resources, questions = driver_resource()
+async def on_Resource(plan_state):
+    resources, questions = await adriver_resource(plan_state)
     return (
         resources,
         questions,
@@ -56,118 +65,271 @@ def on_Resource():
         gr.update(visible=False),   # Hide feedback button
     )
 
+# -----------------------------
+# Callbacks for expanding a single topic of the plan
+# -----------------------------
+def on_plan_change(plan_state, selected_topic):
+    # Offer the topics of whichever plan is current, and a link back to it
+    if not plan_state:
+        return gr.update(), gr.update(), gr.update()
+    topics = list(plan_state["study_workflow"])
+    return (
+        gr.update(choices=topics, value=selected_topic if selected_topic in topics else None),
+        gr.update(visible=True),                         # show expand section
+        gr.update(value=f"🔗 [Link to this plan](?plan={plan_state['plan_id']})", visible=True),
+    )
+
+async def on_expand(topic, age, plan_state):
+    diagram, details, new_plan_state = await adriver_expand(topic, age, plan_state)
+    # Only one of the two diagrams is on screen; both follow the current plan
+    diagram_update = gr.update() if diagram is None else gr.update(value=diagram)
+    return diagram_update, diagram_update, details, new_plan_state
+
+# -----------------------------
+# Callback for reopening a stored plan from a ?plan=<id> link
+# -----------------------------
+def on_load(request: gr.Request):
+    plan_id = request.query_params.get("plan") if request else None
+    loaded = driver_load(plan_id)
+    if loaded is None:
+        if plan_id:
+            gr.Warning("That plan link has expired or doesn't exist. Please generate a new plan.")
+        return [gr.update()] * 13
+    diagram, reason, outcome, plan_state, resources, questions = loaded
+    return (
+        gr.update(value=diagram, visible=True),          # studyflow_diagram
+        gr.update(value=reason, visible=True),           # topic_reason
+        gr.update(value=outcome, visible=True),          # topic_outcome
+        gr.update(visible=False),                        # hide submit
+        gr.update(visible=True),                         # show feedback section
+        gr.update(visible=True),                         # show revised submission button
+        gr.update(visible=True),                         # show original section
+        gr.update(visible=False),                        # hide revised section
+        gr.update(visible=questions is None),            # resource button, unless the questions are stored
+        gr.update(visible=questions is not None),        # resource section
+        resources or "",                                 # learningResource
+        questions or "",                                 # graspCheck
+        plan_state,
+    )
+
 # -----------------------------
 # UI with Gradio Blocks
 # -----------------------------
-with gr.Blocks(css="""
-    #scrollable-md {
-        max-height: 350px;
-        border: 1px solid #999;
-        overflow-y: auto;
-    }
-    #original_section{
-        background-color: transparent !important;           
-    }
+def build_demo():
+    """ The LearnFlow UI, queued; nothing is served until it is launched or mounted. """
+    with gr.Blocks(css="""
+        #scrollable-md {
+            max-height: 350px;
+            border: 1px solid #999;
+            overflow-y: auto;
+        }
+        #original_section{
+            background-color: transparent !important;           
+        }
                
-""") as demo:
-    gr.Markdown("# 📚 LearnFlow")
-    gr.Markdown("""🔹 **🗺️ Personalized Study Workflow**  🔹 **🧠 Meaningful Reasoning & Outcomes**  🔹 **📘 Beginner-Friendly Resources**  🔹 **❓ Grasp Check Questions** """)
-
-    with gr.Row():
-        with gr.Column(scale=1):
-            with gr.Group(elem_id="input-section", visible=True):
-                age = gr.Number(label="👶 Your Age", value=18)
-                background = gr.Textbox(label="🎓 Your Educational Background")
-                interest = gr.Textbox(label="💡 Your Interests")
-
-            submit = gr.Button("🚀 Suggest What to Learn", visible=True, elem_classes="gr-button")
-
-            with gr.Group(elem_id="feedback-section", visible=False) as feedback_section:
-                userFeedback = gr.Textbox(label="ℹ️ Help us know what you’re looking for")
-                submitWithFeeback = gr.Button("🔂 Update the flow with feedback", elem_classes="gr-button")
-
-            resource_button = gr.Button("📘 Click to get Resource", visible=False, elem_classes="gr-button")
-
-        with gr.Column(scale=2):
-            # REVISED Section (initially hidden)
-            with gr.Group(visible=False) as revised_section:
-                gr.Markdown("### 🔄 Revised Recommendation")
-                with gr.Row():
-                    revisedStudyflow_diagram = gr.Markdown(
-                        value="<p>No recommendation yet.</p>",
-                        label="🔗 The flow you are looking for",
-                        elem_id="scrollable-md",
-                        visible=False
-                    )
-                    with gr.Column():
-                        revisedTopic_reason = gr.Textbox(label="🧐 Why this topic", lines=5, max_lines=5, visible=False)
-                        revisedTopic_outcome = gr.Textbox(label="💪 Outcome of this topic", lines=5, max_lines=5, visible=False)
-
-            # ORIGINAL Section (initially visible)
-            with gr.Group(visible=True) as original_section:
-                gr.Markdown("### 🔎 Recommendation")
-                with gr.Row():
-                    studyflow_diagram = gr.Markdown(
-                        value="<p>No recommendation yet.</p>",
-                        label="🔗 The flow you are looking for",
-                        elem_id="scrollable-md",
-                        visible=False
-                    )
-                    with gr.Column():
-                        topic_reason = gr.Textbox(label="🧐 Why this topic", lines=5, max_lines=5, visible=False)
-                        topic_outcome = gr.Textbox(label="💪 Outcome of this topic", lines=5, max_lines=5, visible=False)
-
-            # RESOURCES Section (initially hidden)
-            with gr.Group(elem_id="resource-section", visible=False) as resource_section:
-                gr.Markdown("### 📘 Learning Resources")
-                learningResource = gr.Textbox(label="Resources to help you get started")
-                graspCheck = gr.Textbox(label="Grasp Check Questions")
-
-    # ----------- Events ------------
-
-    submit.click(
-        fn=on_submit,
-        inputs=[age, background, interest],
-        outputs=[
-            studyflow_diagram,
-            topic_reason,
-            topic_outcome,
-            submit,
-            feedback_section,
-            submitWithFeeback,
-            original_section,
-            revised_section,
-            resource_button,
-        ],
-        queue=True
-    )
+    """) as demo:
+        # Per-session plan (reason, outcome, resources) used by the resource button
+        plan_state = gr.State(None)
+
+        gr.Markdown("# 📚 LearnFlow")
+        gr.Markdown("""🔹 **🗺️ Personalized Study Workflow**  🔹 **🧠 Meaningful Reasoning & Outcomes**  🔹 **📘 Beginner-Friendly Resources**  🔹 **❓ Grasp Check Questions** """)
+
+        with gr.Row():
+            with gr.Column(scale=1):
+                with gr.Group(elem_id="input-section", visible=True):
+                    age = gr.Number(label="👶 Your Age", value=18)
+                    background = gr.Textbox(label="🎓 Your Educational Background")
+                    interest = gr.Textbox(label="💡 Your Interests")
+
+                submit = gr.Button("🚀 Suggest What to Learn", visible=True, elem_classes="gr-button")
 
-    submitWithFeeback.click(
-        fn=on_feedback,
-        inputs=[age, background, interest, userFeedback],
-        outputs=[
-            revisedStudyflow_diagram,
-            revisedTopic_reason,
-            revisedTopic_outcome,
-            submitWithFeeback,
-            original_section,
-            revised_section,
-        ],
-        queue=True
+                with gr.Group(elem_id="feedback-section", visible=False) as feedback_section:
+                    userFeedback = gr.Textbox(label="ℹ️ Help us know what you’re looking for")
+                    submitWithFeeback = gr.Button("🔂 Update the flow with feedback", elem_classes="gr-button")
+
+                resource_button = gr.Button("📘 Click to get Resource", visible=False, elem_classes="gr-button")
+
+                share_link = gr.Markdown(visible=False)
+
+                with gr.Group(elem_id="expand-section", visible=False) as expand_section:
+                    expand_choice = gr.Dropdown(label="🔍 Go deeper into a topic", choices=[], interactive=True)
+                    expand_button = gr.Button("🔍 Expand topic", elem_classes="gr-button")
+                    topic_details = gr.Markdown()
+
+            with gr.Column(scale=2):
+                # REVISED Section (initially hidden)
+                with gr.Group(visible=False) as revised_section:
+                    gr.Markdown("### 🔄 Revised Recommendation")
+                    with gr.Row():
+                        revisedStudyflow_diagram = gr.Markdown(
+                            value="<p>No recommendation yet.</p>",
+                            label="🔗 The flow you are looking for",
+                            elem_id="scrollable-md",
+                            visible=False
+                        )
+                        with gr.Column():
+                            revisedTopic_reason = gr.Textbox(label="🧐 Why this topic", lines=5, max_lines=5, visible=False)
+                            revisedTopic_outcome = gr.Textbox(label="💪 Outcome of this topic", lines=5, max_lines=5, visible=False)
+
+                # ORIGINAL Section (initially visible)
+                with gr.Group(visible=True) as original_section:
+                    gr.Markdown("### 🔎 Recommendation")
+                    with gr.Row():
+                        studyflow_diagram = gr.Markdown(
+                            value="<p>No recommendation yet.</p>",
+                            label="🔗 The flow you are looking for",
+                            elem_id="scrollable-md",
+                            visible=False
+                        )
+                        with gr.Column():
+                            topic_reason = gr.Textbox(label="🧐 Why this topic", lines=5, max_lines=5, visible=False)
+                            topic_outcome = gr.Textbox(label="💪 Outcome of this topic", lines=5, max_lines=5, visible=False)
+
+                # RESOURCES Section (initially hidden)
+                with gr.Group(elem_id="resource-section", visible=False) as resource_section:
+                    gr.Markdown("### 📘 Learning Resources")
+                    learningResource = gr.Textbox(label="Resources to help you get started")
+                    graspCheck = gr.Textbox(label="Grasp Check Questions")
+
+        # ----------- Events ------------
+
+        submit.click(
+            fn=on_submit,
+            inputs=[age, background, interest, plan_state],
+            outputs=[
+                studyflow_diagram,
+                topic_reason,
+                topic_outcome,
+                submit,
+                feedback_section,
+                submitWithFeeback,
+                original_section,
+                revised_section,
+                resource_button,
+                plan_state,
+            ],
+            queue=True
+        )
+
+        submitWithFeeback.click(
+            fn=on_feedback,
+            inputs=[age, background, interest, userFeedback, plan_state],
+            outputs=[
+                revisedStudyflow_diagram,
+                revisedTopic_reason,
+                revisedTopic_outcome,
+                submitWithFeeback,
+                original_section,
+                revised_section,
+                plan_state,
+            ],
+            queue=True
+        )
+
+        resource_button.click(
+            fn=on_Resource,
+            inputs=[plan_state],
+            outputs=[
+                learningResource, 
+                graspCheck, 
+                resource_section, 
+                resource_button, 
+                submitWithFeeback
+            ],
+            queue=True
+        )
+
+        plan_state.change(
+            fn=on_plan_change,
+            inputs=[plan_state, expand_choice],
+            outputs=[expand_choice, expand_section, share_link],
+            queue=False
+        )
+
+        expand_button.click(
+            fn=on_expand,
+            inputs=[expand_choice, age, plan_state],
+            outputs=[
+                studyflow_diagram,
+                revisedStudyflow_diagram,
+                topic_details,
+                plan_state,
+            ],
+            queue=True
+        )
+
+        demo.load(
+            fn=on_load,
+            inputs=None,
+            outputs=[
+                studyflow_diagram,
+                topic_reason,
+                topic_outcome,
+                submit,
+                feedback_section,
+                submitWithFeeback,
+                original_section,
+                revised_section,
+                resource_button,
+                resource_section,
+                learningResource,
+                graspCheck,
+                plan_state,
+            ],
+            queue=False
+        )
+
+    # Plans live in per-session state, so events can safely run in parallel
+    demo.queue(
+        default_concurrency_limit=config.QUEUE_CONCURRENCY,
+        max_size=config.QUEUE_MAX_SIZE,
     )
+    return demo
+
+_demo = None
+
+def __getattr__(name):
+    # `app.demo` (e.g. for `gradio app.py` reload mode) is built on first access
+    global _demo
+    if name == "demo":
+        if _demo is None:
+            _demo = build_demo()
+        return _demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# -----------------------------
+# Serving
+# -----------------------------
+def create_app(demo=None):
+    """
+    FastAPI app serving the UI at /, plus a Prometheus-style metrics endpoint when
+    enabled. With warm-up enabled, the server only starts accepting requests once
+    `awarmup` is done, on the event loop that will serve them.
+    """
+    from fastapi import FastAPI, Response
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        if config.WARMUP_ENABLED:
+            await awarmup()
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+    if config.METRICS_ENABLED:
+        @app.get(config.METRICS_PATH, include_in_schema=False)
+        def metrics_endpoint():
+            return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+    return gr.mount_gradio_app(app, demo or build_demo(), path="/")
+
+def main():
+    import uvicorn
 
-    resource_button.click(
-        fn=on_Resource,
-        inputs=[],
-        outputs=[
-            learningResource, 
-            graspCheck, 
-            resource_section, 
-            resource_button, 
-            submitWithFeeback
-        ],
-        queue=True
+    uvicorn.run(
+        create_app(),
+        host=os.getenv("GRADIO_SERVER_NAME", "127.0.0.1"),
+        port=int(os.getenv("GRADIO_SERVER_PORT", "7860")),
     )
 
-# Launch the app
-demo.launch()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Bulk plan generation: a study plan, its diagram and grasp-check questions for every
+profile of a roster, e.g. to onboard a cohort before its first session.
+
+    python batch.py roster.csv --output plans.jsonl --concurrency 16
+    python batch.py roster.jsonl --output plans.jsonl          # rerun to resume
+
+Input is CSV with a header row, or JSONL, with `age`, `background` and `interest`
+(an `id` column is kept when present, else the row number is used). Rows are read
+one at a time and results appended to the output as they finish, one JSON object
+per line. The output doubles as the checkpoint: rerunning with the same output skips
+profiles already answered there and retries the rest. A profile seen earlier in the
+roster is not generated again; its row gets a `duplicate_of` record instead.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+import config
+import utils
+from cache import profile_key
+from diagram import FORMATS
+
+# Statuses that are final: the profile isn't generated again on resume. Errors and
+# fallback plans (served while the model was overloaded) are retried.
+DONE_STATUSES = ("complete", "clarify")
+
+FIELD_ALIASES = {
+    "age": ("age",),
+    "background": ("background", "educational_background", "education"),
+    "interest": ("interest", "interests"),
+}
+
+
+# === Input ===
+def read_profiles(path: str) -> Iterator[Dict[str, str]]:
+    """ Yield {"id", "age", "background", "interest"} per row, streaming the file. """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = csv.DictReader(file)
+        for number, row in enumerate(rows, start=1):
+            row = {str(name).strip().lower(): value for name, value in row.items()}
+            profile = {"id": str(row.get("id") or number)}
+            for field, aliases in FIELD_ALIASES.items():
+                profile[field] = next((row[alias] for alias in aliases if row.get(alias) not in (None, "")), None)
+            yield profile
+
+
+# === Checkpoint ===
+def load_checkpoint(path: str) -> Tuple[Dict[str, str], Set[str]]:
+    """
+    (profile_key -> row id of every profile already answered in `path`, ids of rows
+    already recorded as duplicates), read one line at a time. A last line cut short
+    by a crash is dropped so appending starts on a clean line.
+    """
+    done, duplicates = {}, set()
+    if not os.path.exists(path):
+        return done, duplicates
+    with open(path, "rb+") as file:
+        offset = 0
+        for line in file:
+            if not line.endswith(b"\n"):
+                file.truncate(offset)  # only the last line can lack its newline
+                break
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") in DONE_STATUSES:
+                done[record["key"]] = record["id"]
+            elif record.get("status") == "duplicate":
+                duplicates.add(record["id"])
+    return done, duplicates
+
+
+# === Pipeline ===
+async def generate(profile: Dict[str, str], diagram_format: Optional[str] = None) -> dict:
+    """ Plan, diagram and grasp-check questions for one profile, as an output record. """
+    age, background, interest = profile["age"], profile["background"], profile["interest"]
+    record = {"id": profile["id"], "key": profile_key(age, background, interest),
+              "profile": {"age": age, "background": background, "interest": interest}}
+    if not background or not interest:
+        return {**record, "status": "error", "error": "background and interest are required"}
+
+    # Exact cache hits only: a similar profile's plan is fine for an interactive first
+    # answer, but a batch record marked complete must be this profile's own plan
+    status, response = await utils.aget_cached_learning_suggestion(
+        utils.get_async_client(), age, background, interest, similar=False
+    )
+    if status == "clarify":
+        return {**record, "status": status, "follow_up_question": response}
+    if status not in ("complete", "fallback"):
+        return {**record, "status": "error", "error": response}
+
+    questions = await utils.abuild_grasp_check(response.reason, response.expected_outcome, response.resources)
+    if status == "complete" and not questions:
+        status, record["error"] = "error", "No grasp-check questions"
+    return {
+        **record,
+        "status": status,
+        "plan": response.model_dump(),
+        "diagram": utils.get_studyflow_diagram(response.study_workflow, fmt=diagram_format),
+        "grasp_check": questions,
+    }
+
+
+class BatchRun:
+    """ Feeds roster rows to `concurrency` workers and appends their records to `output`. """
+
+    def __init__(self, output, done: Dict[str, str], duplicates: Set[str], concurrency: int,
+                 progress_interval: float = 10, diagram_format: Optional[str] = None):
+        self.output = output
+        self.seen = dict(done)  # profile_key -> id of the row that generates it
+        self.duplicates = duplicates
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.diagram_format = diagram_format
+        self.counts = {"rows": 0, "resumed": 0, "duplicates": 0, "generated": 0, "errors": 0}
+        self.latencies = []
+        self.started = time.perf_counter()
+        self._reported = self.started
+
+    async def run(self, profiles: Iterator[Dict[str, str]]) -> dict:
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)  # bounds how far reading runs ahead
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        for profile in profiles:
+            self.counts["rows"] += 1
+            key = profile_key(profile["age"], profile["background"], profile["interest"])
+            first = self.seen.get(key)
+            if first is not None:
+                self._dedupe(profile, key, first)
+                continue
+            self.seen[key] = profile["id"]
+            await queue.put(profile)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        self._report(final=True)
+        return self.summary()
+
+    async def _worker(self, queue):
+        while True:
+            profile = await queue.get()
+            if profile is None:
+                return
+            start = time.perf_counter()
+            try:
+                record = await generate(profile, self.diagram_format)
+            except Exception as e:  # one bad row must not stop the run
+                record = {"id": profile["id"], "status": "error", "error": str(e),
+                          "key": profile_key(profile["age"], profile["background"], profile["interest"])}
+            record["seconds"] = round(time.perf_counter() - start, 3)
+            self.latencies.append(record["seconds"])
+            self.counts["generated"] += 1
+            if record["status"] not in DONE_STATUSES:
+                self.counts["errors"] += 1
+            self._write(record)
+
+    def _dedupe(self, profile, key, first):
+        if first == profile["id"] or profile["id"] in self.duplicates:
+            self.counts["resumed"] += 1  # recorded by an earlier run
+            return
+        self.counts["duplicates"] += 1
+        self._write({"id": profile["id"], "key": key, "status": "duplicate", "duplicate_of": first})
+
+    def _write(self, record):
+        # Whole lines, flushed at once, so a crash loses at most the line being written
+        self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.output.flush()
+        self._report()
+
+    def _report(self, final=False):
+        now = time.perf_counter()
+        if not final and now - self._reported < self.progress_interval:
+            return
+        self._reported = now
+        summary = self.summary()
+        print(f"{'done' if final else 'progress'}: {summary['rows']} rows, {summary['generated']} generated "
+              f"({summary['errors']} errors), {summary['duplicates']} duplicates, {summary['resumed']} resumed, "
+              f"{summary['profiles_per_second']:.2f} profiles/s, p50 {summary['p50_seconds']:.2f}s "
+              f"p95 {summary['p95_seconds']:.2f}s", file=sys.stderr)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        return {
+            **self.counts,
+            "elapsed_seconds": elapsed,
+            "profiles_per_second": self.counts["generated"] / elapsed if elapsed else 0.0,
+            "p50_seconds": statistics.median(latencies) if latencies else 0.0,
+            "p95_seconds": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0,
+        }
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: Optional[int] = None,
+                    progress_interval: float = 10, diagram_format: Optional[str] = None) -> dict:
+    """ Generate every profile of `input_path` into `output_path`, resuming from it. Returns the summary. """
+    done, duplicates = load_checkpoint(output_path)
+    with open(output_path, "a", encoding="utf-8") as output:
+        run = BatchRun(output, done, duplicates, concurrency or config.BATCH_CONCURRENCY, progress_interval,
+                       diagram_format)
+        return await run.run(read_profiles(input_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="roster as .csv or .jsonl")
+    parser.add_argument("--output", "-o", default="plans.jsonl", help="JSONL results, also the resume checkpoint")
+    parser.add_argument("--concurrency", "-c", type=int, default=config.BATCH_CONCURRENCY)
+    parser.add_argument("--progress-interval", type=float, default=10, help="seconds between progress lines")
+    parser.add_argument("--diagram-format", choices=FORMATS, default=config.DIAGRAM_FORMAT)
+    args = parser.parse_args()
+    summary = asyncio.run(run_batch(args.input, args.output, args.concurrency, args.progress_interval,
+                                    args.diagram_format))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
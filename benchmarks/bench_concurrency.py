@@ -0,0 +1,140 @@
+"""
+Concurrency vs. latency for the blocking and async plan paths.
+
+The model is replaced by an in-process fake with a fixed response latency, so the
+numbers reflect how the app waits on the provider rather than the provider itself:
+- sync:  `utils.driver` on a thread pool the size of Gradio's default worker pool
+- async: `utils.adriver` on a single event loop, shared by every session count
+
+    python benchmarks/bench_concurrency.py --latency 2 --sessions 10 50 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SAMBANOVA_KEY", "benchmark")
+os.environ.setdefault("LEARNFLOW_CACHE_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_SIMILARITY_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_STORE_PATH", "")  # plans stored in memory only
+os.environ.setdefault("LEARNFLOW_STREAMING", "0")
+# Plans only, as on the sync path; unused grasp-check prefetches would also carry
+# over from one run to the next on the shared event loop
+os.environ.setdefault("LEARNFLOW_PREFETCH_ENABLED", "0")
+
+import utils  # noqa: E402
+
+PLAN_JSON = json.dumps({
+    "study_workflow": utils.sample_studyflow,
+    "reason": utils.sample_reason,
+    "expected_outcome": utils.sample_outcome,
+    "resources": utils.sample_resource,
+})
+
+
+def _completion():
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=PLAN_JSON))], usage=None)
+
+
+class FakeClient:
+    def __init__(self, latency):
+        self.chat = SimpleNamespace(completions=self)
+        self.latency = latency
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return _completion()
+
+
+class FakeAsyncClient(FakeClient):
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _completion()
+
+
+class ThreadSampler:
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# Latency is measured from the moment all sessions arrive, so time spent waiting
+# for a free worker counts, just like a request waiting in the Gradio queue.
+def run_sync(sessions, workers):
+    def one(i):
+        utils.driver(20, "Computer Science student", f"machine learning {i}")
+        return time.perf_counter() - start
+
+    with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(one, range(sessions)))
+        wall = time.perf_counter() - start
+    return latencies, wall, sampler.peak
+
+
+def run_async(sessions, loop):
+    async def one(i):
+        await utils.adriver(20, "Computer Science student", f"machine learning {i}")
+        return time.perf_counter() - start
+
+    async def main():
+        return await asyncio.gather(*(one(i) for i in range(sessions)))
+
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        latencies = loop.run_until_complete(main())
+        wall = time.perf_counter() - start
+    return latencies, wall, sampler.peak
+
+
+def report(mode, sessions, latencies, wall, threads):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"{mode:<6} {sessions:>8} {statistics.median(latencies):>9.2f}s {p95:>9.2f}s "
+          f"{sessions / wall:>10.1f}/s {threads:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=1.0, help="simulated model latency in seconds")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--workers", type=int, default=40, help="sync thread pool size (Gradio default: 40)")
+    args = parser.parse_args()
+
+    # Stand in for the lazily built clients
+    utils._clients.update({"sync": FakeClient(args.latency), "async": FakeAsyncClient(args.latency)})
+
+    # One loop for every run: objects the app creates on first use, such as the
+    # prefetcher's semaphore, are bound to the loop they were first used on
+    loop = asyncio.new_event_loop()
+    print(f"{'mode':<6} {'sessions':>8} {'p50':>10} {'p95':>10} {'throughput':>12} {'threads':>8}")
+    try:
+        for sessions in args.sessions:
+            report("sync", sessions, *run_sync(sessions, args.workers))
+            report("async", sessions, *run_async(sessions, loop))
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
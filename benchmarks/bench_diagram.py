@@ -0,0 +1,78 @@
+"""
+Diagram rendering micro-benchmark: the old join/split Mermaid builder against the
+direct renderers in diagram.py (Mermaid, DOT, SVG), cold, and SVG memoized (the only
+format get_studyflow_diagram caches), on workflows
+from a typical 5-topic plan up to very large ones.
+
+    python benchmarks/bench_diagram.py
+    python benchmarks/bench_diagram.py --sizes 5x4 200x20 --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SAMBANOVA_KEY", "mock")
+os.environ.setdefault("LEARNFLOW_CACHE_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_SIMILARITY_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_STORE_ENABLED", "0")
+
+import utils  # noqa: E402
+from diagram import FORMATS, RENDERERS  # noqa: E402
+
+
+def legacy_mermaid(studyflow):
+    """ The renderer diagram.py replaced: flatten to comma/pipe strings, split them again, build with +=. """
+    step_titles = ", ".join(studyflow)
+    step_details = " | ".join(", ".join(subtopics) for subtopics in studyflow.values())
+    titles = [title.strip() for title in step_titles.split(",")]
+    details_list = [details.strip() for details in step_details.split("|")]
+    colors = ["#f9c74f", "#90be6d", "#f9844a", "#577590", "#277da1", "#ff595e", "#ffd166"]
+    mermaid_code = "graph TD;\n"
+    previous_step = None
+    for i, title in enumerate(titles):
+        if i >= len(details_list):
+            break
+        details = [detail.strip() for detail in details_list[i].split(",")]
+        bullet_points = "<br/>".join([f"• {detail}" for detail in details])
+        mermaid_code += f"    A{i}[\"<b><u>{title}</u></b><br/>{bullet_points}\"]\n"
+        mermaid_code += f"    style A{i} fill:{colors[i % len(colors)]},stroke:#333,stroke-width:1.5px;\n"
+        if previous_step:
+            mermaid_code += f"    {previous_step} --> A{i}\n"
+        previous_step = f"A{i}"
+    return f"```mermaid\n{mermaid_code}\n```"
+
+
+def workflow(topics, subtopics):
+    return {f"Topic {t}: Series and DataFrames": [f"Subtopic {t}.{s} with a realistic length label"
+                                                   for s in range(subtopics)] for t in range(topics)}
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["5x4", "50x10", "500x20"], help="TOPICSxSUBTOPICS")
+    parser.add_argument("--repeat", type=int, default=0, help="calls per measurement (default: scaled to size)")
+    args = parser.parse_args()
+
+    print(f"{'workflow':>10} {'legacy':>10} " + " ".join(f"{fmt:>10}" for fmt in FORMATS) + f" {'svg memo':>10}  (us/call)")
+    for size in args.sizes:
+        topics, subtopics = (int(n) for n in size.split("x"))
+        flow = workflow(topics, subtopics)
+        repeat = args.repeat or max(5, 20000 // (topics * subtopics))
+        timings = [per_call_us(lambda: legacy_mermaid(flow), repeat)]
+        timings += [per_call_us(lambda fmt=fmt: RENDERERS[fmt](flow), repeat) for fmt in FORMATS]
+        utils.get_studyflow_diagram(flow, fmt="svg")
+        timings.append(per_call_us(lambda: utils.get_studyflow_diagram(flow, fmt="svg"), repeat))
+        print(f"{size:>10} " + " ".join(f"{us:>10.1f}" for us in timings))
+
+
+if __name__ == "__main__":
+    main()
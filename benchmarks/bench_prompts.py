@@ -0,0 +1,308 @@
+"""
+Prompt size and prompt-variant benchmark.
+
+tokens: prompt tokens per template and variant, split into the static part every
+request of the task shares and the per-user part, and how much of each request
+is a prefix identical across users (what a provider-side prompt cache can reuse).
+The pre-restructuring plan and grasp-check prompts are included as a baseline.
+
+ab: sends the same profiles with the "full" and "compact" prompt variants and
+compares how often the replies validate as a StudyPlan / GraspCheck, their prompt
+tokens (and cached tokens, where the backend reports them) and latency. With
+--live it exits non-zero if the compact prompts validate noticeably less often.
+Without it the offline mock answers, and the mock's replies don't depend on the
+prompt: that checks the harness and the token counts, not output quality.
+
+    python benchmarks/bench_prompts.py tokens
+    python benchmarks/bench_prompts.py ab --profiles 40 --malformed-rate 0.1
+    python benchmarks/bench_prompts.py ab --live --profiles 20     # real backend, costs tokens
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SAMBANOVA_KEY", "mock")
+os.environ.setdefault("LEARNFLOW_CACHE_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_SIMILARITY_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_STORE_ENABLED", "0")
+
+import utils  # noqa: E402
+from expansion import build_expansion_messages  # noqa: E402
+from prompts import PROMPT_VARIANTS  # noqa: E402
+from revision import build_revision_messages  # noqa: E402
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+    TOKENIZER = "cl100k_base"
+except ImportError:
+    _encoding = None
+    TOKENIZER = "~4 characters per token"
+
+PROFILES = [
+    (20, "Computer Science student", "machine learning and large language models"),
+    (15, "High school, grade 10", "drawing comics and animation"),
+    (34, "Accountant with a commerce degree", "data analysis with Python"),
+    (9, "Grade 4", "space and planets"),
+    (27, "Mechanical engineering graduate", "robotics and embedded systems"),
+    (45, "Nurse", "medical statistics"),
+    (17, "High school senior", "web development"),
+    (62, "Retired history teacher", "genealogy research"),
+]
+
+
+def count_tokens(text):
+    return len(_encoding.encode(text)) if _encoding else (len(text) + 3) // 4
+
+
+def serialize(messages):
+    """ The text a provider sees, in order: what prompt caching matches prefixes on. """
+    return "".join(f"<{message['role']}>{message['content']}" for message in messages)
+
+
+# === Baseline: the prompts before prompts.py, verbatim (indentation included) ===
+LEGACY_PLAN_SYSTEM_PROMPT = """
+You are a smart educational guide agent.
+You help people figure out what to learn next based on their age, background, and interests.
+Be adaptive: if input is too vague, ask for clarification. If it's clear, give them:
+1. A study_workflow - a roadmap of topics and subtopics.
+2. A reason why it's the right path for the user.
+3. An expected outcome after finishing this learning path.
+4. Beginner-friendly resources.
+Use simple and clear language.
+Always respond in strict JSON.
+"""
+
+
+def legacy_plan_messages(age, background, interest, feedback=None):
+    """ A short system prompt; profile, instructions and example all in the user message. """
+    feedback_note = f"\n- Additional Feedback from User: {feedback}" if feedback else ""
+    user = f"""
+    You are an expert curriculum advisor.
+
+    ### User Profile
+    - Age: {age}
+    - Educational Background: {background}
+    - Interests: {interest}{feedback_note}
+
+    ### Your Task:
+    Generate a structured learning plan in **strict JSON format only**, without any extra text or markdown.
+
+    Your output must include:
+    1. **study_workflow**: a Python-style dictionary (JSON-safe)  
+    - Keys: main topics relevant to the user's profile  
+    - Values: 2–5 subtopics per main topic, written as a list of strings ordered from beginner to advanced  
+
+    2. **reason**: 3-4 clear sentence explaining "why" this path fits the user's background and interests. Avoid overly technical or overly vague language. Match the tone to their background. 
+    3. **expected_outcome**: 3–4 sentences describing what the user will *be able to do* by the end. Be specific, realistic, and motivating. Avoid overly technical or overly vague language. Match the tone to their background. 
+    4. **resources**: list of 3–4 beginner-friendly materials
+
+    ### VERY IMPORTANT:
+    - Talk directly to the user, not in third person.
+    - Do NOT return more than 5 main topics
+    - Do NOT return more than 5 subtopics per main topic
+    - Do NOT return more than 3 resources
+    - Do NOT include explanations outside the JSON
+    - Do NOT use markdown code blocks like ```json
+    - Only output valid JSON
+
+    ### Output Example:
+    {{
+        "study_workflow": {{
+        "Start with Python": ["Variables and Data Types", "Loops", "Functions", "Error Handling"],
+        "Data Structures": ["Lists", "Dictionaries", "Tuples", "Sets"],
+        "NumPy": ["Arrays", "Array Operations", "Broadcasting"],
+        "Pandas": ["Series and DataFrames", "Filtering and Sorting", "Basic Data Cleaning"],
+        "Matplotlib": ["Line Charts", "Bar Charts", "Histograms"]
+        }},
+        "reason": "Since you are new to programming and interested in data-related topics, this plan starts with Python basics and gradually introduces tools used in real data analysis projects.",
+        "expected_outcome": "After completing this plan, you will understand the fundamentals of Python and be able to explore and analyze real-world datasets using tools like Pandas and Matplotlib. You wil be able to write small scripts to automate tasks, clean data, and create visual summaries.",
+        "resources": [
+            "Python for Beginners - YouTube by freeCodeCamp",
+            "CS50’s Introduction to Computer Science",
+            "Kaggle: Python Course"
+        ]
+    }}
+
+    ### If the user profile is too vague to proceed:
+    Return this JSON instead:
+    {{
+    "follow_up_question": "Ask a specific question to clarify what the user needs"
+    }}
+    """
+    return [{"role": "system", "content": LEGACY_PLAN_SYSTEM_PROMPT}, {"role": "user", "content": user}]
+
+
+def legacy_grasp_check_messages(reason, outcome, resources):
+    """ Reason, outcome and the resources' Python repr first, instructions after. """
+    prompt = f"""
+    You are a helpful AI tutor. The user is learning because:
+    {reason}
+
+    Their desired outcome is:
+    {outcome}
+
+    They have these resources:
+    {resources}
+
+    Please generate 5 to 10 short questions that the user could answer
+    after studying these materials, to check their overal understanding.
+    Return only the list of questions.
+
+    """
+    return [{"role": "system", "content": "You are a question setter whoes objective is to test learners overall understanding of the topic, not specifics "},
+            {"role": "user", "content": prompt}]
+
+# === Token report ===
+def sample_plans():
+    # Varied reasons/outcomes/resources, so the per-plan part differs between requests
+    return [(f"For {interest}: {utils.sample_reason}", f"As a {background}: {utils.sample_outcome}",
+             utils.sample_resource[: 1 + n % 3]) for n, (_, background, interest) in enumerate(PROFILES)]
+
+
+def templates():
+    """ (template, variant, [messages for several different users]) """
+    plans = sample_plans()
+    yield "plan", "legacy", [legacy_plan_messages(*profile) for profile in PROFILES]
+    for variant in PROMPT_VARIANTS:
+        yield "plan", variant, [utils.build_plan_messages(*profile, variant=variant) for profile in PROFILES]
+    yield "grasp_check", "legacy", [legacy_grasp_check_messages(*plan) for plan in plans]
+    for variant in PROMPT_VARIANTS:
+        yield "grasp_check", variant, [utils.build_grasp_check_messages(*plan, variant=variant) for plan in plans]
+    yield "clarify", "-", [utils.build_clarify_messages(*profile) for profile in PROFILES]
+    plan = {"study_workflow": utils.sample_studyflow, "reason": utils.sample_reason,
+            "expected_outcome": utils.sample_outcome, "resources": utils.sample_resource}
+    yield "revision", "-", [build_revision_messages(plan, f"make it easier, focus on {interest}",
+                                                    {"study_workflow"}) for _, _, interest in PROFILES]
+    yield "expansion", "-", [build_expansion_messages(topic, level)
+                             for topic in utils.sample_studyflow for level in ("child", "adult")]
+
+
+def report_tokens():
+    print(f"tokens counted as {TOKENIZER}")
+    print(f"{'template':<12} {'variant':<8} {'system':>7} {'user':>7} {'total':>7} {'shared prefix':>14}")
+    for template, variant, requests in templates():
+        texts = [serialize(messages) for messages in requests]
+        system = statistics.mean(count_tokens(messages[0]["content"]) for messages in requests)
+        user = statistics.mean(count_tokens(messages[1]["content"]) for messages in requests)
+        total = statistics.mean(count_tokens(text) for text in texts)
+        shared = count_tokens(os.path.commonprefix(texts))
+        print(f"{template:<12} {variant:<8} {system:>7.0f} {user:>7.0f} {total:>7.0f} "
+              f"{shared:>7} ({shared / total:>4.0%})")
+
+
+# === A/B harness ===
+async def timed_completion(task, messages):
+    model = utils.model_router.model_for(task)
+    started = time.perf_counter()
+    completion = await utils._acreate_completion(utils.get_async_client(), task, model, messages)
+    usage = completion.usage
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    return (completion.choices[0].message.content or "", time.perf_counter() - started,
+            usage.prompt_tokens if usage else 0, (getattr(details, "cached_tokens", None) or 0) if details else 0)
+
+
+async def attempt(task, messages, parse, results):
+    """ Send one request and record (valid, seconds, prompt tokens, cached tokens); returns the parsed reply. """
+    try:
+        raw, seconds, prompt, cached = await timed_completion(task, messages)
+    except Exception as e:  # a failed call counts against the variant, it doesn't stop the run
+        print(f"  {task}: request failed: {e}", file=sys.stderr)
+        results[task].append((False, 0.0, 0, 0))
+        return None
+    try:
+        parsed = parse(raw)
+    except Exception:
+        parsed = None
+    results[task].append((bool(parsed), seconds, prompt, cached))
+    return parsed
+
+
+async def run_profile(profile, variant, results):
+    """ A plan for `profile`, then grasp-check questions for that plan (or the sample plan). """
+    reason, outcome, resources = utils.sample_reason, utils.sample_outcome, utils.sample_resource
+    parsed = await attempt("plan", utils.build_plan_messages(*profile, variant=variant),
+                           utils.parse_learning_suggestion, results)
+    if parsed and parsed[0] == "complete":
+        reason, outcome, resources = parsed[1].reason, parsed[1].expected_outcome, parsed[1].resources
+    await attempt("grasp_check", utils.build_grasp_check_messages(reason, outcome, resources, variant=variant),
+                  utils.parse_grasp_check, results)
+
+
+async def run_variant(variant, profiles, concurrency):
+    results = {"plan": [], "grasp_check": []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(profile):
+        async with semaphore:
+            await run_profile(profile, variant, results)
+
+    await asyncio.gather(*(one(profile) for profile in profiles))
+    return results
+
+
+def run_ab(args):
+    server = None
+    if not args.live:
+        from mock_server import mock_options_from_args, start_mock_server
+        server, utils.config.BASE_URL = start_mock_server(options=mock_options_from_args(args))
+        utils._clients.clear()  # clients are built on first use, now against the mock
+    profiles = [PROFILES[n % len(PROFILES)] for n in range(args.profiles)]
+    rates = {}
+    # Both variants on one loop: the async client's connection pool is bound to the loop it first ran on
+    loop = asyncio.new_event_loop()
+    try:
+        print(f"{'variant':<8} {'task':<12} {'valid':>7} {'prompt tok':>11} {'cached':>7} {'p50':>8}")
+        for variant in PROMPT_VARIANTS:
+            results = loop.run_until_complete(run_variant(variant, profiles, args.concurrency))
+            for task, rows in results.items():
+                valid = sum(row[0] for row in rows) / len(rows) if rows else 0.0
+                prompt = statistics.mean(row[2] for row in rows) if rows else 0
+                cached = sum(row[3] for row in rows) / max(1, sum(row[2] for row in rows))
+                p50 = statistics.median(row[1] for row in rows) if rows else 0.0
+                rates[variant, task] = valid
+                print(f"{variant:<8} {task:<12} {valid:>7.0%} {prompt:>11.0f} {cached:>7.0%} {p50:>7.3f}s")
+    finally:
+        loop.close()
+        if server is not None:
+            server.shutdown()
+
+    if not args.live:
+        print("offline run: the mock replies the same to either variant, so validity here says nothing "
+              "about prompt quality; rerun with --live to compare the variants")
+        return 0
+    worse = [task for task in ("plan", "grasp_check")
+             if rates["compact", task] < rates["full", task] - args.tolerance]
+    if worse:
+        print(f"compact prompts validate less often for: {', '.join(worse)}")
+        return 1
+    print(f"compact prompts validate at the same rate (within {args.tolerance:.0%})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("tokens", help="prompt tokens per template and variant")
+    ab = commands.add_parser("ab", help="validity, tokens and latency of the full vs compact prompts")
+    ab.add_argument("--profiles", type=int, default=40, help="profiles sent with each variant")
+    ab.add_argument("--concurrency", type=int, default=8)
+    ab.add_argument("--tolerance", type=float, default=0.05, help="allowed drop in valid replies")
+    ab.add_argument("--live", action="store_true", help="use the configured backend instead of the mock")
+    from mock_server import add_mock_arguments
+    add_mock_arguments(ab)
+    args = parser.parse_args()
+
+    if args.command == "tokens":
+        report_tokens()
+        return 0
+    return run_ab(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
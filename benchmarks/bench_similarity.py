@@ -0,0 +1,108 @@
+"""
+Similar-profile index at scale: insert throughput, lookup latency, load time and
+memory with N stored plans, plus the similarity of hand-picked profile pairs that
+should or shouldn't share a plan, checked against the match threshold.
+
+    python benchmarks/bench_similarity.py --entries 100000 --queries 1000
+    python benchmarks/bench_similarity.py --entries 100000 --path /tmp/index.sqlite3
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import config  # noqa: E402
+from similarity import SimilarityIndex, embed_profile  # noqa: E402
+
+BACKGROUNDS = ["Computer Science student", "CSE grad", "Mechanical engineer", "Biology undergrad",
+               "High school student", "Marketing manager", "Physics PhD", "Self-taught developer",
+               "Accountant", "Graphic designer", "Nurse", "Data analyst"]
+INTERESTS = ["machine learning", "large language models", "web development", "robotics", "statistics",
+             "cloud computing", "cybersecurity", "game design", "finance", "genetics", "music theory",
+             "photography", "databases", "mobile apps", "quantum computing", "UX design", "blockchain"]
+# (profile, profile, whether they should share a plan)
+PAIRS = [
+    (("Computer Science Engineering", "ML, LLMs"), ("CSE grad", "machine learning and large language models"), True),
+    (("Computer Science student", "machine learning"), ("Computer Science undergrad", "Machine Learning"), True),
+    (("Computer Science student", "machine learning"), ("computer science students", "machine-learning"), True),
+    (("Accountant", "data analysis with python"), ("accountant", "python data analysis"), True),
+    (("Computer Science student", "machine learning"), ("Biology student", "machine learning"), False),
+    (("Computer Science student", "machine learning"), ("Computer Science student", "web development"), False),
+    (("Computer Science student", "machine learning"), ("Computer Science student", "machine learning for finance"),
+     False),
+    (("CS student", "C programming"), ("CS student", "C++ programming"), False),
+    (("CS student", "C programming"), ("CS student", "C# programming"), False),
+]
+PLAN = {"study_workflow": {"Topic": ["Subtopic"]}, "reason": "-", "expected_outcome": "-", "resources": ["-"]}
+
+
+def random_profile(rng):
+    interests = " and ".join(rng.sample(INTERESTS, rng.randint(1, 3)))
+    return rng.randint(12, 60), rng.choice(BACKGROUNDS), f"{interests} {rng.randint(0, 10 ** 6)}"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--path", default=None, help="SQLite file to persist to (default: memory only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threshold", type=float, default=config.SIMILARITY_THRESHOLD)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    wrong = 0
+    for a, b, same in PAIRS:
+        score = float(embed_profile(*a, args.dim) @ embed_profile(*b, args.dim))
+        verdict = "ok" if (score >= args.threshold) == same else "WRONG"
+        wrong += verdict == "WRONG"
+        print(f"similarity {score:.3f} {'match' if same else 'differ':<6} {verdict:<5} {a} ~ {b}")
+    print(f"{len(PAIRS) - wrong}/{len(PAIRS)} pairs on the right side of threshold {args.threshold}")
+
+    memory = rss_mb()
+    index = SimilarityIndex(path=args.path, dim=args.dim, max_entries=max(args.entries, 1))
+    start = time.perf_counter()
+    for _ in range(args.entries):
+        index.add(*random_profile(rng), PLAN)
+    insert = time.perf_counter() - start
+    print(f"insert   {args.entries} plans in {insert:.1f}s ({args.entries / insert:,.0f}/s), "
+          f"+{rss_mb() - memory:.0f}MB RSS")
+
+    timings = []
+    for _ in range(args.queries):
+        profile = random_profile(rng)
+        start = time.perf_counter()
+        index.search(*profile)
+        timings.append(time.perf_counter() - start)
+    print(f"search   p50={statistics.median(timings) * 1000:.2f}ms p95={percentile(timings, 0.95) * 1000:.2f}ms "
+          f"p99={percentile(timings, 0.99) * 1000:.2f}ms over {len(index)} plans")
+
+    if args.path:
+        start = time.perf_counter()
+        reloaded = SimilarityIndex(path=args.path, dim=args.dim, max_entries=max(args.entries, 1))
+        print(f"load     {len(reloaded)} plans from disk in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
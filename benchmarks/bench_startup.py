@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark: how long a new replica takes before it can serve, and how
+slow its first request is.
+
+- import: `import utils` and `import app` in a fresh interpreter (importing app
+  builds and serves nothing, so this is the cost of its imports)
+- ready: from spawning `python app.py` until it answers HTTP on its port
+- first / second: a plan request through `gradio_client` right after ready, and
+  the one after it, against the offline mock backend
+
+The server is measured with the warm-up (LEARNFLOW_WARMUP_ENABLED) on and off.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --latency 0.2
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mock_server import add_mock_arguments, mock_options_from_args, start_mock_server  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+APP_PATH = os.path.join(ROOT, "app.py")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def child_env(**overrides):
+    return {**os.environ, "SAMBANOVA_KEY": "mock", "GRADIO_ANALYTICS_ENABLED": "False",
+            "LEARNFLOW_CACHE_ENABLED": "0", "LEARNFLOW_SIMILARITY_ENABLED": "0", "LEARNFLOW_STORE_PATH": "",
+            **overrides}
+
+
+def import_seconds(module):
+    """ Seconds to import `module` in a fresh interpreter, measured inside it. """
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=child_env(),
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def serve_once(mock_url, warmup):
+    """ (ready, first request, second request) seconds for one fresh `python app.py`. """
+    from gradio_client import Client
+
+    port = _free_port()
+    env = child_env(LEARNFLOW_BASE_URL=mock_url, GRADIO_SERVER_PORT=str(port),
+                    LEARNFLOW_WARMUP_ENABLED="1" if warmup else "0")
+    url = f"http://127.0.0.1:{port}/"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, APP_PATH], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=1)
+                break
+            except OSError:
+                if process.poll() is not None or time.perf_counter() - start > 120:
+                    raise RuntimeError("app.py did not start")
+                time.sleep(0.05)
+        ready = time.perf_counter() - start
+
+        client = Client(url, verbose=False)
+        requests = []
+        for n in range(2):
+            started = time.perf_counter()
+            client.predict(20, "Computer Science student", f"machine learning {n}", api_name="/on_submit")
+            requests.append(time.perf_counter() - started)
+        client.close()  # its heartbeat stream would hold up the server's graceful shutdown
+        return (ready, *requests)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement (median reported)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    for module in ("utils", "app"):
+        seconds = statistics.median(import_seconds(module) for _ in range(args.runs))
+        print(f"import {module:<5} {seconds:>8.3f}s")
+
+    port = _free_port()
+    server, _ = start_mock_server(port=port, options=mock_options_from_args(args))
+    try:
+        print(f"{'warm-up':<8} {'ready':>9} {'first':>9} {'second':>9}")
+        for warmup in (False, True):
+            runs = [serve_once(f"http://127.0.0.1:{port}/v1", warmup) for _ in range(args.runs)]
+            ready, first, second = (statistics.median(column) for column in zip(*runs))
+            print(f"{'on' if warmup else 'off':<8} {ready:>8.3f}s {first:>8.3f}s {second:>8.3f}s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
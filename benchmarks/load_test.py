@@ -0,0 +1,216 @@
+"""
+End-to-end load/latency benchmark against the offline mock backend.
+
+Each simulated session requests a plan and then its resources + grasp checks,
+through one of:
+- async:  `utils.adriver` + `utils.adriver_resource` on one event loop, shared by
+          every session count (the async client's connection pool and the
+          prefetcher's semaphore are bound to the loop they are first used on)
+- sync:   `utils.driver` + `utils.driver_resource` on a thread per session
+- gradio: the real app (`app.py` in a subprocess) through `gradio_client`
+
+Reports p50/p95/p99 latency per step, throughput and memory, plus per-model-tier
+latency, JSON repair/retry counts and rate-limiter activity for the in-process modes.
+
+    python benchmarks/load_test.py --mode async --sessions 10 50 100 --latency 0.5
+    python benchmarks/load_test.py --mode gradio --sessions 10 --token-rate 300
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# The clients in utils read the backend URL at import, so point them at the mock first.
+MOCK_PORT = _free_port()
+os.environ["LEARNFLOW_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}/v1"
+os.environ.setdefault("SAMBANOVA_KEY", "mock")
+os.environ.setdefault("LEARNFLOW_CACHE_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_SIMILARITY_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_STORE_PATH", "")  # plans stored in memory only
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import utils  # noqa: E402
+from mock_server import add_mock_arguments, mock_options_from_args, start_mock_server  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(__file__), "..", "app.py")
+
+
+def profile(session, round_):
+    # Unique interests keep every request a cache miss, like distinct users.
+    return 20, "Computer Science student", f"machine learning, session {session} round {round_}"
+
+
+# === Scenarios ===
+def run_async(sessions, rounds, loop):
+    timings = {"plan": [], "resource": []}
+
+    async def session(i):
+        for r in range(rounds):
+            start = time.perf_counter()
+            _, _, _, plan_state = await utils.adriver(*profile(i, r))
+            timings["plan"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            await utils.adriver_resource(plan_state)
+            timings["resource"].append(time.perf_counter() - start)
+
+    async def main():
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+
+    loop.run_until_complete(main())
+    return timings
+
+
+def run_sync(sessions, rounds):
+    timings = {"plan": [], "resource": []}
+
+    def session(i):
+        for r in range(rounds):
+            start = time.perf_counter()
+            _, _, _, plan_state = utils.driver(*profile(i, r))
+            timings["plan"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            utils.driver_resource(plan_state)
+            timings["resource"].append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    return timings
+
+
+def run_gradio(sessions, rounds, url):
+    from gradio_client import Client
+
+    timings = {"plan": [], "resource": []}
+
+    def session(i):
+        client = Client(url, verbose=False)
+        for r in range(rounds):
+            start = time.perf_counter()
+            client.predict(*profile(i, r), api_name="/on_submit")
+            timings["plan"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            client.predict(api_name="/on_Resource")
+            timings["resource"].append(time.perf_counter() - start)
+        client.close()  # its heartbeat stream would hold up the app's shutdown
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    return timings
+
+
+@contextlib.contextmanager
+def gradio_app():
+    port = _free_port()
+    env = {**os.environ, "GRADIO_SERVER_PORT": str(port), "GRADIO_ANALYTICS_ENABLED": "False"}
+    process = subprocess.Popen([sys.executable, APP_PATH], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=1)
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("app.py did not start")
+                time.sleep(0.2)
+        yield url, process.pid
+    finally:
+        process.terminate()
+        process.wait()
+
+
+# === Reporting ===
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def rss_mb(pid="self"):
+    """ Current resident memory from /proc (Linux), else peak RSS of this process. """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def report(mode, sessions, timings, wall, memory):
+    for step, values in timings.items():
+        print(f"{mode:<7} {sessions:>8} {step:<9} {percentile(values, 0.5):>8.3f}s {percentile(values, 0.95):>8.3f}s "
+              f"{percentile(values, 0.99):>8.3f}s {len(values) / wall:>9.1f}/s {memory:>8.1f}MB")
+
+
+def report_tiers():
+    for tier, stats in utils.model_router.stats().items():
+        if stats["calls"]:
+            print(f"  tier {tier:<6} {stats['model']:<32} calls={stats['calls']:<6} "
+                  f"p50={stats['p50']:.4f}s p95={stats['p95']:.4f}s fallbacks={stats['fallbacks']}")
+
+
+def report_decoding():
+    for task, stats in utils.decode_stats.stats().items():
+        print(f"  decode {task:<12} responses={stats['responses']:<6} repaired={stats['repaired']:<5} "
+              f"failures={stats['failures']:<5} retries={stats['retries']:<5} retry_failures={stats['retry_failures']}")
+
+
+def report_scheduler():
+    stats = utils.llm_scheduler.stats()
+    print(f"  scheduler granted={stats['granted']} shed={stats['shed']} rate_limited={stats['rate_limited']} "
+          f"retried={stats['retried']} rate_scale={stats['rate_scale']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["async", "sync", "gradio"], default="async")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 50, 100], help="concurrent sessions")
+    parser.add_argument("--rounds", type=int, default=3, help="plan + resource cycles per session")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server, _ = start_mock_server(port=MOCK_PORT, options=mock_options_from_args(args))
+    loop = asyncio.new_event_loop()
+    print(f"{'mode':<7} {'sessions':>8} {'step':<9} {'p50':>9} {'p95':>9} {'p99':>9} {'throughput':>11} {'rss':>10}")
+    try:
+        with contextlib.ExitStack() as stack:
+            app_url, app_pid = stack.enter_context(gradio_app()) if args.mode == "gradio" else (None, "self")
+            for sessions in args.sessions:
+                start = time.perf_counter()
+                if args.mode == "async":
+                    timings = run_async(sessions, args.rounds, loop)
+                elif args.mode == "sync":
+                    timings = run_sync(sessions, args.rounds)
+                else:
+                    timings = run_gradio(sessions, args.rounds, app_url)
+                report(args.mode, sessions, timings, time.perf_counter() - start, rss_mb(app_pid))
+            if args.mode != "gradio":
+                report_tiers()
+                report_decoding()
+                report_scheduler()
+    finally:
+        loop.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
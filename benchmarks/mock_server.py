@@ -0,0 +1,261 @@
+"""
+Local OpenAI-compatible stand-in for the SambaNova backend.
+
+Replays canned StudyPlan / clarification / patch / grasp-check / topic expansion responses, picked
+from the request's prompts, with configurable latency and token rate, streaming,
+and fault injection (malformed JSON, 429s with Retry-After).
+
+    python benchmarks/mock_server.py --port 8808 --latency 0.5 --token-rate 200
+    LEARNFLOW_BASE_URL=http://127.0.0.1:8808/v1 SAMBANOVA_KEY=mock python app.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SAMBANOVA_KEY", "mock")
+os.environ.setdefault("LEARNFLOW_CACHE_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_SIMILARITY_ENABLED", "0")
+os.environ.setdefault("LEARNFLOW_STORE_ENABLED", "0")
+
+import utils  # noqa: E402
+
+STUDY_PLAN = {
+    "study_workflow": utils.sample_studyflow,
+    "reason": utils.sample_reason,
+    "expected_outcome": utils.sample_outcome,
+    "resources": utils.sample_resource,
+}
+CLARIFICATION = {"follow_up_question": "Which area of computer science would you like to focus on first?"}
+PLAN_PATCH = {"operations": [
+    {"op": "set_subtopics", "topic": "Machine Learning Fundamentals",
+     "subtopics": ["What is Machine Learning?", "Types of Machine Learning", "Model Evaluation Basics"]},
+]}
+TOPIC_EXPANSION = {
+    "breakdown": {
+        "Core Ideas": ["What the topic covers", "Key vocabulary", "A worked example"],
+        "Hands-on Practice": ["A small guided exercise", "A mini project", "Common mistakes"],
+    },
+    "resources": ["Machine Learning Crash Course - YouTube by Google Developers"],
+}
+GRASP_CHECK = [
+    "What is the difference between supervised and unsupervised learning?",
+    "Why do we split data into training and test sets?",
+    "What problem does overfitting cause, and how can you spot it?",
+    "What makes transformers well suited to language tasks?",
+    "Why would you containerize a model before deploying it?",
+]
+
+
+@dataclass
+class MockOptions:
+    latency: float = 0.5          # seconds before the first token
+    token_rate: float = 0.0       # completion tokens per second, 0 = instant
+    clarify_rate: float = 0.0     # share of plan requests answered with a follow-up question
+    malformed_rate: float = 0.0   # share of JSON responses that are broken
+    rate_limit_rate: float = 0.0  # share of requests rejected with 429
+    retry_after: float = 1.0      # Retry-After seconds sent with each 429
+    seed: int = None
+
+
+def pick_response(messages, options, rng):
+    """ Canned reply for a chat request, chosen the way the real prompts differ. """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    if "question setter" in system:
+        payload = {"questions": GRASP_CHECK}
+    elif "specific enough to recommend" in system:
+        payload = CLARIFICATION if rng.random() < options.clarify_rate else {"clear": True}
+    elif "revising a study plan" in system:
+        payload = PLAN_PATCH
+    elif "expanding one topic" in system:
+        payload = TOPIC_EXPANSION
+    elif rng.random() < options.clarify_rate:
+        payload = CLARIFICATION
+    else:
+        payload = STUDY_PLAN
+
+    content = json.dumps(payload, ensure_ascii=False)
+    if rng.random() < options.malformed_rate:
+        content = rng.choice([
+            content[: len(content) // 2],                                  # truncated
+            f"```json\n{content}\n```",                                    # fenced
+            content + "\nI hope this plan helps you on your journey!",     # trailing prose
+            content[:-1] + ",}",                                           # trailing comma
+        ])
+    return content
+
+
+def split_tokens(text):
+    """ Roughly 4 characters per token, close enough for pacing and usage numbers. """
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+
+def count_tokens(messages):
+    return sum(len(split_tokens(m.get("content") or "")) for m in messages)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = MockOptions()
+    rng = random.Random()
+    rng_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "learnflow"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        with self.rng_lock:
+            rate_limited = self.rng.random() < self.options.rate_limit_rate
+            content = pick_response(body.get("messages", []), self.options, self.rng)
+        if rate_limited:
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                            {"Retry-After": f"{self.options.retry_after:g}"})
+            return
+
+        time.sleep(self.options.latency)
+        tokens = split_tokens(content)
+        usage = {
+            "prompt_tokens": count_tokens(body.get("messages", [])),
+            "completion_tokens": len(tokens),
+            "total_tokens": count_tokens(body.get("messages", [])) + len(tokens),
+        }
+        model = body.get("model", "mock")
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            self._stream(model, tokens, usage if include_usage else None)
+            return
+
+        if self.options.token_rate:
+            time.sleep(len(tokens) / self.options.token_rate)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, model, tokens, usage=None):
+        """ Token chunks, then (like OpenAI with stream_options.include_usage) a usage chunk with no choices. """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        delay = 1 / self.options.token_rate if self.options.token_rate else 0
+        try:
+            for i, token in enumerate(tokens):
+                last = i == len(tokens) - 1
+                self._send_event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": "stop" if last else None}],
+                })
+                if delay:
+                    time.sleep(delay)
+            if usage is not None:
+                self._send_event({"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                                  "model": model, "choices": [], "usage": usage})
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client closed the stream early, as an abandoned request does
+
+    def _send_event(self, payload):
+        self._send_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections under load, which shows up as client retries
+    request_queue_size = 1024
+
+
+def start_mock_server(host="127.0.0.1", port=0, options=None):
+    """ Serve in a background thread. Returns (server, base_url); call server.shutdown() to stop. """
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "options": options or MockOptions(),
+        "rng": random.Random((options or MockOptions()).seed),
+    })
+    server = _MockHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_mock_arguments(parser):
+    defaults = MockOptions()
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=defaults.token_rate, help="tokens/second, 0 = instant")
+    parser.add_argument("--clarify-rate", type=float, default=defaults.clarify_rate)
+    parser.add_argument("--malformed-rate", type=float, default=defaults.malformed_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def mock_options_from_args(args):
+    return MockOptions(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        clarify_rate=args.clarify_rate,
+        malformed_rate=args.malformed_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.host, args.port, mock_options_from_args(args))
+    print(f"Mock LLM backend listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
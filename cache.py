@@ -0,0 +1,161 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Union
+
+# === Profile Normalization ===
+AGE_BUCKETS = [(12, "child"), (17, "13-17"), (22, "18-22"), (29, "23-29"), (39, "30-39"), (54, "40-54")]
+
+
+def bucket_age(age: Union[int, float, str, None]) -> str:
+    """ Group ages so that e.g. 19 and 21 year old students share a cache entry. """
+    try:
+        age = int(float(age))
+    except (TypeError, ValueError):
+        return "unknown"
+    for upper, label in AGE_BUCKETS:
+        if age <= upper:
+            return label
+    return "55+"
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """ Casefold and collapse whitespace: "  CS   Student " -> "cs student". """
+    return " ".join(str(text or "").casefold().split())
+
+
+def profile_key(age, background: str, interest: str, feedback: Optional[str] = None) -> str:
+    normalized = [bucket_age(age), normalize_text(background), normalize_text(interest), normalize_text(feedback)]
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+
+# === Two-Tier Cache ===
+class ResponseCache:
+    """
+    JSON response cache with an in-memory LRU tier in front of a SQLite tier.
+    Entries expire after `ttl` seconds; both tiers are trimmed to a maximum size,
+    least recently used first. Pass `path=None` for a memory-only cache.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 512,
+                 max_disk_entries: int = 50000, ttl: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created = json.loads(row[0]), row[1]
+                    if now - created < self.ttl:
+                        self._db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, created, value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._writes += 1
+            # Trimming scans the table, so only do it every so often.
+            if self._writes % 100 == 0:
+                self._evict_disk(now)
+            self._db.commit()
+
+    def preload(self, limit: Optional[int] = None) -> int:
+        """ Fill the memory tier with the most recently used disk entries; returns how many were loaded. """
+        if self._db is None:
+            return 0
+        limit = self.max_entries if limit is None else min(limit, self.max_entries)
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value, created FROM cache WHERE created >= ? ORDER BY accessed DESC LIMIT ?",
+                (now - self.ttl, limit),
+            ).fetchall()
+            for key, value, created in reversed(rows):  # most recent ends up most recently used
+                if key not in self._memory:
+                    self._remember(key, created, json.loads(value))
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        self._db.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
@@ -0,0 +1,123 @@
+import os
+
+# === Backend ===
+# Point this at any OpenAI-compatible server, e.g. benchmarks/mock_server.py for offline runs
+BASE_URL = os.getenv("LEARNFLOW_BASE_URL", "https://api.sambanova.ai/v1")
+
+# === Response Cache ===
+CACHE_ENABLED = os.getenv("LEARNFLOW_CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.getenv("LEARNFLOW_CACHE_PATH", ".learnflow_cache.sqlite3")
+CACHE_MEMORY_ENTRIES = int(os.getenv("LEARNFLOW_CACHE_MEMORY_ENTRIES", "512"))
+CACHE_DISK_ENTRIES = int(os.getenv("LEARNFLOW_CACHE_DISK_ENTRIES", "50000"))
+CACHE_TTL_SECONDS = float(os.getenv("LEARNFLOW_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# === Gradio Queue ===
+QUEUE_CONCURRENCY = int(os.getenv("LEARNFLOW_QUEUE_CONCURRENCY", "16"))
+QUEUE_MAX_SIZE = int(os.getenv("LEARNFLOW_QUEUE_MAX_SIZE", "256"))
+
+# === Streaming ===
+STREAMING = os.getenv("LEARNFLOW_STREAMING", "1") != "0"
+# Minimum seconds between text-only UI updates while a plan streams in
+STREAM_UPDATE_INTERVAL = float(os.getenv("LEARNFLOW_STREAM_UPDATE_INTERVAL", "0.1"))
+
+# === HTTP Connection Pool (async client) ===
+HTTP_MAX_CONNECTIONS = int(os.getenv("LEARNFLOW_HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("LEARNFLOW_HTTP_MAX_KEEPALIVE", "50"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LEARNFLOW_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("LEARNFLOW_HTTP_TIMEOUT", "120"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("LEARNFLOW_HTTP_CONNECT_TIMEOUT", "10"))
+
+# === Similar-Profile Index ===
+# Profiles close enough to one seen before get its plan at once (no feedback requests only)
+SIMILARITY_ENABLED = os.getenv("LEARNFLOW_SIMILARITY_ENABLED", "1") != "0"
+SIMILARITY_PATH = os.getenv("LEARNFLOW_SIMILARITY_PATH", ".learnflow_index.sqlite3")
+SIMILARITY_DIM = int(os.getenv("LEARNFLOW_SIMILARITY_DIM", "256"))
+SIMILARITY_THRESHOLD = float(os.getenv("LEARNFLOW_SIMILARITY_THRESHOLD", "0.9"))
+SIMILARITY_MAX_ENTRIES = int(os.getenv("LEARNFLOW_SIMILARITY_MAX_ENTRIES", "200000"))
+# Regenerate a near-matched profile's own plan in the background
+SIMILARITY_REFRESH = os.getenv("LEARNFLOW_SIMILARITY_REFRESH", "1") != "0"
+# Looser match used for the fallback plan when the model is overloaded
+SIMILARITY_FALLBACK_THRESHOLD = float(os.getenv("LEARNFLOW_SIMILARITY_FALLBACK_THRESHOLD", "0.6"))
+
+# === Topic Expansion ===
+# Deeper breakdowns of single topics, shared by every plan with that topic and learner level
+EXPANSION_CACHE_PATH = os.getenv("LEARNFLOW_EXPANSION_CACHE_PATH", ".learnflow_expansions.sqlite3")
+EXPANSION_CACHE_MEMORY_ENTRIES = int(os.getenv("LEARNFLOW_EXPANSION_CACHE_MEMORY_ENTRIES", "2048"))
+EXPANSION_CACHE_TTL_SECONDS = float(os.getenv("LEARNFLOW_EXPANSION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# === Rate Limiting and Load Shedding ===
+# Provider limits to pace requests by; 0 = unlimited (429s are still honored)
+RATE_LIMIT_RPM = float(os.getenv("LEARNFLOW_RATE_LIMIT_RPM", "0"))
+RATE_LIMIT_TPM = float(os.getenv("LEARNFLOW_RATE_LIMIT_TPM", "0"))
+# Beyond this many queued model calls, or this many seconds of waiting, serve a fallback plan
+SCHEDULER_MAX_QUEUE = int(os.getenv("LEARNFLOW_SCHEDULER_MAX_QUEUE", "64"))
+SCHEDULER_MAX_WAIT = float(os.getenv("LEARNFLOW_SCHEDULER_MAX_WAIT", "20"))
+SCHEDULER_MAX_RETRIES = int(os.getenv("LEARNFLOW_SCHEDULER_MAX_RETRIES", "3"))
+
+# === Plan Store ===
+# Every plan shown, kept so page reloads and shared ?plan=<id> links need no model call
+STORE_ENABLED = os.getenv("LEARNFLOW_STORE_ENABLED", "1") != "0"
+STORE_PATH = os.getenv("LEARNFLOW_STORE_PATH", ".learnflow_plans.sqlite3")
+# Writes are committed by a background thread in batches, at least this often (seconds)
+STORE_BATCH_SIZE = int(os.getenv("LEARNFLOW_STORE_BATCH_SIZE", "64"))
+STORE_FLUSH_INTERVAL = float(os.getenv("LEARNFLOW_STORE_FLUSH_INTERVAL", "0.5"))
+# Plans not opened for this long are deleted, as are the least recently opened beyond the maximum
+STORE_RETENTION_DAYS = float(os.getenv("LEARNFLOW_STORE_RETENTION_DAYS", "90"))
+STORE_MAX_PLANS = int(os.getenv("LEARNFLOW_STORE_MAX_PLANS", "500000"))
+STORE_COMPACT_INTERVAL = float(os.getenv("LEARNFLOW_STORE_COMPACT_INTERVAL", "3600"))
+
+# === Study Plan Diagram ===
+# "mermaid" (drawn by Mermaid JS in the browser), "svg" (laid out on the server, no JS needed)
+# or "dot" (Graphviz source, shown as code)
+DIAGRAM_FORMAT = os.getenv("LEARNFLOW_DIAGRAM_FORMAT", "mermaid")
+# Rendered SVG diagrams kept by content (Mermaid and DOT are cheap to redraw); 0 disables memoization
+DIAGRAM_CACHE_ENTRIES = int(os.getenv("LEARNFLOW_DIAGRAM_CACHE_ENTRIES", "1024"))
+
+# === Batch Generation ===
+# Profiles generated at once by batch.py
+BATCH_CONCURRENCY = int(os.getenv("LEARNFLOW_BATCH_CONCURRENCY", "16"))
+
+# === Grasp-Check Prefetch ===
+PREFETCH_ENABLED = os.getenv("LEARNFLOW_PREFETCH_ENABLED", "1") != "0"
+PREFETCH_MAX_CONCURRENT = int(os.getenv("LEARNFLOW_PREFETCH_MAX_CONCURRENT", "4"))
+PREFETCH_MAX_PENDING = int(os.getenv("LEARNFLOW_PREFETCH_MAX_PENDING", "64"))
+PREFETCH_TTL_SECONDS = float(os.getenv("LEARNFLOW_PREFETCH_TTL_SECONDS", "900"))
+
+# === Plan Revision ===
+# "patch": feedback asks the model for a JSON patch of the current plan
+# "full": feedback regenerates the whole plan
+REVISION_MODE = os.getenv("LEARNFLOW_REVISION_MODE", "patch")
+
+# === Structured Output ===
+# "json_object": ask the backend for JSON mode, "json_schema": send the Pydantic schemas,
+# "off": plain requests. Models that reject response_format fall back to plain requests.
+STRUCTURED_OUTPUT = os.getenv("LEARNFLOW_STRUCTURED_OUTPUT", "json_object")
+
+# === Prompts ===
+# "full": the plan and grasp-check prompts with worked example and detailed rules,
+# "compact": the same contract in far fewer prompt tokens (see prompts.py)
+PROMPT_VARIANT = os.getenv("LEARNFLOW_PROMPT_VARIANT", "full")
+
+# === Model Tiers ===
+LARGE_MODEL = os.getenv("LEARNFLOW_LARGE_MODEL", "Meta-Llama-3.1-405B-Instruct")
+FAST_MODEL = os.getenv("LEARNFLOW_FAST_MODEL", "Meta-Llama-3.1-8B-Instruct")
+# Tasks served by the fast model (out of plan, grasp_check, clarify, revision, expansion)
+FAST_TASKS = {task.strip() for task in os.getenv("LEARNFLOW_FAST_TASKS", "grasp_check,clarify,revision,expansion").split(",") if task.strip()}
+# Answer obviously underspecified profiles with a follow-up question, without a model call
+VAGUENESS_CHECK = os.getenv("LEARNFLOW_VAGUENESS_CHECK", "1") != "0"
+
+# === Logging and Metrics ===
+LOG_LEVEL = os.getenv("LEARNFLOW_LOG_LEVEL", "INFO").upper()
+# Share of raw model payloads logged at DEBUG, and how much of each
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LEARNFLOW_LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LEARNFLOW_LOG_PAYLOAD_MAX_CHARS", "2000"))
+# Prometheus-style /metrics endpoint served next to the Gradio app
+METRICS_ENABLED = os.getenv("LEARNFLOW_METRICS_ENABLED", "1") != "0"
+METRICS_PATH = os.getenv("LEARNFLOW_METRICS_PATH", "/metrics")
+
+# === Warm-Up ===
+# Before the server accepts requests: open keep-alive connections to the backend,
+# load the caches and similarity index, and run the prompt/parse/diagram code once
+WARMUP_ENABLED = os.getenv("LEARNFLOW_WARMUP_ENABLED", "1") != "0"
+WARMUP_CONNECTIONS = int(os.getenv("LEARNFLOW_WARMUP_CONNECTIONS", "4"))
+WARMUP_TIMEOUT = float(os.getenv("LEARNFLOW_WARMUP_TIMEOUT", "10"))
@@ -0,0 +1,179 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# Schema limits the prompts ask for; over-long lists are clamped rather than rejected
+MAX_TOPICS = 5
+MAX_SUBTOPICS = 5
+MAX_RESOURCES = 3
+MAX_QUESTIONS = 10
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)\s*```", re.DOTALL)
+_QUESTION_PREFIX = re.compile(r"^\s*(?:[-*•]+|(?:q(?:uestion)?\s*)?\d+\s*[.):\-]|q\s*:)\s*", re.IGNORECASE)
+
+
+# === Decode Metrics ===
+class DecodeStats:
+    """ Per-task counters for model responses, local repairs, parse failures and retries. """
+
+    FIELDS = ("responses", "repaired", "failures", "retries", "retry_failures")
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, task: str, field: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(task, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += 1
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            report = {}
+            for task, counts in self._counts.items():
+                responses = counts["responses"] or 1
+                report[task] = {
+                    **counts,
+                    "failure_rate": counts["failures"] / responses,
+                    "retry_rate": counts["retries"] / responses,
+                }
+            return report
+
+
+decode_stats = DecodeStats()
+
+
+# === JSON Extraction and Repair ===
+def extract_json(text: str) -> str:
+    """
+    The JSON document inside a model reply: strips ```json fences, leading preamble
+    and trailing prose by scanning for the first balanced object or array.
+    """
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        return text.strip()
+
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def repair_json(text: str) -> str:
+    """ Fix the slips models commonly make: trailing commas and Python literals. """
+    out, in_string, escaped = [], False, False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char == ",":
+            following = text[i + 1:].lstrip()
+            if not following or following[0] not in "}]":
+                out.append(char)
+        else:
+            for literal, replacement in (("True", "true"), ("False", "false"), ("None", "null")):
+                if text.startswith(literal, i) and not text[i + len(literal):i + len(literal) + 1].isalnum():
+                    out.append(replacement)
+                    i += len(literal)
+                    break
+            else:
+                out.append(char)
+                i += 1
+            continue
+        i += 1
+    return "".join(out)
+
+
+def decode_json(raw_response: str, task: Optional[str] = None) -> Any:
+    """
+    Parse a model reply as JSON, repairing it locally if needed. Raises ValueError
+    if it can't be recovered. Local repairs are counted against `task`.
+    """
+    try:
+        return json.loads(raw_response)
+    except json.JSONDecodeError:
+        pass
+    try:
+        value = json.loads(repair_json(extract_json(raw_response)), strict=False)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON from model: {e}")
+    if task:
+        decode_stats.record(task, "repaired")
+    return value
+
+
+# === Clamping to Schema Limits ===
+def clamp_study_plan(data: Any) -> Any:
+    """ Trim topics, subtopics and resources to the limits the prompt asks for. """
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    workflow = data.get("study_workflow")
+    if isinstance(workflow, dict):
+        data["study_workflow"] = {
+            topic: subtopics[:MAX_SUBTOPICS] if isinstance(subtopics, list) else subtopics
+            for topic, subtopics in list(workflow.items())[:MAX_TOPICS]
+        }
+    if isinstance(data.get("resources"), list):
+        data["resources"] = data["resources"][:MAX_RESOURCES]
+    return data
+
+
+# === Grasp-Check Questions ===
+def extract_questions(raw_response: str, task: Optional[str] = None) -> List[str]:
+    """
+    Questions from a grasp-check reply: JSON ({"questions": [...]} or a list) when the
+    reply is a JSON document or a fenced one, else one question per line (bold markers
+    dropped): the numbered or bulleted items whatever their punctuation ("2. Explain ..."
+    is a question too), or, in a reply without any, the lines ending in "?". Preamble
+    ("Here are some questions:") and trailer lines ("Good luck!") are dropped. JSON that
+    can't be recovered (e.g. truncated) gives no questions, so the caller can retry.
+    """
+    fenced = _FENCE.search(raw_response)
+    if raw_response.lstrip()[:1] in ("{", "[") or (fenced and fenced.group(1)[:1] in ("{", "[")):
+        try:
+            data = decode_json(raw_response, task)
+        except ValueError:
+            return []
+        if isinstance(data, dict):
+            data = data.get("questions")
+        if not isinstance(data, list):
+            return []
+        questions = [_QUESTION_PREFIX.sub("", str(question)).strip() for question in data]
+        return [question for question in questions if question][:MAX_QUESTIONS]
+
+    lines = [line.replace("**", "").strip() for line in _FENCE.sub(r"\1", raw_response).splitlines()]
+    lines = [line for line in lines if line and not line.endswith(":")]
+    items = [_QUESTION_PREFIX.sub("", line).strip() for line in lines if _QUESTION_PREFIX.match(line)]
+    questions = [item for item in items if item] or [line for line in lines if line.endswith("?")]
+    return questions[:MAX_QUESTIONS]
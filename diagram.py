@@ -0,0 +1,217 @@
+import base64
+import re
+from html import escape as escape_xml
+from typing import Any, Dict, List, Optional
+
+# Node colors, cycled through when a plan has more topics than colors
+COLORS = ["#f9c74f", "#90be6d", "#f9844a", "#577590", "#277da1", "#ff595e", "#ffd166"]
+FORMATS = ("mermaid", "dot", "svg")
+
+Workflow = Dict[str, List[str]]
+Expansions = Optional[Dict[str, Dict[str, Any]]]
+
+_MERMAID_SPECIAL = re.compile(r'[#&"<>]')
+
+
+def diagram_key(workflow: Workflow, expansions: Expansions, fmt: str) -> str:
+    """
+    Everything a diagram depends on, as one string; key order matters, topics are a sequence.
+    A plain repr: hashing a JSON dump cost about as much as drawing a Mermaid diagram.
+    """
+    return repr((fmt, workflow, expansions or {}))
+
+
+def _sections(workflow: Workflow, expansions: Expansions):
+    """ (topic, subtopics, [(section, points), ...]) per topic. """
+    expansions = expansions or {}
+    for topic, subtopics in workflow.items():
+        expansion = expansions.get(topic)
+        breakdown = list(expansion["breakdown"].items()) if expansion and expansion.get("breakdown") else []
+        yield str(topic), subtopics, breakdown
+
+
+# === Mermaid ===
+def escape_mermaid(text: str) -> str:
+    """ Label text as Mermaid entity codes, so quotes, brackets and markup can't end the label. """
+    if not _MERMAID_SPECIAL.search(text):
+        return text
+    text = text.replace("#", "#35;").replace("&", "#amp;")
+    return text.replace('"', "#quot;").replace("<", "#lt;").replace(">", "#gt;")
+
+
+def _mermaid_bullets(items: List[str]) -> str:
+    # One escape pass over all items; a newline inside an item would break the label anyway
+    if not items:
+        return ""
+    return "<br/>• " + escape_mermaid("\n".join(map(str, items))).replace("\n", "<br/>• ")
+
+
+def render_mermaid(workflow: Workflow, expansions: Expansions = None) -> str:
+    """
+    Mermaid flowchart: one node per topic with its subtopics as bullets, in order,
+    and an expanded topic's breakdown as extra nodes linked with dotted arrows.
+    """
+    lines = ["graph TD;"]
+    for i, (topic, subtopics, breakdown) in enumerate(_sections(workflow, expansions)):
+        bullets = _mermaid_bullets(subtopics)
+        color = COLORS[i % len(COLORS)]
+        lines.append(f'    A{i}["<b><u>{escape_mermaid(topic)}</u></b>{bullets}"]')
+        lines.append(f"    style A{i} fill:{color},stroke:#333,stroke-width:1.5px;")
+        if i:
+            lines.append(f"    A{i - 1} --> A{i}")
+        for j, (section, points) in enumerate(breakdown):
+            bullets = _mermaid_bullets(points)
+            lines.append(f'    A{i}X{j}["<b>{escape_mermaid(str(section))}</b>{bullets}"]')
+            lines.append(f"    style A{i}X{j} fill:#ffffff,stroke:{color},stroke-width:1.5px;")
+            lines.append(f"    A{i} -.-> A{i}X{j}")
+    return "\n".join(lines) + "\n"
+
+
+# === Graphviz DOT ===
+def escape_dot(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_dot(workflow: Workflow, expansions: Expansions = None) -> str:
+    """ The same flowchart as Graphviz DOT, e.g. for `dot -Tpng`. """
+    lines = [
+        "digraph studyflow {",
+        "    rankdir=TB;",
+        '    node [shape=box, style="rounded,filled", fontname="Helvetica", fontsize=12];',
+    ]
+    for i, (topic, subtopics, breakdown) in enumerate(_sections(workflow, expansions)):
+        color = COLORS[i % len(COLORS)]
+        label = "\n• ".join([topic, *map(str, subtopics)])
+        lines.append(f'    A{i} [label="{escape_dot(label)}", fillcolor="{color}"];')
+        if i:
+            lines.append(f"    A{i - 1} -> A{i};")
+        for j, (section, points) in enumerate(breakdown):
+            label = "\n• ".join([str(section), *map(str, points)])
+            lines.append(f'    A{i}X{j} [label="{escape_dot(label)}", fillcolor="#ffffff", color="{color}"];')
+            lines.append(f"    A{i} -> A{i}X{j} [style=dashed];")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+# === Pre-laid-out SVG ===
+FONT_SIZE = 14
+LINE_HEIGHT = 20
+CHAR_WIDTH = 7.6      # average glyph width at FONT_SIZE, for sizing boxes without measuring text
+WRAP_CHARS = 42
+PADDING = 12
+GAP = 36              # between topic boxes, room for the arrow
+MIN_BOX_WIDTH = 220
+
+
+def _wrap(text: str, prefix: str = "") -> List[str]:
+    """ Greedy word wrap to WRAP_CHARS; continuation lines are indented under the prefix. """
+    width = WRAP_CHARS - len(prefix)
+    if len(text) <= width and "\n" not in text:
+        return [prefix + text]
+    lines, line = [], ""
+    for word in text.split():
+        while len(word) > width:  # break words too long for a line
+            if line:
+                lines.append(line)
+                line = ""
+            lines.append(word[:width])
+            word = word[width:]
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    indent = " " * len(prefix)
+    return [prefix + lines[0]] + [indent + line for line in lines[1:]]
+
+
+class _Box:
+    """ A laid-out node: title lines, bullet lines and its size. """
+
+    def __init__(self, title: str, items: List[str]):
+        self.title = _wrap(str(title))
+        self.body = [line for item in items for line in _wrap(str(item), "• ")]
+        longest = max(len(line) for line in self.title + self.body)
+        self.width = max(MIN_BOX_WIDTH, longest * CHAR_WIDTH + 2 * PADDING)
+        self.height = (len(self.title) + len(self.body)) * LINE_HEIGHT + 2 * PADDING
+
+    def svg(self, x, y, width, fill, stroke, underline):
+        parts = [f'<rect x="{x:.0f}" y="{y:.0f}" width="{width:.0f}" height="{self.height:.0f}" rx="6" '
+                 f'fill="{fill}" stroke="{stroke}" stroke-width="1.5"/>']
+        baseline = y + PADDING + FONT_SIZE
+        decoration = ' text-decoration="underline"' if underline else ""
+        for n, line in enumerate(self.title):
+            parts.append(f'<text x="{x + width / 2:.0f}" y="{baseline + n * LINE_HEIGHT:.0f}" text-anchor="middle" '
+                         f'font-weight="bold"{decoration}>{escape_xml(line)}</text>')
+        baseline += len(self.title) * LINE_HEIGHT
+        for n, line in enumerate(self.body):
+            parts.append(f'<text x="{x + PADDING:.0f}" y="{baseline + n * LINE_HEIGHT:.0f}" '
+                         f'xml:space="preserve">{escape_xml(line)}</text>')
+        return parts
+
+
+def render_svg(workflow: Workflow, expansions: Expansions = None) -> str:
+    """
+    The flowchart as a standalone SVG, laid out here: topics in one column linked by
+    arrows, an expanded topic's breakdown in a second column with dashed links.
+    No client-side layout or Mermaid JS is needed to show it.
+    """
+    rows = [(_Box(topic, subtopics), [_Box(section, points) for section, points in breakdown])
+            for topic, subtopics, breakdown in _sections(workflow, expansions)]
+    if not rows:
+        return '<svg xmlns="http://www.w3.org/2000/svg" width="0" height="0"/>'
+
+    column = max(box.width for box, _ in rows)
+    extra_column = max((box.width for _, extras in rows for box in extras), default=0)
+    extra_x = GAP / 2 + column + GAP * 1.5
+
+    # Each row is as tall as its topic or its breakdown, whichever is taller; both are centered in it
+    layout, y = [], GAP / 2
+    for box, extras in rows:
+        extras_height = sum(extra.height for extra in extras) + GAP / 2 * max(0, len(extras) - 1)
+        row_height = max(box.height, extras_height)
+        layout.append((y + (row_height - box.height) / 2, y + (row_height - extras_height) / 2))
+        y += row_height + GAP
+
+    parts = []
+    for i, ((box, extras), (top, extra_y)) in enumerate(zip(rows, layout)):
+        color = COLORS[i % len(COLORS)]
+        parts.extend(box.svg(GAP / 2, top, column, color, "#333", underline=True))
+        if i + 1 < len(rows):
+            center = GAP / 2 + column / 2
+            parts.append(f'<path d="M{center:.0f},{top + box.height:.0f} L{center:.0f},{layout[i + 1][0] - 2:.0f}" '
+                         f'stroke="#333" stroke-width="1.5" marker-end="url(#arrow)"/>')
+        for extra in extras:
+            parts.append(f'<path d="M{GAP / 2 + column:.0f},{top + box.height / 2:.0f} '
+                         f'L{extra_x - 2:.0f},{extra_y + extra.height / 2:.0f}" stroke="{color}" stroke-width="1.5" '
+                         f'stroke-dasharray="4 3" fill="none" marker-end="url(#arrow)"/>')
+            parts.extend(extra.svg(extra_x, extra_y, extra_column, "#ffffff", color, underline=False))
+            extra_y += extra.height + GAP / 2
+
+    width = GAP + column + (GAP * 1.5 + extra_column if extra_column else 0)
+    height = y - GAP / 2
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}" font-family="Helvetica, Arial, sans-serif" '
+        f'font-size="{FONT_SIZE}" fill="#222">'
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="9" refY="5" markerWidth="7" markerHeight="7" '
+        'orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10 z" fill="#333"/></marker></defs>'
+        + "".join(parts) + "</svg>"
+    )
+
+
+# === Output for the UI ===
+RENDERERS = {"mermaid": render_mermaid, "dot": render_dot, "svg": render_svg}
+
+
+def render_diagram(workflow: Workflow, expansions: Expansions = None, fmt: str = "mermaid") -> str:
+    """
+    The diagram as Markdown for the UI: a ```mermaid block (drawn by Mermaid JS in
+    the browser), a ```dot block, or the SVG as an inline data-URI image.
+    """
+    source = RENDERERS[fmt](workflow, expansions)
+    if fmt == "svg":
+        encoded = base64.b64encode(source.encode("utf-8")).decode("ascii")
+        return f'<img src="data:image/svg+xml;base64,{encoded}" alt="Study plan diagram"/>'
+    return f"```{fmt}\n{source}\n```"
@@ -0,0 +1,96 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+from cache import normalize_text
+
+# Limits the expansion prompt asks for; longer lists are clamped rather than rejected
+MAX_SECTIONS = 4
+MAX_POINTS = 4
+MAX_TOPIC_RESOURCES = 3
+
+# Expansions are shared by every learner at the same level, so the levels are coarse
+LEARNER_LEVELS = [(12, "child"), (17, "teen")]
+
+
+# === Expansion Schema ===
+class TopicExpansion(BaseModel):
+    breakdown: Dict[str, List[str]]
+    resources: List[str]
+
+
+def learner_level(age: Union[int, float, str, None]) -> str:
+    """ "child", "teen" or "adult": how deep and how plainly a topic is explained. """
+    try:
+        age = int(float(age))
+    except (TypeError, ValueError):
+        return "adult"
+    for upper, label in LEARNER_LEVELS:
+        if age <= upper:
+            return label
+    return "adult"
+
+
+def expansion_key(topic: str, level: str) -> str:
+    """ Cache key shared by every plan that has this topic: "  Deep  Learning " and "deep learning" match. """
+    normalized = ["expansion", normalize_text(topic), level]
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+
+# === Expansion Prompt ===
+EXPANSION_SYSTEM_PROMPT = f"""
+You are a smart educational guide agent expanding one topic of a study plan into a deeper breakdown.
+Always respond in strict JSON.
+
+### Format
+Return {{"breakdown": {{"Subtopic": ["Sub-subtopic", ...], ...}}, "resources": ["..."]}}
+- At most {MAX_SECTIONS} subtopics with at most {MAX_POINTS} short sub-subtopics each
+- At most {MAX_TOPIC_RESOURCES} resources specific to this topic, as "Title - Type by Author"
+- Pitch the breakdown at the learner level given with the topic
+- Do NOT include explanations outside the JSON
+- Do NOT use markdown code blocks like ```json
+"""
+
+
+def build_expansion_messages(topic: str, level: str):
+    # Only the topic and level go in, so the answer can be shared across plans
+    prompt = f"""### Topic
+{topic}
+
+### Learner Level
+{level}"""
+    return [
+        {"role": "system", "content": EXPANSION_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def clamp_expansion(data: Any) -> Any:
+    """ Trim subtopics, sub-subtopics and resources to the limits the prompt asks for. """
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    breakdown = data.get("breakdown")
+    if isinstance(breakdown, dict):
+        data["breakdown"] = {
+            section: points[:MAX_POINTS] if isinstance(points, list) else points
+            for section, points in list(breakdown.items())[:MAX_SECTIONS]
+        }
+    if isinstance(data.get("resources"), list):
+        data["resources"] = data["resources"][:MAX_TOPIC_RESOURCES]
+    return data
+
+
+def format_expansion(topic: str, expansion: Optional[Dict[str, Any]]) -> str:
+    """ Markdown summary of an expansion, shown next to the diagram. """
+    if not expansion:
+        return f"Couldn't expand **{topic}** right now, please try again."
+    lines = [f"#### {topic}"]
+    for section, points in expansion["breakdown"].items():
+        lines.append(f"- **{section}**: {', '.join(points)}")
+    if expansion["resources"]:
+        lines.append("\n**Resources for this topic**")
+        lines.extend(f"- {resource}" for resource in expansion["resources"])
+    return "\n".join(lines)
@@ -0,0 +1,43 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+
+import config
+
+logger = logging.getLogger("learnflow")
+
+
+def _configure():
+    """
+    Log through a queue so request handlers never block on stderr; a listener
+    thread does the writing.
+    """
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(config.LOG_LEVEL)
+    logger.propagate = False
+
+
+_configure()
+
+
+def log_payload(label: str, payload) -> None:
+    """
+    Log a raw model payload at DEBUG, for a sample of LOG_PAYLOAD_SAMPLE_RATE of
+    calls and cut to LOG_PAYLOAD_MAX_CHARS, so full responses stay off the hot path.
+    """
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= config.LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = str(payload)
+    if len(text) > config.LOG_PAYLOAD_MAX_CHARS:
+        text = f"{text[:config.LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
+    logger.debug("%s %s", label, text)
@@ -0,0 +1,209 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# === Metric Types ===
+class Counter:
+    """ Monotonic counter with a fixed set of label names. """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labels, key)), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """ Cumulative-bucket histogram with a fixed set of label names, Prometheus style. """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the wall time of the block. Yields the labels dict so the block can
+        fill in ones only known at the end, e.g. `labels["outcome"] = "complete"`.
+        Also usable as a decorator.
+        """
+        labels = dict(labels)
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in series.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), values[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_count", labels, cumulative))
+            samples.append((f"{self.name}_sum", labels, values[-1]))
+        return samples
+
+
+# === Registry and Text Exposition ===
+class Registry:
+    """
+    Holds the app's metrics plus collectors: callables returning
+    (name, kind, help, [(labels, value), ...]) for stats kept elsewhere
+    (cache, model router, decode counters), read at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """ Everything in the Prometheus text exposition format (version 0.0.4). """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}"
+                         for name, labels, value in metric.samples())
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}"
+                             for labels, value in samples if value is not None)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# === App Metrics ===
+REQUEST_SECONDS = registry.register(Histogram(
+    "learnflow_request_seconds", "End-to-end time of a UI request", ("handler", "outcome")))
+PROMPT_BUILD_SECONDS = registry.register(Histogram(
+    "learnflow_prompt_build_seconds", "Time spent building prompt messages", ("task",)))
+QUEUE_WAIT_SECONDS = registry.register(Histogram(
+    "learnflow_queue_wait_seconds", "Time work waited for a concurrency slot", ("queue",)))
+LLM_TTFT_SECONDS = registry.register(Histogram(
+    "learnflow_llm_ttft_seconds", "Time to the first streamed token", ("model", "task")))
+LLM_LATENCY_SECONDS = registry.register(Histogram(
+    "learnflow_llm_latency_seconds", "Model call time, request to last token", ("model", "task", "outcome")))
+LLM_TOKENS = registry.register(Histogram(
+    "learnflow_llm_tokens", "Tokens per model call, from the API's usage", ("model", "task", "kind"), TOKEN_BUCKETS))
+PARSE_SECONDS = registry.register(Histogram(
+    "learnflow_parse_seconds", "Time to decode and validate a model reply", ("task", "outcome")))
+DIAGRAM_RENDER_SECONDS = registry.register(Histogram(
+    "learnflow_diagram_render_seconds", "Time to render a study plan diagram"))
+SCHEDULER_EVENTS = registry.register(Counter(
+    "learnflow_scheduler_events_total", "Model calls shed, rate limited or retried by the scheduler", ("event", "priority")))
+
+
+class LLMCall:
+    """
+    Records one model call: time to first token (streams only), latency, token usage,
+    and its outcome, which stays "error" unless the caller sets it.
+
+        with LLMCall(model, "plan") as call:
+            for chunk in stream:
+                call.chunk(chunk)
+            call.done()
+            call.outcome = "complete"
+    """
+
+    def __init__(self, model: str, task: str):
+        self.model = model
+        self.task = task
+        self.outcome = "error"
+        self.usage = None
+        self._start = time.perf_counter()
+        self._first_token = None
+        self._latency = None
+
+    def admitted(self) -> None:
+        """ The request is being sent; time spent queued before this isn't model latency. """
+        self._start = time.perf_counter()
+
+    def chunk(self, chunk) -> None:
+        """ Note a streamed chunk: the first one with content sets TTFT; the last carries usage. """
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+        if self._first_token is None and chunk.choices and chunk.choices[0].delta.content:
+            self._first_token = time.perf_counter()
+            LLM_TTFT_SECONDS.observe(self._first_token - self._start, model=self.model, task=self.task)
+
+    def done(self, usage=None) -> None:
+        """ The response is fully received; parsing from here on is not model latency. """
+        self._latency = time.perf_counter() - self._start
+        usage = usage or self.usage
+        if usage is not None:
+            LLM_TOKENS.observe(usage.prompt_tokens or 0, model=self.model, task=self.task, kind="prompt")
+            LLM_TOKENS.observe(usage.completion_tokens or 0, model=self.model, task=self.task, kind="completion")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = "error"
+        latency = self._latency if self._latency is not None else time.perf_counter() - self._start
+        LLM_LATENCY_SECONDS.observe(latency, model=self.model, task=self.task, outcome=self.outcome)
+        return False
@@ -0,0 +1,152 @@
+import json
+import re
+from typing import Any, Optional
+
+_STRING_CHUNK = re.compile(r'[^"\\]+')
+# A trailing incomplete escape ("\\", "\\u00") and/or the high half of a surrogate pair
+_PARTIAL_ESCAPE = re.compile(r'(\\u[dD][89abAB][0-9a-fA-F]{2})?(\\(u[0-9a-fA-F]{0,3})?)?$')
+_LITERAL_CHARS = set("0123456789+-.eEtrufalsn")
+_MISSING = object()
+
+
+class PartialJSONParser:
+    """
+    Incremental JSON parser for streamed model output.
+
+    Text is fed chunk by chunk and every character is scanned exactly once, so
+    parsing a whole streamed response costs the same as one `json.loads`.
+    `snapshot()` returns a best-effort view of the document so far:
+    - objects are visible while still open (keys whose value is incomplete are left out)
+    - strings are visible while still open, so prose fills in as it arrives
+    - arrays only appear once their closing bracket has arrived
+    Anything before the first `{` or `[` (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.root = _MISSING
+        self.done = False
+        self._stack = []          # open containers: [container, pending_key, expecting_key]
+        self._closed = set()      # ids of containers whose closing bracket has been seen
+        self._string = None       # raw (still escaped) text of the string being read
+        self._string_is_key = False
+        self._escape_pending = False  # a backslash ended the previous chunk
+        self._literal = None      # raw text of the number/true/false/null being read
+
+    def feed(self, chunk: str) -> None:
+        i, n = 0, len(chunk)
+        while i < n and not self.done:
+            if self._string is not None:
+                i = self._read_string(chunk, i)
+                continue
+
+            char = chunk[i]
+            if self._literal is not None:
+                if char in _LITERAL_CHARS:
+                    self._literal += char
+                    i += 1
+                    continue
+                self._finish_literal()
+                continue  # re-examine this character
+
+            i += 1
+            if not self._stack and self.root is _MISSING and char not in "{[":
+                continue  # preamble before the JSON document
+            if char in " \t\r\n:":
+                continue
+            if char == "{" or char == "[":
+                container = {} if char == "{" else []
+                self._emit(container)
+                self._stack.append([container, None, char == "{"])
+            elif char == "}" or char == "]":
+                if self._stack:
+                    container = self._stack.pop()[0]
+                    self._closed.add(id(container))
+                    if not self._stack:
+                        self.done = True
+            elif char == ",":
+                if self._stack and isinstance(self._stack[-1][0], dict):
+                    self._stack[-1][2] = True
+            elif char == '"':
+                self._string = ""
+                self._string_is_key = bool(self._stack) and self._stack[-1][2]
+            else:
+                self._literal = char
+
+    def snapshot(self) -> Optional[Any]:
+        if self.root is _MISSING:
+            return None
+        return self._view(self.root)
+
+    # --- internals ---
+    def _read_string(self, chunk, i):
+        if self._escape_pending:
+            self._escape_pending = False
+            self._string += chunk[i]
+            return i + 1
+        match = _STRING_CHUNK.match(chunk, i)
+        if match:
+            self._string += match.group()
+            return match.end()
+        if chunk[i] == "\\":
+            self._string += chunk[i:i + 2]
+            self._escape_pending = i + 1 >= len(chunk)
+            return i + 2
+        # Closing quote
+        value = json.loads(f'"{self._string}"', strict=False)
+        self._string = None
+        if self._string_is_key:
+            self._stack[-1][1] = value
+            self._stack[-1][2] = False
+        else:
+            self._emit(value)
+        return i + 1
+
+    def _finish_literal(self):
+        try:
+            value = json.loads(self._literal)
+        except json.JSONDecodeError:
+            value = None
+        self._literal = None
+        self._emit(value)
+
+    def _emit(self, value):
+        if not self._stack:
+            self.root = value
+            if not isinstance(value, (dict, list)):
+                self.done = True
+            return
+        container, key, _ = self._stack[-1]
+        if isinstance(container, dict):
+            if key is not None:
+                container[key] = value
+                self._stack[-1][1] = None
+        else:
+            container.append(value)
+
+    def _open_string_value(self):
+        """ Decoded text of a string value that is still being streamed, else _MISSING. """
+        if self._string is None or self._string_is_key:
+            return _MISSING
+        for raw in (_PARTIAL_ESCAPE.sub("", self._string), self._string):
+            try:
+                return json.loads(f'"{raw}"', strict=False)
+            except json.JSONDecodeError:
+                continue
+        return _MISSING
+
+    def _view(self, value):
+        if isinstance(value, dict):
+            view = {}
+            for key, item in value.items():
+                if isinstance(item, list) and id(item) not in self._closed:
+                    continue
+                view[key] = self._view(item)
+            # The innermost open object may have a string value in flight.
+            if self._stack and self._stack[-1][0] is value and self._stack[-1][1] is not None:
+                text = self._open_string_value()
+                if text is not _MISSING:
+                    view[self._stack[-1][1]] = text
+            return view
+        if isinstance(value, list):
+            return [self._view(item) for item in value if not isinstance(item, list) or id(item) in self._closed]
+        return value
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional
+
+import metrics
+
+
+class GraspCheckPrefetcher:
+    """
+    Speculatively builds grasp-check questions in the background as soon as a plan
+    is complete, so the resource button usually has its answer ready.
+
+    Prefetches are keyed by plan id. They are bounded so they can't starve
+    foreground requests: at most `max_concurrent` run at once, at most
+    `max_pending` are queued or running (further plans are simply not prefetched),
+    and finished results are held for up to `ttl` seconds, the oldest evicted first
+    once `max_pending` entries are held.
+    """
+
+    def __init__(self, build: Callable[..., Awaitable[List[str]]], max_concurrent: int = 4,
+                 max_pending: int = 64, ttl: float = 900):
+        self.build = build
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks = {}  # plan_id -> (started_at, task)
+        self._running = set()  # plan ids whose prefetch got past the concurrency limit
+        self.started = 0
+        self.used = 0
+        self.skipped = 0
+        self.discarded = 0
+
+    def start(self, plan_id: str, reason: str, outcome: str, resources: List[str]) -> bool:
+        """ Schedule a prefetch on the running event loop. Returns False if it was skipped. """
+        self._expire()
+        if plan_id in self._tasks:
+            return True
+        if sum(not task.done() for _, task in self._tasks.values()) >= self.max_pending:
+            self.skipped += 1
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self._evict_finished()
+
+        task = asyncio.get_running_loop().create_task(
+            self._run(plan_id, reason, outcome, resources, time.monotonic())
+        )
+        # Mark failures as retrieved so unused prefetches don't log "exception never retrieved".
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._tasks[plan_id] = (time.monotonic(), task)
+        self.started += 1
+        return True
+
+    async def result(self, plan_id: str) -> Optional[List[str]]:
+        """
+        Questions for `plan_id`, waiting on the prefetch if it is still running.
+        Returns None if nothing was prefetched, the prefetch failed, or it was still
+        queued behind other prefetches; the caller then builds the questions itself,
+        rather than waiting its turn at background priority.
+        """
+        entry = self._tasks.pop(plan_id, None)
+        if entry is None:
+            return None
+        if plan_id not in self._running and not entry[1].done():
+            entry[1].cancel()
+            self.discarded += 1
+            return None
+        try:
+            questions = await entry[1]
+        except Exception:
+            return None
+        self.used += 1
+        return questions
+
+    def discard(self, plan_id: str) -> None:
+        """ Cancel and forget a prefetch, e.g. because feedback replaced the plan. """
+        self._running.discard(plan_id)
+        entry = self._tasks.pop(plan_id, None)
+        if entry is not None:
+            entry[1].cancel()
+            self.discarded += 1
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._tasks),
+            "started": self.started,
+            "used": self.used,
+            "skipped": self.skipped,
+            "discarded": self.discarded,
+        }
+
+    async def _run(self, plan_id, reason, outcome, resources, queued_at):
+        async with self._semaphore:
+            metrics.QUEUE_WAIT_SECONDS.observe(time.monotonic() - queued_at, queue="prefetch")
+            self._running.add(plan_id)
+            try:
+                return await self.build(reason, outcome, resources)
+            finally:
+                self._running.discard(plan_id)
+
+    def _evict_finished(self):
+        # Entries are in start order, so the first finished one is the oldest unclaimed result
+        oldest = next(plan_id for plan_id, (_, task) in self._tasks.items() if task.done())
+        self.discard(oldest)
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        for plan_id in [plan_id for plan_id, (started_at, _) in self._tasks.items() if started_at < deadline]:
+            self.discard(plan_id)
@@ -0,0 +1,150 @@
+from typing import List, Optional
+
+# Every prompt keeps its static instructions, schema and example in the system
+# message and only the per-user fields in the user message, so all requests of a
+# task share one identical leading prefix that the provider can cache.
+PROMPT_VARIANTS = ("full", "compact")
+
+
+# === Study Plan Prompt ===
+PLAN_SYSTEM_PROMPT = """
+You are a smart educational guide agent and an expert curriculum advisor.
+You help people figure out what to learn next based on their age, background, and interests.
+Be adaptive: if input is too vague, ask for clarification. If it's clear, give them:
+1. A study_workflow - a roadmap of topics and subtopics.
+2. A reason why it's the right path for the user.
+3. An expected outcome after finishing this learning path.
+4. Beginner-friendly resources.
+Use simple and clear language.
+Always respond in strict JSON.
+
+### Your Task:
+Generate a structured learning plan for the user profile in the next message, in **strict JSON format only**, without any extra text or markdown.
+
+Your output must include:
+1. **study_workflow**: a Python-style dictionary (JSON-safe)
+- Keys: main topics relevant to the user's profile
+- Values: 2–5 subtopics per main topic, written as a list of strings ordered from beginner to advanced
+
+2. **reason**: 3-4 clear sentence explaining "why" this path fits the user's background and interests. Avoid overly technical or overly vague language. Match the tone to their background.
+3. **expected_outcome**: 3–4 sentences describing what the user will *be able to do* by the end. Be specific, realistic, and motivating. Avoid overly technical or overly vague language. Match the tone to their background.
+4. **resources**: list of 3–4 beginner-friendly materials
+
+### VERY IMPORTANT:
+- Talk directly to the user, not in third person.
+- Do NOT return more than 5 main topics
+- Do NOT return more than 5 subtopics per main topic
+- Do NOT return more than 3 resources
+- Do NOT include explanations outside the JSON
+- Do NOT use markdown code blocks like ```json
+- Only output valid JSON
+
+### Output Example:
+{
+    "study_workflow": {
+    "Start with Python": ["Variables and Data Types", "Loops", "Functions", "Error Handling"],
+    "Data Structures": ["Lists", "Dictionaries", "Tuples", "Sets"],
+    "NumPy": ["Arrays", "Array Operations", "Broadcasting"],
+    "Pandas": ["Series and DataFrames", "Filtering and Sorting", "Basic Data Cleaning"],
+    "Matplotlib": ["Line Charts", "Bar Charts", "Histograms"]
+    },
+    "reason": "Since you are new to programming and interested in data-related topics, this plan starts with Python basics and gradually introduces tools used in real data analysis projects.",
+    "expected_outcome": "After completing this plan, you will understand the fundamentals of Python and be able to explore and analyze real-world datasets using tools like Pandas and Matplotlib. You wil be able to write small scripts to automate tasks, clean data, and create visual summaries.",
+    "resources": [
+        "Python for Beginners - YouTube by freeCodeCamp",
+        "CS50’s Introduction to Computer Science",
+        "Kaggle: Python Course"
+    ]
+}
+
+### If the user profile is too vague to proceed:
+Return this JSON instead:
+{
+"follow_up_question": "Ask a specific question to clarify what the user needs"
+}
+"""
+
+# Same contract in about a third of the tokens: the schema inline instead of a worked example
+PLAN_SYSTEM_PROMPT_COMPACT = """
+You are an educational guide. For the user profile in the next message, return a study plan as strict JSON only, no markdown:
+{"study_workflow": {"Topic": ["Subtopic", ...]}, "reason": "...", "expected_outcome": "...", "resources": ["Title - Type by Author"]}
+- study_workflow: at most 5 topics, 2-5 subtopics each, ordered beginner to advanced
+- reason: 3-4 sentences on why this path fits their background and interests
+- expected_outcome: 3-4 specific, realistic sentences on what they will be able to do
+- resources: at most 3 beginner-friendly materials
+- Talk to the user directly, in simple language matched to their background
+If the profile is too vague, return {"follow_up_question": "Ask a specific question to clarify what the user needs"} instead.
+"""
+
+PLAN_SYSTEM_PROMPTS = {"full": PLAN_SYSTEM_PROMPT, "compact": PLAN_SYSTEM_PROMPT_COMPACT}
+
+
+def build_profile_prompt(age, background, interest, feedback: Optional[str] = None) -> str:
+    """ The per-user part of a plan request. """
+    lines = [
+        "### User Profile",
+        f"- Age: {age}",
+        f"- Educational Background: {background}",
+        f"- Interests: {interest}",
+    ]
+    if feedback:
+        lines.append(f"- Additional Feedback from User: {feedback}")
+    return "\n".join(lines)
+
+
+def plan_messages(age, background, interest, feedback: Optional[str] = None, variant: str = "full"):
+    return [
+        {"role": "system", "content": PLAN_SYSTEM_PROMPTS[variant]},
+        {"role": "user", "content": build_profile_prompt(age, background, interest, feedback)},
+    ]
+
+
+# === Grasp Check Prompt ===
+GRASP_CHECK_SYSTEM_PROMPT = """
+You are a question setter whose objective is to test learners' overall understanding of the topic, not specifics.
+You are a helpful AI tutor. The next message says why the user is learning, the outcome they want, and the resources they have.
+Please generate 5 to 10 short questions that the user could answer after studying these materials, to check their overall understanding.
+Return only JSON in this format: {"questions": ["...", "..."]}
+"""
+
+# The outcome and resources are enough to pitch the questions; the reason is left out
+GRASP_CHECK_SYSTEM_PROMPT_COMPACT = """
+You are a question setter testing a learner's overall understanding, not specifics.
+Return 5-10 short questions they could answer after reaching the outcome with the resources in the next message, as strict JSON only: {"questions": ["..."]}
+"""
+
+GRASP_CHECK_SYSTEM_PROMPTS = {"full": GRASP_CHECK_SYSTEM_PROMPT, "compact": GRASP_CHECK_SYSTEM_PROMPT_COMPACT}
+
+
+def build_grasp_check_prompt(reason: str, outcome: str, resources: List[str], variant: str = "full") -> str:
+    """ The per-plan part of a grasp-check request, with the resources one per line. """
+    sections = [] if variant == "compact" else [f"### Why They Are Learning\n{reason}"]
+    sections.append(f"### Desired Outcome\n{outcome}")
+    sections.append("### Resources\n" + "\n".join(f"- {resource}" for resource in resources))
+    return "\n\n".join(sections)
+
+
+def grasp_check_messages(reason: str, outcome: str, resources: List[str], variant: str = "full"):
+    return [
+        {"role": "system", "content": GRASP_CHECK_SYSTEM_PROMPTS[variant]},
+        {"role": "user", "content": build_grasp_check_prompt(reason, outcome, resources, variant)},
+    ]
+
+
+# === Clarification Prompt ===
+# Borderline profiles (see utils.detect_vagueness) are checked by the fast model first
+CLARIFY_SYSTEM_PROMPT = """
+You are a smart educational guide agent.
+Decide whether a learner profile is specific enough to recommend concrete study topics.
+If the profile in the next message is specific enough to suggest concrete topics, return {"clear": true}.
+Otherwise return {"follow_up_question": "Ask a specific question to clarify what the user needs"}.
+Talk directly to the user. Do NOT include explanations outside the JSON.
+Always respond in strict JSON.
+"""
+
+
+def clarify_messages(age, background, interest):
+    return [
+        {"role": "system", "content": CLARIFY_SYSTEM_PROMPT},
+        {"role": "user", "content": build_profile_prompt(age, background, interest)},
+    ]
@@ -0,0 +1,119 @@
+import json
+from typing import Dict, List, Literal, Optional, Set, Union
+
+from pydantic import BaseModel
+
+PLAN_FIELDS = ("study_workflow", "reason", "expected_outcome", "resources")
+
+# Which plan fields each `interpret_feedback` tag may touch. Feedback that
+# matches no tag is free-form, so every field stays editable.
+FEEDBACK_FIELDS = {
+    "make it easier": {"study_workflow", "reason", "expected_outcome"},
+    "increase complexity": {"study_workflow", "reason", "expected_outcome"},
+    "expand resources": {"resources"},
+    "add outcome": {"expected_outcome"},
+}
+
+
+# === Patch Schema ===
+class PatchOperation(BaseModel):
+    op: Literal["add_topic", "remove_topic", "rename_topic", "set_subtopics", "set_field"]
+    topic: Optional[str] = None
+    new_topic: Optional[str] = None
+    subtopics: Optional[List[str]] = None
+    position: Optional[int] = None
+    field: Optional[Literal["reason", "expected_outcome", "resources"]] = None
+    value: Optional[Union[str, List[str]]] = None
+
+
+class PlanPatch(BaseModel):
+    operations: List[PatchOperation]
+
+
+def revision_fields(interpretation: str) -> Set[str]:
+    """ Fields a revision may change, given the output of `interpret_feedback`. """
+    tags = [tag.strip() for tag in interpretation.split(",")]
+    fields = set()
+    for tag in tags:
+        fields |= FEEDBACK_FIELDS.get(tag, set())
+    return fields or set(PLAN_FIELDS)
+
+
+# === Revision Prompt ===
+REVISION_SYSTEM_PROMPT = """
+You are a smart educational guide agent revising a study plan you already gave the user.
+Do NOT rewrite the plan. Return only a compact JSON patch with the changes the feedback asks for.
+Always respond in strict JSON.
+
+### Patch Format
+Return {"operations": [...]} using only these operations:
+- {"op": "add_topic", "topic": "...", "subtopics": ["..."], "position": 0}
+- {"op": "remove_topic", "topic": "..."}
+- {"op": "rename_topic", "topic": "...", "new_topic": "..."}
+- {"op": "set_subtopics", "topic": "...", "subtopics": ["..."]}
+- {"op": "set_field", "field": "reason" | "expected_outcome" | "resources", "value": ...}
+
+### VERY IMPORTANT:
+- Only include operations for what the feedback asks to change
+- Only change the fields listed under "Fields You May Change"
+- Topic operations change study_workflow; "topic" must match an existing topic exactly
+- Keep at most 5 main topics, 5 subtopics per topic and 3 resources
+- Talk directly to the user in any text you rewrite
+- Do NOT include explanations outside the JSON
+- Do NOT use markdown code blocks like ```json
+"""
+
+
+def build_revision_messages(plan: Dict, feedback: str, allowed: Set[str]):
+    # The patch format is in the system prompt, shared by every revision request
+    allowed_list = ", ".join(field for field in PLAN_FIELDS if field in allowed)
+    prompt = f"""### Current Plan
+{json.dumps(plan, ensure_ascii=False)}
+
+### User Feedback
+{feedback}
+
+### Fields You May Change
+{allowed_list}"""
+    return [
+        {"role": "system", "content": REVISION_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+# === Patch Application ===
+def apply_plan_patch(plan: Dict, patch: PlanPatch, allowed: Set[str]) -> Dict:
+    """
+    Apply `patch` to a plan dict and return the revised copy. Raises ValueError
+    for operations that touch a disallowed field or a topic that doesn't exist,
+    so the caller can fall back to regenerating the whole plan.
+    """
+    revised = {**plan, "study_workflow": dict(plan["study_workflow"])}
+    workflow = revised["study_workflow"]
+
+    for operation in patch.operations:
+        if operation.op == "set_field":
+            if operation.field not in allowed:
+                raise ValueError(f"Patch changes '{operation.field}', which this feedback may not change")
+            revised[operation.field] = operation.value
+            continue
+
+        if "study_workflow" not in allowed:
+            raise ValueError("Patch changes study_workflow, which this feedback may not change")
+        if operation.op == "add_topic":
+            items = list(workflow.items())
+            position = len(items) if operation.position is None else operation.position
+            items.insert(position, (operation.topic, operation.subtopics or []))
+            workflow = dict(items)
+        elif operation.topic not in workflow:
+            raise ValueError(f"Patch refers to unknown topic '{operation.topic}'")
+        elif operation.op == "remove_topic":
+            del workflow[operation.topic]
+        elif operation.op == "rename_topic":
+            workflow = {operation.new_topic if topic == operation.topic else topic: subtopics
+                        for topic, subtopics in workflow.items()}
+        elif operation.op == "set_subtopics":
+            workflow[operation.topic] = operation.subtopics or []
+
+    revised["study_workflow"] = workflow
+    return revised
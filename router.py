@@ -0,0 +1,63 @@
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+class ModelRouter:
+    """
+    Maps each task (plan, grasp_check, clarify, revision) to a model tier and
+    keeps per-tier latency samples.
+
+    `models_for(task)` returns the models to try in order: the task's own tier
+    first, then the "large" tier as a fallback when the cheaper model's output
+    doesn't validate.
+    """
+
+    def __init__(self, tiers: Dict[str, str], routes: Dict[str, str], samples: int = 1000):
+        self.tiers = tiers              # tier -> model name
+        self.routes = routes            # task -> tier
+        self._tier_of = {model: tier for tier, model in tiers.items()}
+        self._latencies = {tier: deque(maxlen=samples) for tier in tiers}
+        self._calls = {tier: 0 for tier in tiers}
+        self._fallbacks = {tier: 0 for tier in tiers}
+        self._lock = threading.Lock()
+
+    def model_for(self, task: str) -> str:
+        return self.tiers[self.routes.get(task, "large")]
+
+    def models_for(self, task: str) -> List[str]:
+        model = self.model_for(task)
+        return [model] if model == self.tiers["large"] else [model, self.tiers["large"]]
+
+    def record_fallback(self, model: str) -> None:
+        with self._lock:
+            self._fallbacks[self._tier_of.get(model, "large")] += 1
+
+    @contextmanager
+    def timed(self, model: str):
+        """ Record the wall time of the block against `model`'s tier. """
+        start = time.perf_counter()
+        try:
+            yield model
+        finally:
+            tier = self._tier_of.get(model, "large")
+            with self._lock:
+                self._latencies[tier].append(time.perf_counter() - start)
+                self._calls[tier] += 1
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            report = {}
+            for tier, samples in self._latencies.items():
+                ordered = sorted(samples)
+                report[tier] = {
+                    "model": self.tiers[tier],
+                    "calls": self._calls[tier],
+                    "fallbacks": self._fallbacks[tier],
+                    "p50": statistics.median(ordered) if ordered else None,
+                    "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else None,
+                }
+            return report
@@ -0,0 +1,248 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+import metrics
+
+INTERACTIVE = 0  # a user is waiting on the result
+BACKGROUND = 1   # speculative work, e.g. grasp-check prefetch
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+T = TypeVar("T")
+
+
+class Overloaded(Exception):
+    """ Raised instead of queueing a request that would wait too long; callers serve a fallback. """
+
+
+def retry_after_seconds(error) -> Optional[float]:
+    """ The server's requested delay from a 429's Retry-After (seconds or HTTP date) header, if any. """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    """
+    Client-side admission control for model calls.
+
+    - Token buckets sized from `rpm` and `tpm` (0 = unlimited) pace requests; a
+      request reserves its estimated prompt + completion tokens.
+    - Background work only goes ahead while no interactive request is waiting,
+      so user-facing requests overtake queued prefetches.
+    - A 429 pauses every caller until its Retry-After (at most `backoff_max`) and
+      halves the pacing rate, which recovers gradually on success. 429s, timeouts,
+      connection errors and 5xx are retried up to `max_retries` times with jittered backoff.
+    - Requests that find `max_queue` others waiting (half that for background
+      work) or whose wait, backoffs included, would exceed `max_wait` raise
+      `Overloaded` at once.
+
+    Works for both sync callers (threads) and async callers (event loop).
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_queue: int = 64, max_wait: float = 20,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 20):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._requests = float(rpm)            # bucket levels; capacity is one minute of budget
+        self._tokens = float(tpm)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._scale = 1.0                      # adaptive share of the configured rate
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._lock = threading.Lock()
+        self.counts = {"granted": 0, "shed": 0, "rate_limited": 0, "retried": 0}
+
+    # --- Admission ---
+    def acquire(self, tokens: int = 0, priority: int = INTERACTIVE, max_wait: Optional[float] = None) -> None:
+        """ Block the calling thread until the request may be sent; `max_wait` overrides the scheduler's. """
+        queued_at = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_grant(priority, queued_at, tokens, max_wait)
+                if wait == 0:
+                    return
+                time.sleep(wait)
+        finally:
+            self._leave(priority)
+
+    async def aacquire(self, tokens: int = 0, priority: int = INTERACTIVE, max_wait: Optional[float] = None) -> None:
+        """ Async version of `acquire`. """
+        queued_at = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_grant(priority, queued_at, tokens, max_wait)
+                if wait == 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            self._leave(priority)
+
+    # --- Calls with retries ---
+    def call(self, send: Callable[[], T], tokens: int = 0, priority: int = INTERACTIVE) -> T:
+        """
+        `send()` once admitted, retrying rate limits and transient errors. Time spent
+        queueing and backing off counts against `max_wait`: a retry that would overrun
+        it raises `Overloaded` instead of sleeping.
+        """
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            queued_at = time.monotonic()
+            self.acquire(tokens, priority, self.max_wait - waited)
+            waited += time.monotonic() - queued_at
+            try:
+                result = send()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt, waited, priority)
+                time.sleep(delay)
+                waited += delay
+                continue
+            self._succeeded()
+            return result
+
+    async def acall(self, send: Callable[[], Awaitable[T]], tokens: int = 0, priority: int = INTERACTIVE) -> T:
+        """ Async version of `call`. """
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            queued_at = time.monotonic()
+            await self.aacquire(tokens, priority, self.max_wait - waited)
+            waited += time.monotonic() - queued_at
+            try:
+                result = await send()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt, waited, priority)
+                await asyncio.sleep(delay)
+                waited += delay
+                continue
+            self._succeeded()
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counts, "waiting": sum(self._waiting.values()), "rate_scale": self._scale}
+
+    # --- Internals ---
+    def _enqueue(self, priority):
+        with self._lock:
+            limit = self.max_queue if priority == INTERACTIVE else self.max_queue // 2
+            if sum(self._waiting.values()) >= limit:
+                self._shed(priority)
+            self._waiting[priority] += 1
+            return time.monotonic()
+
+    def _leave(self, priority):
+        with self._lock:
+            self._waiting[priority] -= 1
+
+    def _shed(self, priority):
+        self.counts["shed"] += 1
+        metrics.SCHEDULER_EVENTS.inc(event="shed", priority=PRIORITY_NAMES.get(priority, priority))
+        raise Overloaded("Too many requests are waiting for the model")
+
+    def _try_grant(self, priority, queued_at, tokens, max_wait=None) -> float:
+        """ 0 if the request was admitted, else how long to sleep before asking again. """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                wait = self._paused_until - now
+            elif any(self._waiting[other] for other in self._waiting if other < priority):
+                wait = 0.05  # a more urgent request is waiting, let it go first
+            else:
+                wait = self._bucket_wait(tokens)
+            if now - queued_at + wait > (self.max_wait if max_wait is None else max_wait):
+                self._shed(priority)
+            if wait:
+                return min(wait, 0.25)
+
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= min(tokens, self.tpm)
+            self.counts["granted"] += 1
+            metrics.QUEUE_WAIT_SECONDS.observe(now - queued_at, queue=f"llm_{PRIORITY_NAMES.get(priority, priority)}")
+            return 0
+
+    def _refill(self, now):
+        elapsed, self._refilled = now - self._refilled, now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm * self._scale / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm * self._scale / 60)
+
+    def _bucket_wait(self, tokens):
+        wait = 0.0
+        if self.rpm and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / (self.rpm * self._scale))
+        needed = min(tokens, self.tpm)
+        if self.tpm and self._tokens < needed:
+            wait = max(wait, (needed - self._tokens) * 60 / (self.tpm * self._scale))
+        return wait
+
+    def _backoff(self, error, attempt) -> float:
+        """
+        Delay before retry `attempt`: Retry-After plus jitter for 429s, else full-jitter
+        exponential; either way at most `backoff_max`.
+        """
+        delay = retry_after_seconds(error) if isinstance(error, RateLimitError) else None
+        if delay is not None:
+            delay = min(self.backoff_max, delay * random.uniform(1.0, 1.25))
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+        with self._lock:
+            self.counts["retried"] += 1
+            metrics.SCHEDULER_EVENTS.inc(event="retried", priority="any")
+            if isinstance(error, RateLimitError):
+                self.counts["rate_limited"] += 1
+                metrics.SCHEDULER_EVENTS.inc(event="rate_limited", priority="any")
+                # Everyone waits out the limit, and pacing slows down until calls succeed again
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._scale = max(0.1, self._scale / 2)
+        return delay
+
+    def _retry_delay(self, error, attempt, waited, priority) -> float:
+        """ The backoff before the next attempt; sheds the request if it would overrun `max_wait`. """
+        delay = self._backoff(error, attempt)  # a 429's pause applies to every caller either way
+        if waited + delay > self.max_wait:
+            with self._lock:
+                self._shed(priority)
+        return delay
+
+    def _succeeded(self):
+        with self._lock:
+            self._scale = min(1.0, self._scale + 0.05)
@@ -0,0 +1,253 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from cache import bucket_age, normalize_text
+
+# === Profile Embedding ===
+# Common abbreviations, expanded so "CSE grad, ML" lands next to "computer science
+# engineering graduate, machine learning"
+ABBREVIATIONS = {
+    "cs": "computer science", "cse": "computer science engineering", "ce": "computer engineering",
+    "ee": "electrical engineering", "ece": "electronics communication engineering",
+    "it": "information technology", "ml": "machine learning", "ai": "artificial intelligence",
+    "dl": "deep learning", "rl": "reinforcement learning", "cv": "computer vision",
+    "nlp": "natural language processing", "llm": "large language model", "llms": "large language models",
+    "genai": "generative ai", "ds": "data science", "dsa": "data structures algorithms",
+    "db": "database", "os": "operating systems", "ui": "user interface", "ux": "user experience",
+    "grad": "graduate", "undergrad": "undergraduate", "ug": "undergraduate", "pg": "postgraduate",
+    "btech": "bachelor technology", "mtech": "master technology", "bsc": "bachelor science",
+    "msc": "master science", "phd": "doctorate", "hs": "high school",
+    # Languages whose names are mostly symbols; "c++" must not reduce to "c"
+    "c++": "cplusplus", "cpp": "cplusplus", "c#": "csharp", "f#": "fsharp", "j#": "jsharp",
+}
+STOP_WORDS = {"a", "an", "and", "or", "the", "of", "in", "on", "for", "with", "to", "at",
+              "i", "im", "am", "my", "me", "want", "like", "interested", "into", "about"}
+NGRAM_SIZES = (3, 4, 5)
+INTEREST_WEIGHT = 0.65  # interests shape the plan more than background does
+# Bumped whenever embed_profile changes; stored plans from another version are dropped
+EMBEDDING_VERSION = 2
+
+
+WORD_SYMBOLS = "+#"  # kept inside words: "c++" and "c#" are different words from "c"
+
+
+def profile_words(text: Optional[str]):
+    words = "".join(ch if ch.isalnum() or ch in WORD_SYMBOLS else " " for ch in normalize_text(text)).split()
+    expanded = " ".join(ABBREVIATIONS.get(word, word) for word in words).split()
+    return [word for word in expanded if word not in STOP_WORDS]
+
+
+def embed_text(text: Optional[str], dim: int) -> np.ndarray:
+    """
+    Hashed character n-gram vector (signed feature hashing, sublinear term
+    frequency), L2-normalized. Robust to word order, plurals and small typos.
+    """
+    counts = {}
+    for word in profile_words(text):
+        padded = f" {word} "
+        grams = [padded[i:i + n] for n in NGRAM_SIZES for i in range(len(padded) - n + 1)] or [padded]
+        for gram in grams + [word]:
+            counts[gram] = counts.get(gram, 0) + 1
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for gram, count in counts.items():
+        h = zlib.crc32(gram.encode("utf-8"))
+        vector[h % dim] += (1.0 + np.log(count)) * (1 if h & 0x80000000 else -1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_profile(background: Optional[str], interest: Optional[str], dim: int) -> np.ndarray:
+    vector = INTEREST_WEIGHT * embed_text(interest, dim) + (1 - INTEREST_WEIGHT) * embed_text(background, dim)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def profile_id(age, background: Optional[str], interest: Optional[str]) -> str:
+    return json.dumps([bucket_age(age), normalize_text(background), normalize_text(interest)])
+
+
+# === Index ===
+class _Shard:
+    """ The vectors of one age bucket, in insertion order. """
+
+    def __init__(self, bucket: str, dim: int):
+        self.bucket = bucket
+        self.vectors = np.zeros((256, dim), dtype=np.float32)
+        self.profiles = []   # row -> profile id
+        self.next_row = 0    # oldest row, replaced first once the index is full
+
+    def append(self, profile: str) -> int:
+        row = len(self.profiles)
+        if row == len(self.vectors):
+            self.vectors = np.resize(self.vectors, (row * 2, self.vectors.shape[1]))
+        self.profiles.append(profile)
+        return row
+
+
+class SimilarityIndex:
+    """
+    Nearest-profile lookup over stored study plans.
+
+    Every profile is embedded with `embed_profile`. Profiles are sharded by age
+    bucket, since plans aren't shared across ages, so a search is one matrix-vector
+    product over that bucket's vectors. Plans and vectors persist in SQLite (pass
+    `path=None` for memory only) and are loaded back at start-up; only the vectors
+    stay resident. Past `max_entries`, the oldest profiles are replaced first.
+    Stored vectors are loaded on first use, or by `preload`.
+    """
+
+    def __init__(self, path: Optional[str] = None, dim: int = 256, threshold: float = 0.9,
+                 max_entries: int = 200000):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._shards = {}          # age bucket -> _Shard
+        self._rows = {}            # profile id -> (shard, row)
+        self._plans = {}           # profile id -> plan, memory-only indexes
+        self._lock = threading.Lock()
+        self._loaded = not path
+        self.hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                " profile TEXT PRIMARY KEY, vector BLOB NOT NULL,"
+                " plan TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != EMBEDDING_VERSION:
+                self._db.execute("DELETE FROM plans")  # vectors from an older embedding don't compare
+                self._db.execute(f"PRAGMA user_version = {EMBEDDING_VERSION}")
+            self._db.commit()
+
+    def preload(self) -> None:
+        """ Load the stored vectors now instead of on the first add or search. """
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def __len__(self) -> int:
+        self.preload()
+        return len(self._rows)
+
+    def add(self, age, background: str, interest: str, plan: Dict[str, Any]) -> None:
+        """ Store (or replace) the plan for a profile. """
+        self.preload()
+        profile = profile_id(age, background, interest)
+        vector = embed_profile(background, interest, self.dim)
+        with self._lock:
+            shard, row = self._place(profile, bucket_age(age))
+            shard.vectors[row] = vector
+            if self._db is None:
+                self._plans[profile] = plan
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO plans (profile, vector, plan, updated) VALUES (?, ?, ?, ?)",
+                (profile, vector.tobytes(), json.dumps(plan), time.time()),
+            )
+            self._db.commit()
+
+    def search(self, age, background: str, interest: str,
+               threshold: Optional[float] = None) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """ (similarity, plan) of the closest stored profile of the same age bucket, if it clears `threshold`. """
+        self.preload()
+        threshold = self.threshold if threshold is None else threshold
+        query = embed_profile(background, interest, self.dim)
+        with self._lock:
+            shard = self._shards.get(bucket_age(age))
+            count = len(shard.profiles) if shard else 0
+            vectors = shard.vectors if shard else None
+        if count == 0:
+            self.misses += 1
+            return None
+
+        scores = vectors[:count] @ query
+        row = int(np.argmax(scores))
+        score = float(scores[row])
+        with self._lock:
+            profile = shard.profiles[row] if score >= threshold and row < len(shard.profiles) else None
+        plan = self._plan(profile) if profile else None
+        if plan is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return score, plan
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _place(self, profile, bucket):
+        """ (shard, row) for `profile`: its existing row, a new one, or a replaced one once full. """
+        found = self._rows.get(profile)
+        if found is not None:
+            return found
+        shard = self._shards.get(bucket)
+        if shard is None:
+            shard = self._shards[bucket] = _Shard(bucket, self.dim)
+
+        if len(self._rows) >= self.max_entries:
+            if shard.profiles:
+                row = shard.next_row % len(shard.profiles)
+                shard.next_row = row + 1
+                self._forget(shard.profiles[row])
+                shard.profiles[row] = profile
+                self._rows[profile] = (shard, row)
+                return shard, row
+            self._drop_oldest(max(self._shards.values(), key=lambda other: len(other.profiles)))
+
+        self._rows[profile] = (shard, shard.append(profile))
+        return self._rows[profile]
+
+    def _drop_oldest(self, shard):
+        """ Remove `shard`'s oldest row, moving its last row into the gap. """
+        row = shard.next_row % len(shard.profiles)
+        self._forget(shard.profiles[row])
+        last = len(shard.profiles) - 1
+        if row != last:
+            shard.vectors[row] = shard.vectors[last]
+            shard.profiles[row] = shard.profiles[last]
+            self._rows[shard.profiles[row]] = (shard, row)
+        shard.profiles.pop()
+
+    def _forget(self, profile):
+        del self._rows[profile]
+        self._plans.pop(profile, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM plans WHERE profile = ?", (profile,))
+
+    def _plan(self, profile):
+        if self._db is None:
+            return self._plans.get(profile)
+        with self._lock:
+            found = self._db.execute("SELECT plan FROM plans WHERE profile = ?", (profile,)).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT profile, vector FROM plans ORDER BY updated DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for profile, blob in reversed(rows):
+            vector = np.frombuffer(blob, dtype=np.float32)
+            if vector.shape != (self.dim,):
+                continue  # written with another LEARNFLOW_SIMILARITY_DIM; it will be re-added
+            shard, row = self._place(profile, json.loads(profile)[0])
+            shard.vectors[row] = vector
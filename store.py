@@ -0,0 +1,204 @@
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from logs import logger
+
+
+class PlanStore:
+    """
+    Durable store of generated plans, keyed by their plan id, so a plan can be
+    reopened (page reload, shared link) without a model call.
+
+    Each plan keeps its plan state (workflow, reason, outcome, resources,
+    expansions), the rendered diagram, its grasp-check questions once there are
+    some, and the id of the plan it revised. Writes never touch SQLite on the
+    caller's thread: they are queued and committed in batches of up to
+    `batch_size` by a writer thread, at least every `flush_interval` seconds.
+    Queued writes are visible to `get` straight away.
+
+    Retention: plans not opened for `retention` seconds are deleted, as are the
+    least recently opened ones beyond `max_plans`, every `compact_interval`
+    seconds. Pass `path=None` for a memory-only store.
+    """
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = 64, flush_interval: float = 0.5,
+                 retention: float = 90 * 24 * 3600, max_plans: int = 500000, compact_interval: float = 3600):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.max_plans = max_plans
+        self.compact_interval = compact_interval
+        self._queue = queue.Queue()
+        self._pending = {}   # plan_id -> record not yet committed
+        self._writing = {}   # plan_id -> record being committed by the writer
+        self._lock = threading.Lock()      # guards _pending and _writing only, never held during SQL
+        self._db_lock = threading.Lock()   # guards _db
+        self._compacted = time.monotonic()
+        self.counts = {"writes": 0, "batches": 0, "reads": 0, "read_misses": 0, "deleted": 0}
+
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")  # takes effect on new files only
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " plan_id TEXT PRIMARY KEY, parent_id TEXT, plan TEXT NOT NULL, diagram TEXT,"
+            " questions TEXT, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS plans_accessed ON plans (accessed)")
+        self._db.commit()
+        # WAL lets reads run on their own connection while the writer commits
+        self._read_db = sqlite3.connect(path, check_same_thread=False) if path else self._db
+        self._read_lock = threading.Lock() if path else self._db_lock
+
+        self._writer = threading.Thread(target=self._run, name="plan-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # --- Writes (queued) ---
+    def save_plan(self, plan_state: Dict[str, Any], diagram: Optional[str] = None,
+                  parent_id: Optional[str] = None) -> None:
+        """ Record a plan, or update it (e.g. after a topic expansion); questions and parent are kept. """
+        now = time.time()
+        plan_id = plan_state["plan_id"]
+        self._enqueue(plan_id, {"plan": plan_state, "diagram": diagram, "parent_id": parent_id, "time": now})
+
+    def save_questions(self, plan_id: str, questions: List[str]) -> None:
+        self._enqueue(plan_id, {"questions": questions, "time": time.time()})
+
+    def _enqueue(self, plan_id, fields):
+        with self._lock:
+            pending = self._pending.setdefault(plan_id, {})
+            pending.update({name: value for name, value in fields.items() if value is not None})
+        self._queue.put(plan_id)
+
+    # --- Reads ---
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """ {"plan", "diagram", "questions", "parent_id"} for a plan id, or None if unknown or expired. """
+        with self._lock:
+            pending = {**self._writing.get(plan_id, {}), **self._pending.get(plan_id, {})}
+        with self._read_lock:
+            row = self._read_db.execute(
+                "SELECT plan, diagram, questions, parent_id FROM plans WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+        record = {}
+        if row is not None:
+            record = {"plan": json.loads(row[0]), "diagram": row[1],
+                      "questions": json.loads(row[2]) if row[2] else None, "parent_id": row[3]}
+        record.update({name: value for name, value in pending.items() if name not in ("time", "accessed")})
+        if "plan" not in record:
+            self.counts["read_misses"] += 1
+            return None
+        self.counts["reads"] += 1
+        self._enqueue(plan_id, {"accessed": time.time()})  # opening a plan keeps it from expiring
+        return {"diagram": None, "questions": None, "parent_id": None, **record}
+
+    def flush(self, timeout: float = 5) -> None:
+        """ Wait until everything queued so far is committed. """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+
+    def stats(self) -> dict:
+        with self._read_lock:
+            plans = self._read_db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        with self._lock:
+            return {**self.counts, "pending": len(self._pending), "plans": plans}
+
+    # --- Writer thread ---
+    def _run(self):
+        while True:
+            batch, waiters, stop = set(), [], False
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            deadline = time.monotonic() + self.flush_interval
+            while item is not False:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                else:
+                    batch.add(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            try:
+                if batch:
+                    self._commit(batch)
+                if time.monotonic() - self._compacted >= self.compact_interval:
+                    self.compact()
+            except Exception as e:  # keep the writer alive; these plans are lost, later ones aren't
+                logger.warning(f"⚠️ Plan store write failed: {e}")
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _commit(self, plan_ids):
+        # swap the batch out under the lock, so callers queueing or reading never wait on SQLite
+        with self._lock:
+            records = [(plan_id, self._pending.pop(plan_id)) for plan_id in plan_ids if plan_id in self._pending]
+            self._writing = dict(records)
+        try:
+            with self._db_lock:
+                for plan_id, record in records:
+                    self._write(plan_id, record)
+                self._db.commit()
+        finally:
+            with self._lock:
+                self._writing = {}
+        self.counts["writes"] += len(records)
+        self.counts["batches"] += 1
+
+    def _write(self, plan_id, record):
+        now = record.get("time", record.get("accessed"))
+        if "plan" in record:
+            self._db.execute(
+                "INSERT INTO plans (plan_id, parent_id, plan, diagram, created, accessed) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (plan_id) DO UPDATE SET plan = excluded.plan,"
+                " diagram = COALESCE(excluded.diagram, diagram), parent_id = COALESCE(parent_id, excluded.parent_id),"
+                " accessed = excluded.accessed",
+                (plan_id, record.get("parent_id"), json.dumps(record["plan"], ensure_ascii=False),
+                 record.get("diagram"), now, now),
+            )
+        if "questions" in record:
+            self._db.execute("UPDATE plans SET questions = ? WHERE plan_id = ?",
+                             (json.dumps(record["questions"], ensure_ascii=False), plan_id))
+        if "accessed" in record:
+            self._db.execute("UPDATE plans SET accessed = MAX(accessed, ?) WHERE plan_id = ?",
+                             (record["accessed"], plan_id))
+
+    def compact(self) -> int:
+        """ Apply the retention policy now; returns how many plans were deleted. """
+        with self._db_lock:
+            now = time.time()
+            deleted = self._db.execute("DELETE FROM plans WHERE accessed < ?", (now - self.retention,)).rowcount
+            deleted += self._db.execute(
+                "DELETE FROM plans WHERE plan_id IN ("
+                " SELECT plan_id FROM plans ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_plans,),
+            ).rowcount
+            self._db.commit()
+            if deleted:
+                self._db.execute("PRAGMA incremental_vacuum")
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._compacted = time.monotonic()
+        self.counts["deleted"] += deleted
+        return deleted
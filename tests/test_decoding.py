@@ -0,0 +1,43 @@
+import pytest
+
+from decoding import extract_json, extract_questions, repair_json
+
+
+@pytest.mark.parametrize("reply, questions", [
+    ('{"questions": ["What is ML?", "Define overfitting."]}', ["What is ML?", "Define overfitting."]),
+    ('["1. What is ML?", "2. Define overfitting."]', ["What is ML?", "Define overfitting."]),
+    ('Here you go:\n```json\n{"questions": ["What is ML?",]}\n```', ["What is ML?"]),
+    ("1. What does the {} literal create in Python?\n2. What is a set?",
+     ["What does the {} literal create in Python?", "What is a set?"]),
+    ("1. What is a list?\n2. What does x[0] return for x = [5, 6]?",
+     ["What is a list?", "What does x[0] return for x = [5, 6]?"]),
+    ("**1. What is ML?**\n**2. Explain overfitting.**", ["What is ML?", "Explain overfitting."]),
+    ("Here are some questions:\n- What is ML?\n- Why use a validation set?\nGood luck!",
+     ["What is ML?", "Why use a validation set?"]),
+    ("Think about this.\nWhat is ML?\nWhy does it matter?", ["What is ML?", "Why does it matter?"]),
+    ('{"questions": ["What is ML?"', []),  # truncated JSON: the caller retries
+])
+def test_extract_questions(reply, questions):
+    assert extract_questions(reply) == questions
+
+
+@pytest.mark.parametrize("reply, document", [
+    ('{"a": 1}', '{"a": 1}'),
+    ('Sure! Here it is:\n{"a": {"b": [1, 2]}} Hope that helps.', '{"a": {"b": [1, 2]}}'),
+    ('```json\n[1, 2]\n```', "[1, 2]"),
+    ('{"a": "brace } in a string"} tail', '{"a": "brace } in a string"}'),
+    ('{"a": [1, 2', '{"a": [1, 2'),
+    ("no json here", "no json here"),
+])
+def test_extract_json(reply, document):
+    assert extract_json(reply) == document
+
+
+@pytest.mark.parametrize("text, repaired", [
+    ('{"a": [1, 2,], "b": 3,}', '{"a": [1, 2], "b": 3}'),
+    ('{"a": True, "b": False, "c": None}', '{"a": true, "b": false, "c": null}'),
+    ('{"a": "True, None,]"}', '{"a": "True, None,]"}'),
+    ('{"Nonesuch": 1}', '{"Nonesuch": 1}'),
+])
+def test_repair_json(text, repaired):
+    assert repair_json(text) == repaired
@@ -0,0 +1,28 @@
+import utils
+
+
+def plan_state(**overrides):
+    return {"plan_id": "p1", "study_workflow": {"Topic": ["Subtopic"]}, "reason": "r",
+            "expected_outcome": "o", "resources": ["Book"], "fallback": False, **overrides}
+
+
+def test_feedback_on_a_generated_plan_is_patched(monkeypatch):
+    monkeypatch.setattr(utils.config, "REVISION_MODE", "patch")
+    plan = utils._revisable_plan("more Python please", plan_state())
+    assert plan is not None and plan.study_workflow == {"Topic": ["Subtopic"]}
+
+
+def test_feedback_on_a_fallback_plan_regenerates(monkeypatch):
+    monkeypatch.setattr(utils.config, "REVISION_MODE", "patch")
+    assert utils._revisable_plan("more Python please", plan_state(fallback=True)) is None
+
+
+def test_fallback_plan_is_regenerated_not_revised(monkeypatch):
+    monkeypatch.setattr(utils.config, "REVISION_MODE", "patch")
+    monkeypatch.setattr(utils, "get_client", lambda: None)
+    calls = []
+    monkeypatch.setattr(utils, "revise_learning_suggestion", lambda *args: calls.append("revise"))
+    monkeypatch.setattr(utils, "get_cached_learning_suggestion",
+                        lambda *args: calls.append("generate") or ("clarify", "How old are you?"))
+    utils.driver(25, "cs", "ml", "more Python please", plan_state(fallback=True))
+    assert calls == ["generate"]
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from scheduler import Overloaded, Scheduler
+
+
+def rate_limited(retry_after):
+    response = httpx.Response(429, headers={"retry-after": str(retry_after)},
+                              request=httpx.Request("POST", "http://backend/v1/chat/completions"))
+    return RateLimitError("Error code: 429", response=response, body=None)
+
+
+def always_rate_limited(retry_after):
+    def send():
+        raise rate_limited(retry_after)
+    return send
+
+
+def test_retry_after_beyond_max_wait_sheds_without_sleeping():
+    scheduler = Scheduler(max_wait=1)
+    started = time.monotonic()
+    with pytest.raises(Overloaded):
+        scheduler.call(always_rate_limited(5))
+    assert time.monotonic() - started < 0.5
+    assert scheduler.counts["rate_limited"] == 1 and scheduler.counts["shed"] == 1
+    # the pause is still recorded, so other callers back off too
+    with pytest.raises(Overloaded):
+        scheduler.acquire()
+
+
+def test_async_retry_after_beyond_max_wait_sheds_without_sleeping():
+    scheduler = Scheduler(max_wait=1)
+
+    async def send():
+        raise rate_limited(5)
+
+    started = time.monotonic()
+    with pytest.raises(Overloaded):
+        asyncio.run(scheduler.acall(send))
+    assert time.monotonic() - started < 0.5
+
+
+def test_retry_after_is_capped_by_backoff_max():
+    scheduler = Scheduler(max_wait=5, max_retries=1, backoff_max=0.2)
+    started = time.monotonic()
+    with pytest.raises(RateLimitError):
+        scheduler.call(always_rate_limited(30))
+    assert time.monotonic() - started < 1
+    assert scheduler.counts["retried"] == 1 and scheduler.counts["shed"] == 0
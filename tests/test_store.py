@@ -0,0 +1,45 @@
+import threading
+import time
+
+from store import PlanStore
+
+
+def plan(plan_id):
+    return {"plan_id": plan_id, "study_workflow": {"Topic": ["Subtopic"]}, "reason": "r" * 2000,
+            "expected_outcome": "o", "resources": [], "fallback": False}
+
+
+def test_queued_plans_are_readable_before_and_after_commit(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"), compact_interval=1e9)
+    store.save_plan(plan("a"), "diagram")
+    assert store.get("a")["diagram"] == "diagram"
+    store.save_questions("a", ["Q1?"])
+    store.flush()
+    stored = store.get("a")
+    assert stored["plan"]["plan_id"] == "a" and stored["questions"] == ["Q1?"]
+    store.close()
+
+
+def test_save_plan_does_not_wait_for_compaction(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.db"), batch_size=5000, max_plans=10, compact_interval=1e9)
+    for i in range(20000):
+        store.save_plan(plan(f"old-{i}"))
+    store.flush(timeout=60)
+
+    compaction = threading.Thread(target=store.compact)
+    started = time.perf_counter()
+    compaction.start()
+    saved, slowest = 0, 0.0
+    while compaction.is_alive():
+        before = time.perf_counter()
+        store.save_plan(plan(f"new-{saved}"))
+        slowest = max(slowest, time.perf_counter() - before)
+        saved += 1
+    compaction.join()
+    compact_seconds = time.perf_counter() - started
+
+    assert store.counts["deleted"] > 0
+    assert saved > 1 and slowest < compact_seconds / 4  # a blocked save would wait out the whole compaction
+    store.flush()
+    assert store.get(f"new-{saved - 1}") is not None
+    store.close()
@@ -0,0 +1,82 @@
+import httpx
+import pytest
+from openai import BadRequestError
+
+import utils
+
+
+def bad_request(message, param=None):
+    body = {"message": message, "type": "invalid_request_error", "param": param}
+    response = httpx.Response(400, request=httpx.Request("POST", "http://backend/v1/chat/completions"),
+                              json={"error": body})
+    return BadRequestError(f"Error code: 400 - {body}", response=response, body=body)
+
+
+@pytest.mark.parametrize("error", [
+    bad_request("Invalid value", param="response_format"),
+    bad_request("response_format is not supported by this model"),
+    bad_request("Unsupported parameter: 'response_format'"),
+    bad_request("json_schema is invalid for response_format on this backend"),
+])
+def test_unsupported_response_format_is_detected(error):
+    assert utils._rejects_parameter(error, "response_format")
+
+
+@pytest.mark.parametrize("error", [
+    bad_request("Invalid JSON in request body: messages[1].content must be a string"),
+    bad_request("messages: expected a JSON array", param="messages"),
+    bad_request("This model's maximum context length is 8192 tokens. Please reduce the length of the messages."),
+    bad_request("Input should be valid JSON; response was truncated"),
+])
+def test_other_bad_requests_keep_structured_output(error):
+    assert not utils._rejects_parameter(error, "response_format")
+
+
+class RecordingCompletions:
+    """ chat.completions stand-in: raises `errors` in turn, then returns "ok"; records each request. """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def client_with(completions):
+    return type("Client", (), {"chat": type("Chat", (), {"completions": completions})()})()
+
+
+def test_bad_request_without_format_error_is_raised_and_model_kept(monkeypatch):
+    monkeypatch.setattr(utils.config, "STRUCTURED_OUTPUT", "json_object")
+    completions = RecordingCompletions(
+        bad_request("Invalid JSON in request body: messages[1].content must be a string", param="messages"))
+    with pytest.raises(BadRequestError):
+        utils._create_completion(client_with(completions), "plan", "model-x", [{"role": "user", "content": "hi"}])
+    assert "model-x" not in utils._structured_output_unsupported
+    assert len(completions.calls) == 1 and "response_format" in completions.calls[0]
+
+
+def test_streams_ask_for_usage(monkeypatch):
+    monkeypatch.setattr(utils.config, "STRUCTURED_OUTPUT", "off")
+    completions = RecordingCompletions()
+    utils._create_completion(client_with(completions), "plan", "model-usage", [{"role": "user", "content": "hi"}],
+                             stream=True)
+    assert completions.calls[0]["stream_options"] == {"include_usage": True}
+
+
+def test_rejected_stream_options_fall_back_for_good(monkeypatch):
+    monkeypatch.setattr(utils.config, "STRUCTURED_OUTPUT", "json_object")
+    completions = RecordingCompletions(bad_request("Unrecognized request argument supplied: stream_options"))
+    client, messages = client_with(completions), [{"role": "user", "content": "hi"}]
+    assert utils._create_completion(client, "plan", "model-no-usage", messages, stream=True) == "ok"
+    assert "stream_options" in completions.calls[0]
+    assert "stream_options" not in completions.calls[1] and "response_format" in completions.calls[1]
+    assert "model-no-usage" in utils._stream_usage_unsupported
+    assert "model-no-usage" not in utils._structured_output_unsupported
+
+    utils._create_completion(client, "plan", "model-no-usage", messages, stream=True)
+    assert len(completions.calls) == 3 and "stream_options" not in completions.calls[2]
@@ -1,60 +1,444 @@
 import os
+import re
 import json
-from openai import OpenAI
+import time
+import uuid
+import asyncio
+import contextlib
+import threading
+import httpx
+from openai import AsyncOpenAI, BadRequestError, DefaultAsyncHttpxClient, OpenAI, RateLimitError
 from typing import List, Dict, Union
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+import config
+import metrics
+from cache import ResponseCache, profile_key
+from decoding import clamp_study_plan, decode_json, decode_stats, extract_questions
+from diagram import diagram_key, render_diagram
+from expansion import (TopicExpansion, build_expansion_messages, clamp_expansion, expansion_key,
+                       format_expansion, learner_level)
+from logs import log_payload, logger
+from partial_json import PartialJSONParser
+from prefetch import GraspCheckPrefetcher
+from prompts import clarify_messages, grasp_check_messages, plan_messages
+from router import ModelRouter
+from scheduler import BACKGROUND, INTERACTIVE, Overloaded, Scheduler
+from similarity import SimilarityIndex
+from store import PlanStore
+from revision import PlanPatch, apply_plan_patch, build_revision_messages, revision_fields
 
 # === OpenAI Client Initialization ===
-client = OpenAI(
-    api_key=os.getenv("SAMBANOVA_KEY"),
-    base_url="https://api.sambanova.ai/v1",
+# Clients are built on first use (or by `awarmup`), not at import: building one sets
+# up an SSL context, which the import of this module shouldn't pay for.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _build_client():
+    # Retries are left to `llm_scheduler`, which paces them against the rate limits
+    return OpenAI(
+        api_key=os.getenv("SAMBANOVA_KEY"),
+        base_url=config.BASE_URL,
+        max_retries=0,
+    )
+
+def _build_async_client():
+    # Async client used by the Gradio callbacks: one shared keep-alive connection pool,
+    # so concurrent sessions wait on I/O instead of each holding a worker thread.
+    return AsyncOpenAI(
+        api_key=os.getenv("SAMBANOVA_KEY"),
+        base_url=config.BASE_URL,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        ),
+    )
+
+def _client(kind, build):
+    found = _clients.get(kind)
+    if found is None:
+        with _clients_lock:
+            found = _clients.get(kind)
+            if found is None:
+                found = _clients[kind] = build()
+    return found
+
+def get_client() -> OpenAI:
+    return _client("sync", _build_client)
+
+def get_async_client() -> AsyncOpenAI:
+    return _client("async", _build_async_client)
+
+def __getattr__(name):
+    # `utils.client` / `utils.async_client` still work, built on first access
+    if name == "client":
+        return get_client()
+    if name == "async_client":
+        return get_async_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# === Model Routing ===
+# Full study plans use the large model; cheaper sub-tasks go to the fast tier.
+model_router = ModelRouter(
+    tiers={"local": "vagueness-rules", "fast": config.FAST_MODEL, "large": config.LARGE_MODEL},
+    routes={task: ("fast" if task in config.FAST_TASKS else "large")
+            for task in ("plan", "grasp_check", "clarify", "revision", "expansion")},
+)
+
+# === Rate Limiting ===
+# Every model call goes through here: paced to the provider's limits, interactive
+# requests first, 429s retried after Retry-After, and shed when the queue is too deep.
+llm_scheduler = Scheduler(
+    rpm=config.RATE_LIMIT_RPM,
+    tpm=config.RATE_LIMIT_TPM,
+    max_queue=config.SCHEDULER_MAX_QUEUE,
+    max_wait=config.SCHEDULER_MAX_WAIT,
+    max_retries=config.SCHEDULER_MAX_RETRIES,
 )
+# Rough completion sizes, for reserving tokens before the real usage is known
+COMPLETION_TOKEN_ESTIMATES = {"plan": 800, "revision": 250, "clarify": 60, "grasp_check": 300, "expansion": 250}
+
+# === Study Plan Cache ===
+plan_cache = ResponseCache(
+    path=config.CACHE_PATH,
+    max_entries=config.CACHE_MEMORY_ENTRIES,
+    max_disk_entries=config.CACHE_DISK_ENTRIES,
+    ttl=config.CACHE_TTL_SECONDS,
+) if config.CACHE_ENABLED else None
+
+# Near-duplicate profiles ("CSE grad, ML" vs "Computer Science Engineering, machine learning")
+plan_index = SimilarityIndex(
+    path=config.SIMILARITY_PATH,
+    dim=config.SIMILARITY_DIM,
+    threshold=config.SIMILARITY_THRESHOLD,
+    max_entries=config.SIMILARITY_MAX_ENTRIES,
+) if config.SIMILARITY_ENABLED else None
+
+# Every plan shown to a user, so reloads and shared ?plan=<id> links skip the model
+plan_store = PlanStore(
+    path=config.STORE_PATH,
+    batch_size=config.STORE_BATCH_SIZE,
+    flush_interval=config.STORE_FLUSH_INTERVAL,
+    retention=config.STORE_RETENTION_DAYS * 24 * 3600,
+    max_plans=config.STORE_MAX_PLANS,
+    compact_interval=config.STORE_COMPACT_INTERVAL,
+) if config.STORE_ENABLED else None
+
+# Topic expansions, shared by every session whose plan has the topic
+expansion_cache = ResponseCache(
+    path=config.EXPANSION_CACHE_PATH,
+    max_entries=config.EXPANSION_CACHE_MEMORY_ENTRIES,
+    max_disk_entries=config.CACHE_DISK_ENTRIES,
+    ttl=config.EXPANSION_CACHE_TTL_SECONDS,
+) if config.CACHE_ENABLED else None
 # === Sample Data for Testing ===
 sample_studyflow = {'Machine Learning Fundamentals': ['Introduction to Machine Learning', 'Types of Machine Learning', 'Model Evaluation Metrics', 'Overfitting and Underfitting'], 'Deep Learning with Python': ['Introduction to Neural Networks', 'Convolutional Neural Networks (CNNs)', 'Recurrent Neural Networks (RNNs)', 'Transfer Learning'], 'Large Language Models': ['Introduction to Natural Language Processing (NLP)', 'Language Model Architectures', 'Transformers and Attention Mechanisms', 'Fine-Tuning Pre-Trained Models'], 'Pattern Recognition': ['Introduction to Pattern Recognition', 'Supervised and Unsupervised Learning', 'Clustering Algorithms', 'Dimensionality Reduction Techniques'], 'Model Deployment': ['Introduction to Model Deployment', 'Model Serving and Monitoring', 'Containerization with Docker', 'Cloud Deployment Options']}
 sample_reason = "Given your background in computer science engineering and interests in machine learning, large language models, and pattern recognition, this plan dives into the fundamentals of machine learning and deep learning, with a focus on practical applications in Python."
 sample_outcome = "After completing this plan, you will be able to design, train, and deploy machine learning models, including large language models, and apply pattern recognition techniques to real-world problems. You will also understand how to evaluate and fine-tune your models for optimal performance."
 sample_resource = ['Machine Learning Crash Course - YouTube by Google Developers', 'Deep Learning with Python - Book by François Chollet', 'Natural Language Processing with Python - Book by Steven Bird, Ewan Klein, and Edward Loper']
 
-_cached_data = {
-    "reason": sample_reason,
-    "expected_outcome": None,
-    "resources": None
-}
 # === Connector to Frontend ===
-def driver(age: int, background: str, interest: str, feedback: Union[str, None] = None):
-    status, study_plan_response = get_learning_suggestion(client, age, background, interest, feedback)  
-    
-    # Save the response in the cache  
-    if status == "complete":
-        _cached_data["reason"] = study_plan_response.reason
-        _cached_data["expected_outcome"] = study_plan_response.expected_outcome
-        _cached_data["resources"] = study_plan_response.resources
-    elif status == "clarify":
+def driver(age: int, background: str, interest: str, feedback: Union[str, None] = None,
+           previous_plan_state: Union[dict, None] = None):
+    """
+    Returns (diagram, reason, outcome, plan_state). `plan_state` holds the plan and
+    everything `driver_resource` needs and is kept per session by the UI (gr.State),
+    so concurrent users never see each other's plans. It is None unless a plan was produced.
+    With feedback and the `previous_plan_state` being revised, only a patch is requested;
+    the whole plan is regenerated if that fails.
+    """
+    started = time.perf_counter()
+    plan = _revisable_plan(feedback, previous_plan_state)
+    if plan is not None:
+        status, revised_plan = revise_learning_suggestion(get_client(), plan, feedback)
+        if status == "complete":
+            return _driver_result(status, revised_plan, "driver", started, previous_plan_state)
+
+    status, study_plan_response = get_cached_learning_suggestion(get_client(), age, background, interest, feedback)
+    return _driver_result(status, study_plan_response, "driver", started, previous_plan_state)
+
+def _revisable_plan(feedback, previous_plan_state):
+    """
+    The StudyPlan to patch for this feedback, or None to regenerate from scratch.
+    A fallback plan is never patched: it is a stand-in, not what the learner asked for.
+    """
+    if config.REVISION_MODE != "patch" or not feedback or not previous_plan_state:
+        return None
+    if previous_plan_state.get("fallback"):
+        return None
+    try:
+        return StudyPlan(**{field: previous_plan_state[field] for field in StudyPlan.model_fields})
+    except (KeyError, ValidationError):
+        return None
+
+def _driver_result(status, study_plan_response, handler, started, previous_plan_state=None):
+    """
+    The UI result for a final (status, response). Also records the request's end-to-end
+    time, and queues a new plan for `plan_store`, as a revision of `previous_plan_state` if given.
+    """
+    try:
+        result = _driver_view(status, study_plan_response)
+        if plan_store is not None and result[3] is not None:
+            parent_id = (previous_plan_state or {}).get("plan_id")
+            plan_store.save_plan(result[3], result[0], parent_id=parent_id)
+        return result
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, handler=handler,
+                                        outcome=status if status in ("complete", "clarify", "fallback") else "error")
+
+def _driver_view(status, study_plan_response):
+    if status == "clarify":
         # If the model asks for clarification, we return the follow-up question
-        return None, study_plan_response, None
-    else:
-        return None, f"Error: {study_plan_response}", None
-    
+        return None, study_plan_response, None, None
+    elif status not in ("complete", "fallback"):
+        return None, f"Error: {study_plan_response}", None, None
+
+    plan_state = {
+        "plan_id": uuid.uuid4().hex,
+        "study_workflow": study_plan_response.study_workflow,
+        "reason": study_plan_response.reason,
+        "expected_outcome": study_plan_response.expected_outcome,
+        "resources": study_plan_response.resources,
+        "fallback": status == "fallback",
+    }
     study_workflow_diagram = get_studyflow_diagram(study_plan_response.study_workflow)
     # if feedback:
     #     feedback_interpretation = interpret_feedback(feedback)
     #     print(f"Feedback interpretation: {feedback_interpretation}")
 
-    return study_workflow_diagram, study_plan_response.reason, study_plan_response.expected_outcome
+    reason = study_plan_response.reason
+    if status == "fallback":
+        reason = f"{FALLBACK_NOTICE}\n\n{reason}"
+    return study_workflow_diagram, reason, study_plan_response.expected_outcome, plan_state
+
+def driver_stream(age: int, background: str, interest: str, feedback: Union[str, None] = None,
+                  previous_plan_state: Union[dict, None] = None):
+    """
+    Streaming version of `driver`: yields (diagram, reason, outcome, plan_state) as the
+    plan arrives. The diagram grows one topic at a time as each topic's subtopic list
+    closes, and reason/outcome fill in as text streams. plan_state stays None until
+    the final yield, which is exactly what `driver` would have returned.
+    Patched revisions are small, so they arrive in a single yield.
+    """
+    if not config.STREAMING:
+        yield driver(age, background, interest, feedback, previous_plan_state)
+        return
+
+    started = time.perf_counter()
+    plan = _revisable_plan(feedback, previous_plan_state)
+    if plan is not None:
+        status, revised_plan = revise_learning_suggestion(get_client(), plan, feedback)
+        if status == "complete":
+            yield _driver_result(status, revised_plan, "driver_stream", started, previous_plan_state)
+            return
+
+    view = _PlanStreamView()
+    for status, response in stream_cached_learning_suggestion(get_client(), age, background, interest, feedback):
+        if status != "partial":
+            yield _driver_result(status, response, "driver_stream", started, previous_plan_state)
+            return
+        update = view.update(response)
+        if update:
+            yield update
+
+class _PlanStreamView:
+    """
+    Turns partial plan snapshots into (diagram, reason, outcome, None) UI updates.
+    A new diagram topic is shown at once; text-only changes are sent at most every
+    STREAM_UPDATE_INTERVAL seconds, since each update is a full round trip to the browser.
+    """
+
+    def __init__(self):
+        self.diagram = None
+        self.topic_count = 0
+        self.last = None
+        self.last_sent = 0.0
+
+    def update(self, partial):
+        """ Returns the new UI update, or None if nothing (worth sending yet) changed. """
+        new_topic = False
+        workflow = partial.get("study_workflow")
+        if isinstance(workflow, dict):
+            topics = {topic: subtopics for topic, subtopics in workflow.items() if isinstance(subtopics, list)}
+            if len(topics) != self.topic_count:
+                self.topic_count = len(topics)
+                self.diagram = get_studyflow_diagram(topics, memoize=False)
+                new_topic = True
+
+        update = (self.diagram, str(partial.get("reason", "")), str(partial.get("expected_outcome", "")), None)
+        if update == self.last or not any(update[:3]):
+            return None
+        now = time.monotonic()
+        if not new_topic and now - self.last_sent < config.STREAM_UPDATE_INTERVAL:
+            return None
+        self.last, self.last_sent = update, now
+        return update
+
+def driver_resource(plan_state: Union[dict, None]):
+    if not plan_state:
+        return "", "Please generate a study plan first."
 
-def driver_resource():
-    reason= _cached_data["reason"]
-    expected_outcome = _cached_data["expected_outcome"]
-    resources = _cached_data["resources"]
+    reason = plan_state["reason"]
+    expected_outcome = plan_state["expected_outcome"]
+    resources = plan_state["resources"]
 
-    questions = build_grasp_check(reason, expected_outcome, resources)
+    with metrics.REQUEST_SECONDS.time(handler="driver_resource", outcome="error") as labels:
+        questions = build_grasp_check(reason, expected_outcome, resources)
+        labels["outcome"] = "complete" if questions else "error"
+    _store_questions(plan_state, questions)
+    return _format_resources(resources, questions)
 
+def _store_questions(plan_state, questions):
+    if plan_store is not None and questions and "plan_id" in plan_state:
+        plan_store.save_questions(plan_state["plan_id"], questions)
+
+def driver_load(plan_id: Union[str, None]):
+    """
+    A stored plan, for reopening it from a `?plan=<id>` link with no model call:
+    (diagram, reason, outcome, plan_state, resources, questions), the last two None
+    if its grasp check was never generated. None if the plan is unknown or expired.
+    """
+    if plan_store is None or not plan_id:
+        return None
+    with metrics.REQUEST_SECONDS.time(handler="driver_load", outcome="miss") as labels:
+        stored = plan_store.get(plan_id)
+        if stored is None:
+            return None
+        plan_state = stored["plan"]
+        diagram = stored["diagram"] or get_studyflow_diagram(plan_state["study_workflow"], plan_state.get("expansions"))
+        resources, questions = None, None
+        if stored["questions"]:
+            resources, questions = _format_resources(plan_state["resources"], stored["questions"])
+        labels["outcome"] = "complete"
+    return diagram, plan_state["reason"], plan_state["expected_outcome"], plan_state, resources, questions
+
+def _format_resources(resources, questions):
     # both are lists, so print it like they points and question 
     formated_resources = "\n".join([f"- {resource}" for resource in resources])
     formated_questions = "\n".join([f"{question}" for i, question in enumerate(questions)])
+    if not questions:
+        formated_questions = "Grasp-check questions are unavailable right now."
    
     return formated_resources, formated_questions
 
+def driver_expand(topic: str, age: int, plan_state: Union[dict, None]):
+    """
+    Returns (diagram, details, plan_state) with `topic` of the session's plan expanded
+    into sub-subtopics and resources. Expansions are kept in plan_state["expansions"],
+    so the diagram keeps every topic expanded so far. The diagram is None on failure.
+    """
+    if not plan_state or topic not in plan_state["study_workflow"]:
+        return None, "Please pick a topic from your study plan first.", plan_state
+
+    with metrics.REQUEST_SECONDS.time(handler="driver_expand", outcome="error") as labels:
+        expansion = expand_topic(topic, age)
+        labels["outcome"] = "complete" if expansion else "error"
+    return _expanded_view(topic, expansion, plan_state)
+
+def _expanded_view(topic, expansion, plan_state):
+    if expansion is None:
+        return None, format_expansion(topic, None), plan_state
+    plan_state = {**plan_state, "expansions": {**plan_state.get("expansions", {}), topic: expansion}}
+    diagram = get_studyflow_diagram(plan_state["study_workflow"], plan_state["expansions"])
+    if plan_store is not None:
+        plan_store.save_plan(plan_state, diagram)
+    return diagram, format_expansion(topic, expansion), plan_state
+
+# === Async Connector to Frontend ===
+async def adriver(age: int, background: str, interest: str, feedback: Union[str, None] = None,
+                  previous_plan_state: Union[dict, None] = None):
+    """
+    Async version of `driver`; awaits the model on the pooled async client.
+    A completed plan also starts a background grasp-check prefetch. Pass the plan
+    being revised as `previous_plan_state` so its now-stale prefetch is dropped.
+    """
+    started = time.perf_counter()
+    status = None
+    plan = _revisable_plan(feedback, previous_plan_state)
+    if plan is not None:
+        status, study_plan_response = await arevise_learning_suggestion(get_async_client(), plan, feedback)
+    if status != "complete":
+        status, study_plan_response = await aget_cached_learning_suggestion(
+            get_async_client(), age, background, interest, feedback
+        )
+
+    # off the loop: rendering the diagram and queueing the plan take locks
+    result = await asyncio.to_thread(_driver_result, status, study_plan_response, "driver", started, previous_plan_state)
+    _prefetch_grasp_check(result[3], previous_plan_state)
+    return result
+
+async def adriver_stream(age: int, background: str, interest: str, feedback: Union[str, None] = None,
+                         previous_plan_state: Union[dict, None] = None):
+    """ Async version of `driver_stream`, with the same prefetching as `adriver`. """
+    if not config.STREAMING:
+        yield await adriver(age, background, interest, feedback, previous_plan_state)
+        return
+
+    started = time.perf_counter()
+    plan = _revisable_plan(feedback, previous_plan_state)
+    if plan is not None:
+        status, revised_plan = await arevise_learning_suggestion(get_async_client(), plan, feedback)
+        if status == "complete":
+            result = await asyncio.to_thread(_driver_result, status, revised_plan, "driver_stream", started,
+                                             previous_plan_state)
+            _prefetch_grasp_check(result[3], previous_plan_state)
+            yield result
+            return
+
+    view = _PlanStreamView()
+    async for status, response in astream_cached_learning_suggestion(
+        get_async_client(), age, background, interest, feedback
+    ):
+        if status != "partial":
+            result = await asyncio.to_thread(_driver_result, status, response, "driver_stream", started,
+                                             previous_plan_state)
+            _prefetch_grasp_check(result[3], previous_plan_state)
+            yield result
+            return
+        update = view.update(response)
+        if update:
+            yield update
+
+async def adriver_resource(plan_state: Union[dict, None]):
+    """ Async version of `driver_resource`; uses the prefetched questions when there are some. """
+    if not plan_state:
+        return "", "Please generate a study plan first."
+
+    resources = plan_state["resources"]
+    questions = None
+    with metrics.REQUEST_SECONDS.time(handler="driver_resource", outcome="error") as labels:
+        if grasp_prefetcher is not None and "plan_id" in plan_state:
+            questions = await grasp_prefetcher.result(plan_state["plan_id"])
+        if not questions:  # nothing prefetched, or the prefetch was shed or failed
+            questions = await abuild_grasp_check(plan_state["reason"], plan_state["expected_outcome"], resources)
+        labels["outcome"] = "complete" if questions else "error"
+    await asyncio.to_thread(_store_questions, plan_state, questions)
+    return _format_resources(resources, questions)
+
+async def adriver_expand(topic: str, age: int, plan_state: Union[dict, None]):
+    """ Async version of `driver_expand`. """
+    if not plan_state or topic not in plan_state["study_workflow"]:
+        return None, "Please pick a topic from your study plan first.", plan_state
+
+    with metrics.REQUEST_SECONDS.time(handler="driver_expand", outcome="error") as labels:
+        expansion = await aexpand_topic(topic, age)
+        labels["outcome"] = "complete" if expansion else "error"
+    return await asyncio.to_thread(_expanded_view, topic, expansion, plan_state)
+
+def _prefetch_grasp_check(plan_state, previous_plan_state):
+    if grasp_prefetcher is None or plan_state is None:
+        return  # clarify/error keeps the previous plan, and its prefetch, in place
+    if previous_plan_state and "plan_id" in previous_plan_state:
+        grasp_prefetcher.discard(previous_plan_state["plan_id"])
+    if plan_state.get("fallback"):
+        return  # the backend is overloaded or failing; don't add speculative load
+    grasp_prefetcher.start(plan_state["plan_id"], plan_state["reason"], plan_state["expected_outcome"], plan_state["resources"])
+
 # === Pydantic Models for Structured Output ===
 class StudyPlan(BaseModel):
     study_workflow: Dict[str, List[str]]
@@ -68,108 +452,565 @@ class ClarificationRequest(BaseModel):
 class GraspCheck(BaseModel):
     questions: List[str]
 
-# === System Prompt ===
-SYSTEM_PROMPT = """
-You are a smart educational guide agent.
-You help people figure out what to learn next based on their age, background, and interests.
-Be adaptive: if input is too vague, ask for clarification. If it's clear, give them:
-1. A study_workflow - a roadmap of topics and subtopics.
-2. A reason why it's the right path for the user.
-3. An expected outcome after finishing this learning path.
-4. Beginner-friendly resources.
-Use simple and clear language.
-Always respond in strict JSON.
-"""
-
-# === User Prompt Generator ===
-def build_user_prompt(age, background, interest, feedback=None):
-    feedback_note = f"\n- Additional Feedback from User: {feedback}" if feedback else ""
-    return f"""
-    You are an expert curriculum advisor.
-
-    ### User Profile
-    - Age: {age}
-    - Educational Background: {background}
-    - Interests: {interest}{feedback_note}
-
-    ### Your Task:
-    Generate a structured learning plan in **strict JSON format only**, without any extra text or markdown.
-
-    Your output must include:
-    1. **study_workflow**: a Python-style dictionary (JSON-safe)  
-    - Keys: main topics relevant to the user's profile  
-    - Values: 2–5 subtopics per main topic, written as a list of strings ordered from beginner to advanced  
-
-    2. **reason**: 3-4 clear sentence explaining "why" this path fits the user's background and interests. Avoid overly technical or overly vague language. Match the tone to their background. 
-    3. **expected_outcome**: 3–4 sentences describing what the user will *be able to do* by the end. Be specific, realistic, and motivating. Avoid overly technical or overly vague language. Match the tone to their background. 
-    4. **resources**: list of 3–4 beginner-friendly materials
-
-    ### VERY IMPORTANT:
-    - Talk directly to the user, not in third person.
-    - Do NOT return more than 5 main topics
-    - Do NOT return more than 5 subtopics per main topic
-    - Do NOT return more than 3 resources
-    - Do NOT include explanations outside the JSON
-    - Do NOT use markdown code blocks like ```json
-    - Only output valid JSON
-
-    ### Output Example:
-    {{
-        "study_workflow": {{
-        "Start with Python": ["Variables and Data Types", "Loops", "Functions", "Error Handling"],
-        "Data Structures": ["Lists", "Dictionaries", "Tuples", "Sets"],
-        "NumPy": ["Arrays", "Array Operations", "Broadcasting"],
-        "Pandas": ["Series and DataFrames", "Filtering and Sorting", "Basic Data Cleaning"],
-        "Matplotlib": ["Line Charts", "Bar Charts", "Histograms"]
-        }},
-        "reason": "Since you are new to programming and interested in data-related topics, this plan starts with Python basics and gradually introduces tools used in real data analysis projects.",
-        "expected_outcome": "After completing this plan, you will understand the fundamentals of Python and be able to explore and analyze real-world datasets using tools like Pandas and Matplotlib. You wil be able to write small scripts to automate tasks, clean data, and create visual summaries.",
-        "resources": [
-            "Python for Beginners - YouTube by freeCodeCamp",
-            "CS50’s Introduction to Computer Science",
-            "Kaggle: Python Course"
-        ]
-    }}
-
-    ### If the user profile is too vague to proceed:
-    Return this JSON instead:
-    {{
-    "follow_up_question": "Ask a specific question to clarify what the user needs"
-    }}
-    """
+# JSON schemas sent as `response_format` when config.STRUCTURED_OUTPUT is "json_schema"
+RESPONSE_SCHEMAS = {
+    "plan": TypeAdapter(Union[StudyPlan, ClarificationRequest]).json_schema(),
+    "revision": PlanPatch.model_json_schema(),
+    "grasp_check": GraspCheck.model_json_schema(),
+    "expansion": TopicExpansion.model_json_schema(),
+}
 
 # === GPT Driver ===
+@metrics.PROMPT_BUILD_SECONDS.time(task="plan")
+def build_plan_messages(age, background, interest, feedback=None, variant=None):
+    """ Plan request in the configured prompt variant (see prompts.py); the profile comes last. """
+    return plan_messages(age, background, interest, feedback, variant or config.PROMPT_VARIANT)
+
+def _parse_timed(task, parse, raw_response):
+    """ `parse(raw_response)`, timed and labelled with its outcome. """
+    with metrics.PARSE_SECONDS.time(task=task, outcome="error") as labels:
+        result = parse(raw_response)
+        labels["outcome"] = _outcome_of(result)
+    return result
+
+def _outcome_of(result):
+    if isinstance(result, str) or (isinstance(result, tuple) and result[0] == "clarify"):
+        return "clarify"  # a follow-up question, bare or as ("clarify", question)
+    return "complete"
+
+def parse_learning_suggestion(raw_response):
+    """ Validate a raw model response into ("clarify", question) or ("complete", StudyPlan). """
+    log_payload("🔍 Raw LLM Response:", raw_response)
+    response_json = decode_json(raw_response, task="plan")
+
+    if "follow_up_question" in response_json:
+        follow_up = ClarificationRequest(**response_json)
+        return "clarify", follow_up.follow_up_question
+
+    study_plan = StudyPlan(**clamp_study_plan(response_json))
+    return "complete", study_plan
+
 def get_learning_suggestion(client, age, background, interest, feedback=None):
-    user_prompt = build_user_prompt(age, background, interest, feedback)
+    clarification = clarify_profile(client, age, background, interest, feedback)
+    if clarification:
+        return "clarify", clarification
 
     try:
-        completion = client.chat.completions.create(
-            model="Meta-Llama-3.1-405B-Instruct",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        raw_response = completion.choices[0].message.content.strip()
-        print("🔍 Raw LLM Response:", raw_response)
+        messages = build_plan_messages(age, background, interest, feedback)
+        return _complete_validated(client, "plan", messages, parse_learning_suggestion)
+    except Exception as e:
+        return _plan_failure(e, age, background, interest, feedback)
+
+def stream_learning_suggestion(client, age, background, interest, feedback=None):
+    """
+    Streaming version of `get_learning_suggestion`. Yields ("partial", dict) snapshots
+    of the plan while tokens arrive, then a single final (status, response) exactly as
+    `get_learning_suggestion` would return it, after full Pydantic validation.
+    """
+    clarification = clarify_profile(client, age, background, interest, feedback)
+    if clarification:
+        yield "clarify", clarification
+        return
+
+    attempts = _Attempts("plan", build_plan_messages(age, background, interest, feedback))
+    while True:
+        try:
+            with metrics.LLMCall(attempts.model, "plan") as call:
+                with model_router.timed(attempts.model):
+                    stream = _create_completion(client, "plan", attempts.model, attempts.messages,
+                                                call=call, stream=True)
+                    reply = _PlanStream(call)
+                    # Closed even if the consumer stops early (a cancelled Gradio event), freeing the connection
+                    with stream:
+                        for chunk in stream:
+                            partial = reply.feed(chunk)
+                            if partial is not None:
+                                yield "partial", partial
+                call.done()
+                done, result = attempts.parse(call, reply.text(), parse_learning_suggestion)
+                if not done:
+                    continue
+        except Exception as e:
+            result = _plan_failure(e, age, background, interest, feedback)
+        yield result
+        return
+
+async def aget_learning_suggestion(async_client, age, background, interest, feedback=None):
+    """ Async version of `get_learning_suggestion`. """
+    clarification = await aclarify_profile(async_client, age, background, interest, feedback)
+    if clarification:
+        return "clarify", clarification
+
+    try:
+        messages = build_plan_messages(age, background, interest, feedback)
+        return await _acomplete_validated(async_client, "plan", messages, parse_learning_suggestion)
+    except Exception as e:
+        return _plan_failure(e, age, background, interest, feedback)
+
+async def astream_learning_suggestion(async_client, age, background, interest, feedback=None):
+    """ Async version of `stream_learning_suggestion`. """
+    clarification = await aclarify_profile(async_client, age, background, interest, feedback)
+    if clarification:
+        yield "clarify", clarification
+        return
+
+    attempts = _Attempts("plan", build_plan_messages(age, background, interest, feedback))
+    while True:
+        try:
+            with metrics.LLMCall(attempts.model, "plan") as call:
+                with model_router.timed(attempts.model):
+                    stream = await _acreate_completion(async_client, "plan", attempts.model, attempts.messages,
+                                                       call=call, stream=True)
+                    reply = _PlanStream(call)
+                    async with stream:
+                        async for chunk in stream:
+                            partial = reply.feed(chunk)
+                            if partial is not None:
+                                yield "partial", partial
+                call.done()
+                done, result = attempts.parse(call, reply.text(), parse_learning_suggestion)
+                if not done:
+                    continue
+        except Exception as e:
+            result = _plan_failure(e, age, background, interest, feedback)
+        yield result
+        return
+
+class _PlanStream:
+    """ A plan reply as it streams in: its text so far, and snapshots worth showing. """
+
+    def __init__(self, call):
+        self.call = call
+        self.parser = PartialJSONParser()
+        self.pieces = []
+
+    def feed(self, chunk):
+        """ Take one streamed chunk; returns a plan snapshot worth showing, else None. """
+        self.call.chunk(chunk)
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            return None
+        self.pieces.append(delta)
+        self.parser.feed(delta)
+        partial = self.parser.snapshot()
+        if isinstance(partial, dict) and "follow_up_question" not in partial:
+            return partial
+        return None
+
+    def text(self):
+        return "".join(self.pieces).strip()
+
+def _plan_failure(error, age, background, interest, feedback):
+    """ The (status, response) for a plan request that raised: a fallback plan if the model was busy. """
+    if isinstance(error, (Overloaded, RateLimitError)):
+        logger.warning(f"⚠️ Model busy ({error}), serving a fallback plan")
+        return "fallback", fallback_plan(age, background, interest, feedback)
+    logger.error(f"❌ Error occurred: {error}")
+    return "error", str(error)
+
+# === Response Decoding ===
+# Models that rejected `response_format`; they get plain requests from then on
+_structured_output_unsupported = set()
+# Models that rejected `stream_options`; their streams are sent without a usage chunk
+_stream_usage_unsupported = set()
+
+def _response_format(task, model):
+    if config.STRUCTURED_OUTPUT == "off" or model in _structured_output_unsupported:
+        return None
+    if config.STRUCTURED_OUTPUT == "json_schema" and task in RESPONSE_SCHEMAS:
+        return {"type": "json_schema", "json_schema": {"name": task, "schema": RESPONSE_SCHEMAS[task]}}
+    return {"type": "json_object"}
+
+def _optional_params(task, model, stream):
+    """ Parameters not every backend accepts, each dropped for good once a model rejects it. """
+    params = {}
+    response_format = _response_format(task, model)
+    if response_format:
+        params["response_format"] = response_format
+    if stream and model not in _stream_usage_unsupported:
+        # Token usage arrives in a final chunk, so streamed calls report tokens like the others
+        params["stream_options"] = {"include_usage": True}
+    return params
+
+_UNSUPPORTED_BY = {"response_format": _structured_output_unsupported, "stream_options": _stream_usage_unsupported}
+
+def _drop_rejected(error, model, params):
+    """ Drop from `params` the optional parameter `error` rejects, remembered for `model`; False if none. """
+    for name in params:
+        if _rejects_parameter(error, name):
+            logger.warning(f"⚠️ {model} rejected {name} ({error}), sending requests without it from now on")
+            _UNSUPPORTED_BY[name].add(model)
+            del params[name]
+            return True
+    return False
+
+_UNSUPPORTED = r"(?:not supported|unsupported|not allowed|not permitted|invalid|unknown|unrecognized|extra)"
+
+def _rejects_parameter(error, name):
+    """
+    Whether a 400 says the request parameter `name` itself isn't accepted, e.g.
+    "response_format is not supported by this model". Other bad requests (a
+    malformed message, a context overflow, ...) keep the parameter on.
+    """
+    if getattr(error, "param", None) == name:
+        return True
+    message = str(getattr(error, "body", None) or error)
+    near = r"[^.\n]{0,80}?"
+    return bool(re.search(rf"{name}{near}{_UNSUPPORTED}|{_UNSUPPORTED}{near}{name}", message, re.IGNORECASE))
 
-        # Validate against expected schemas
+def _estimate_tokens(task, messages):
+    """ Prompt tokens at ~4 characters each, plus the task's usual completion size. """
+    prompt_chars = sum(len(message["content"]) for message in messages)
+    return prompt_chars // 4 + COMPLETION_TOKEN_ESTIMATES.get(task, 500)
+
+def _create_completion(client, task, model, messages, priority=INTERACTIVE, call=None, **kwargs):
+    """
+    chat.completions.create through `llm_scheduler`, asking for structured JSON output
+    (and for streams, token usage) where the backend supports it. Raises `Overloaded`
+    if the call was shed. `call` (a metrics.LLMCall) starts timing once the request
+    is admitted.
+    """
+    tokens = _estimate_tokens(task, messages)
+    params = _optional_params(task, model, kwargs.get("stream", False))
+
+    def send():
+        if call is not None:
+            call.admitted()
+        return client.chat.completions.create(model=model, messages=messages, **params, **kwargs)
+
+    while True:
+        try:
+            return llm_scheduler.call(send, tokens, priority)
+        except BadRequestError as e:
+            if not _drop_rejected(e, model, params):
+                raise
+
+async def _acreate_completion(async_client, task, model, messages, priority=INTERACTIVE, call=None, **kwargs):
+    """ Async version of `_create_completion`. """
+    tokens = _estimate_tokens(task, messages)
+    params = _optional_params(task, model, kwargs.get("stream", False))
+
+    def send():
+        if call is not None:
+            call.admitted()
+        return async_client.chat.completions.create(model=model, messages=messages, **params, **kwargs)
+
+    while True:
         try:
-            response_json = json.loads(raw_response)
-        except json.JSONDecodeError as e:
-            raise ValueError("Invalid JSON from model")
+            return await llm_scheduler.acall(send, tokens, priority)
+        except BadRequestError as e:
+            if not _drop_rejected(e, model, params):
+                raise
 
-        if "follow_up_question" in response_json:
-            follow_up = ClarificationRequest(**response_json)
-            return "clarify", follow_up.follow_up_question
+def _retry_attempt(task, model, messages, raw_response, error):
+    """
+    The one retry allowed after a reply fails to parse or validate, even after local
+    repair: the large model if a cheaper model wrote the reply, otherwise the same
+    model shown its reply and the error. Returns (model, messages).
+    """
+    decode_stats.record(task, "failures")
+    decode_stats.record(task, "retries")
+    fallback = model_router.models_for(task)[-1]
+    if model != fallback:
+        logger.warning(f"⚠️ {model} failed on {task} ({error}), falling back to {fallback}")
+        model_router.record_fallback(model)
+        return fallback, messages
 
-        study_plan = StudyPlan(**response_json)
-        return "complete", study_plan
+    logger.warning(f"⚠️ {model} failed on {task} ({error}), retrying with the error")
+    return model, messages + [
+        {"role": "assistant", "content": raw_response},
+        {"role": "user", "content": f"That reply could not be used: {str(error)[:500]}\n"
+                                    "Reply again with only the corrected JSON, in the format asked for above."},
+    ]
+
+class _Attempts:
+    """
+    The model and messages of each try at `task`: the routed model first, then (with
+    `retry`) one more try (see `_retry_attempt`) if its reply can't be used. Shared by
+    the sync and async callers, which only send the requests.
+    """
 
+    def __init__(self, task, messages, retry=True):
+        self.task = task
+        self.model = model_router.model_for(task)
+        self.messages = messages
+        self.retry = retry
+        self.retried = False
+
+    def parse(self, call, raw_response, parse):
+        """
+        (True, parse(raw_response)) with the outcome set on `call`, or (False, None) if the
+        reply is unusable and a retry is due. The last try's parse error is raised.
+        """
+        decode_stats.record(self.task, "responses")
+        try:
+            result = _parse_timed(self.task, parse, raw_response)
+        except (ValueError, TypeError) as e:
+            if self.retried or not self.retry:
+                decode_stats.record(self.task, "failures")
+                if self.retried:
+                    decode_stats.record(self.task, "retry_failures")
+                raise
+            self.model, self.messages = _retry_attempt(self.task, self.model, self.messages, raw_response, e)
+            self.retried = True
+            return False, None
+        call.outcome = _outcome_of(result)
+        return True, result
+
+def _complete_validated(client, task, messages, parse, priority=INTERACTIVE, retry=True):
+    """
+    Run `task` on its routed model and return `parse(raw_response)`, with at most one
+    retry (see `_Attempts`) if the reply can't be used. Errors from the last attempt,
+    and `Overloaded` if the scheduler shed the call, are raised.
+    """
+    attempts = _Attempts(task, messages, retry)
+    while True:
+        with metrics.LLMCall(attempts.model, task) as call:
+            with model_router.timed(attempts.model):
+                completion = _create_completion(client, task, attempts.model, attempts.messages, priority, call)
+            call.done(completion.usage)
+            done, result = attempts.parse(call, completion.choices[0].message.content.strip(), parse)
+            if done:
+                return result
+
+async def _acomplete_validated(async_client, task, messages, parse, priority=INTERACTIVE, retry=True):
+    """ Async version of `_complete_validated`. """
+    attempts = _Attempts(task, messages, retry)
+    while True:
+        with metrics.LLMCall(attempts.model, task) as call:
+            with model_router.timed(attempts.model):
+                completion = await _acreate_completion(async_client, task, attempts.model, attempts.messages,
+                                                       priority, call)
+            call.done(completion.usage)
+            done, result = attempts.parse(call, completion.choices[0].message.content.strip(), parse)
+            if done:
+                return result
+
+def get_cached_learning_suggestion(client, age, background, interest, feedback=None):
+    """
+    Serve repeat profiles from `plan_cache`, and close ones from `plan_index`, and only
+    call the model on a miss. Only complete plans are stored; clarifications and errors
+    always go to the model.
+    """
+    stored = _stored_plan(age, background, interest, feedback)
+    if stored is not None:
+        return "complete", stored
+
+    status, response = get_learning_suggestion(client, age, background, interest, feedback)
+    if status == "complete":
+        _store_plan(age, background, interest, feedback, response)
+    return status, response
+
+def stream_cached_learning_suggestion(client, age, background, interest, feedback=None):
+    """ `stream_learning_suggestion` behind the plan stores; a hit yields only the final plan. """
+    stored = _stored_plan(age, background, interest, feedback)
+    if stored is not None:
+        yield "complete", stored
+        return
+
+    for status, response in stream_learning_suggestion(client, age, background, interest, feedback):
+        if status == "complete":
+            _store_plan(age, background, interest, feedback, response)
+        yield status, response
+
+async def aget_cached_learning_suggestion(async_client, age, background, interest, feedback=None, similar=True):
+    """
+    Async version of `get_cached_learning_suggestion`. With `similar=False` only an
+    exact `plan_cache` hit is served; anything else goes to the model.
+    """
+    stored = await _astored_plan(age, background, interest, feedback, similar=similar)
+    if stored is not None:
+        return "complete", stored
+
+    status, response = await aget_learning_suggestion(async_client, age, background, interest, feedback)
+    if status == "complete":
+        await asyncio.to_thread(_store_plan, age, background, interest, feedback, response)
+    return status, response
+
+async def astream_cached_learning_suggestion(async_client, age, background, interest, feedback=None):
+    """ Async version of `stream_cached_learning_suggestion`. """
+    stored = await _astored_plan(age, background, interest, feedback)
+    if stored is not None:
+        yield "complete", stored
+        return
+
+    async for status, response in astream_learning_suggestion(async_client, age, background, interest, feedback):
+        if status == "complete":
+            await asyncio.to_thread(_store_plan, age, background, interest, feedback, response)
+        yield status, response
+
+def _stored_plan(age, background, interest, feedback, refresh=None, similar=True):
+    """
+    A plan generated earlier for this request: the exact `plan_cache` entry, else (for
+    `similar` requests without feedback) the plan of the most similar profile in `plan_index`.
+    A near match is returned as is and its profile's own plan regenerated in the
+    background (`refresh`, default `_refresh_plan`), so the next request is an exact hit.
+    """
+    if plan_cache is not None:
+        cached = _cached_plan(profile_key(age, background, interest, feedback))
+        if cached is not None:
+            return cached
+    if plan_index is None or feedback or not similar:
+        return None
+
+    near = _similar_plan(age, background, interest)
+    if near is not None and config.SIMILARITY_REFRESH:
+        (refresh or _refresh_plan)(age, background, interest)
+    return near
+
+async def _astored_plan(age, background, interest, feedback, similar=True):
+    """
+    Async version of `_stored_plan`: the cache and index lookups (SQLite reads and an
+    `accessed` update) run on a thread, and a near match's refresh is a task on the loop.
+    """
+    near_matched = []
+    stored = await asyncio.to_thread(_stored_plan, age, background, interest, feedback,
+                                     lambda *profile: near_matched.append(profile), similar)
+    for profile in near_matched:
+        _arefresh_plan(*profile)
+    return stored
+
+def _similar_plan(age, background, interest, threshold=None):
+    found = plan_index.search(age, background, interest, threshold)
+    if found is None:
+        return None
+    try:
+        return StudyPlan(**found[1])
+    except ValidationError:
+        return None
+
+def _store_plan(age, background, interest, feedback, study_plan):
+    """ Save a complete plan to `plan_cache` and `plan_index`; SQLite writes, so async callers use a thread. """
+    plan = study_plan.model_dump()
+    if plan_cache is not None:
+        plan_cache.set(profile_key(age, background, interest, feedback), plan)
+    if plan_index is not None and not feedback:
+        plan_index.add(age, background, interest, plan)
+
+# Profiles whose own plan is being regenerated after a near match, by profile_key
+_refreshing = {}
+
+def _refresh_key(age, background, interest):
+    """ The profile_key to regenerate the plan under, or None if it is already in hand or too many are. """
+    key = profile_key(age, background, interest)
+    if key in _refreshing or len(_refreshing) >= config.PREFETCH_MAX_PENDING:
+        return None
+    return key
+
+@contextlib.contextmanager
+def _refreshing_plan(key):
+    """ Around one background refresh: failures are only logged, and the key is released. """
+    try:
+        yield
     except Exception as e:
-        print(f"❌ Error occurred: {e}")
+        logger.info(f"Background plan refresh skipped: {e}")
+    finally:
+        _refreshing.pop(key, None)
+
+def _refresh_plan(age, background, interest):
+    """ Regenerate a near-matched profile's plan on a background thread, at BACKGROUND priority. """
+    key = _refresh_key(age, background, interest)
+    if key is None:
+        return
+
+    def run():
+        with _refreshing_plan(key):
+            messages = build_plan_messages(age, background, interest)
+            status, response = _complete_validated(get_client(), "plan", messages, parse_learning_suggestion, BACKGROUND)
+            if status == "complete":
+                _store_plan(age, background, interest, None, response)
+
+    _refreshing[key] = threading.Thread(target=run, daemon=True)
+    _refreshing[key].start()
+
+def _arefresh_plan(age, background, interest):
+    """ Async version of `_refresh_plan`: a task on the running event loop. """
+    key = _refresh_key(age, background, interest)
+    if key is None:
+        return
+
+    async def run():
+        with _refreshing_plan(key):
+            messages = build_plan_messages(age, background, interest)
+            status, response = await _acomplete_validated(
+                get_async_client(), "plan", messages, parse_learning_suggestion, BACKGROUND
+            )
+            if status == "complete":
+                await asyncio.to_thread(_store_plan, age, background, interest, None, response)
+
+    _refreshing[key] = asyncio.get_running_loop().create_task(run())
+
+def _cached_plan(key):
+    cached = plan_cache.get(key)
+    if cached is None:
+        return None
+    try:
+        return StudyPlan(**cached)
+    except ValidationError:
+        return None  # Stale entry from an older schema, regenerate it
+
+# === Load Shedding Fallback ===
+FALLBACK_NOTICE = ("⚠️ LearnFlow is very busy right now, so this is a ready-made plan rather than one "
+                   "written for you. Please try again in a minute for a personalized plan.")
+
+def fallback_plan(age, background, interest, feedback=None) -> StudyPlan:
+    """
+    The plan served when the model call was shed or rate limited: this profile's cached
+    plan (with or without the feedback), else the nearest stored profile's plan, else
+    the bundled sample plan.
+    """
+    if plan_cache is not None:
+        for key in (profile_key(age, background, interest, feedback), profile_key(age, background, interest)):
+            cached = _cached_plan(key)
+            if cached is not None:
+                return cached
+    if plan_index is not None:
+        nearest = _similar_plan(age, background, interest, config.SIMILARITY_FALLBACK_THRESHOLD)
+        if nearest is not None:
+            return nearest
+    return StudyPlan(
+        study_workflow=sample_studyflow,
+        reason=sample_reason,
+        expected_outcome=sample_outcome,
+        resources=sample_resource,
+    )
+
+# === Plan Revision ===
+def revise_learning_suggestion(client, study_plan: StudyPlan, feedback: str):
+    """
+    Revise an existing plan by asking the model for a compact JSON patch instead of a
+    whole new plan. Which fields may change follows `interpret_feedback`. Returns
+    ("complete", StudyPlan) or ("error", message), like `get_learning_suggestion`.
+    """
+    try:
+        return "complete", _complete_validated(client, "revision", *_revision_request(study_plan, feedback))
+    except Exception as e:
+        logger.error(f"❌ Error occurred while revising: {e}")
         return "error", str(e)
 
+async def arevise_learning_suggestion(async_client, study_plan: StudyPlan, feedback: str):
+    """ Async version of `revise_learning_suggestion`. """
+    try:
+        return "complete", await _acomplete_validated(async_client, "revision", *_revision_request(study_plan, feedback))
+    except Exception as e:
+        logger.error(f"❌ Error occurred while revising: {e}")
+        return "error", str(e)
+
+def _revision_request(study_plan: StudyPlan, feedback: str):
+    """ (messages, parse) for a revision: the patch request and how to apply its reply. """
+    allowed = revision_fields(interpret_feedback(feedback))
+    with metrics.PROMPT_BUILD_SECONDS.time(task="revision"):
+        messages = build_revision_messages(study_plan.model_dump(), feedback, allowed)
+    return messages, lambda raw: parse_plan_patch(raw, study_plan, allowed)
+
+def parse_plan_patch(raw_response, study_plan: StudyPlan, allowed) -> StudyPlan:
+    """ Apply the model's patch to `study_plan` locally and validate the result. """
+    log_payload("🔍 Raw LLM Patch:", raw_response)
+    patch = PlanPatch(**decode_json(raw_response, task="revision"))
+    return StudyPlan(**clamp_study_plan(apply_plan_patch(study_plan.model_dump(), patch, allowed)))
+
 # === Feedback Interpreter Layer ===
 def interpret_feedback(feedback_text):
     """ You can use a small model or rule-based classifier to tag feedback. """
@@ -182,120 +1023,350 @@ def interpret_feedback(feedback_text):
     interpreted = [keywords[k] for k in keywords if k in feedback_text.lower()]
     return ", ".join(interpreted) if interpreted else feedback_text
 
-def build_grasp_check(reason: str, outcome: str, resources: List[str]) -> List[str]:
+# === Vagueness Pre-Check ===
+# Words that carry no information about what someone wants to learn
+FILLER_WORDS = {
+    "i", "im", "am", "a", "an", "the", "and", "or", "to", "in", "of", "about", "into", "my", "me",
+    "like", "love", "want", "learn", "learning", "interested", "really", "maybe", "some", "just",
+}
+VAGUE_WORDS = {
+    "anything", "something", "everything", "whatever", "stuff", "things", "idk", "dunno", "unsure",
+    "sure", "not", "no", "idea", "none", "nothing", "na", "any", "all", "dont", "know", "nope",
+}
+# Broad fields that might be enough, or might need narrowing: the fast model decides
+GENERIC_INTERESTS = {
+    "tech", "technology", "science", "computer", "computers", "coding", "programming", "engineering",
+    "it", "business", "art", "arts", "math", "maths", "study", "school", "college", "education",
+}
+
+def _informative_words(text):
+    words = "".join(ch if ch.isalnum() else " " for ch in str(text or "").lower()).split()
+    return [word for word in words if word not in FILLER_WORDS and word not in VAGUE_WORDS]
+
+def detect_vagueness(age, background, interest):
     """
-    Make an LLM request to generate 5–10 comprehension-check questions
-    based on the user's reason, desired outcome, and resources.
+    Rule-based check for profiles too vague to plan for, so they don't cost a model call.
+    Returns ("vague", question) when a follow-up question can be asked right away,
+    ("borderline", None) when the fast model should decide, and ("clear", None) otherwise.
     """
-    # Create a prompt that instructs the model to write 5–10 questions.
-    prompt = f"""
-    You are a helpful AI tutor. The user is learning because:
-    {reason}
+    with model_router.timed(model_router.tiers["local"]):
+        try:
+            age_ok = 3 <= float(age) <= 120
+        except (TypeError, ValueError):
+            age_ok = False
+        interest_words = _informative_words(interest)
+        background_words = _informative_words(background)
 
-    Their desired outcome is:
-    {outcome}
+        if not interest_words:
+            return "vague", "What would you like to learn about? Name a subject, skill, or goal you have in mind."
+        if not background_words:
+            return "vague", "What is your educational background? For example, your grade, degree, or current job."
+        if not age_ok:
+            return "vague", "How old are you? This helps us pitch the plan at the right level."
+        if len(set(interest_words)) <= 2 and set(interest_words) <= GENERIC_INTERESTS:
+            return "borderline", None
+        return "clear", None
 
-    They have these resources:
-    {resources}
+@metrics.PROMPT_BUILD_SECONDS.time(task="clarify")
+def build_clarify_messages(age, background, interest):
+    """ Vagueness check for a borderline profile (see prompts.py); the profile comes last. """
+    return clarify_messages(age, background, interest)
 
-    Please generate 5 to 10 short questions that the user could answer
-    after studying these materials, to check their overal understanding.
-    Return only the list of questions.
+def parse_clarification(raw_response) -> Union[str, None]:
+    response_json = decode_json(raw_response, task="clarify")
+    if "follow_up_question" in response_json:
+        return ClarificationRequest(**response_json).follow_up_question
+    return None
 
+def clarify_profile(client, age, background, interest, feedback=None) -> Union[str, None]:
+    """
+    A follow-up question for profiles too vague to plan for, decided locally or by the
+    fast model, or None to go ahead with the full plan. If the fast model's answer is
+    unusable the plan request goes ahead; the plan prompt can still ask for clarification.
     """
+    verdict, question = _vagueness_verdict(age, background, interest, feedback)
+    if verdict != "borderline":
+        return question
+    try:
+        return _complete_validated(client, "clarify", build_clarify_messages(age, background, interest),
+                                   parse_clarification, retry=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Clarification check failed ({e}), continuing with the full plan")
+        return None
 
-    # Make your LLM (OpenAI, SambaNova, etc.) request here:
-    # (Change this to your actual function call and model parameters.)
-    completion = client.chat.completions.create(
-        model="Meta-Llama-3.1-405B-Instruct",
-        messages=[
-            {"role": "system", "content": "You are a question setter whoes objective is to test learners overall understanding of the topic, not specifics "},
-            {"role": "user", "content": prompt},
-        ],
+async def aclarify_profile(async_client, age, background, interest, feedback=None) -> Union[str, None]:
+    """ Async version of `clarify_profile`. """
+    verdict, question = _vagueness_verdict(age, background, interest, feedback)
+    if verdict != "borderline":
+        return question
+    try:
+        return await _acomplete_validated(async_client, "clarify", build_clarify_messages(age, background, interest),
+                                          parse_clarification, retry=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Clarification check failed ({e}), continuing with the full plan")
+        return None
 
-    )
+def _vagueness_verdict(age, background, interest, feedback):
+    # Feedback on an existing plan is never sent back for clarification
+    if feedback or not config.VAGUENESS_CHECK:
+        return "clear", None
+    return detect_vagueness(age, background, interest)
 
-    # Get the raw text from the response
-    response = completion.choices[0].message.content.strip()
-    print("🔍 Grasp Check Questions:", response)  # Debug print
+# === Grasp Check ===
+@metrics.PROMPT_BUILD_SECONDS.time(task="grasp_check")
+def build_grasp_check_messages(reason: str, outcome: str, resources: List[str], variant=None):
+    """ Grasp-check request asking for 5–10 questions, in the configured prompt variant. """
+    return grasp_check_messages(reason, outcome, resources, variant or config.PROMPT_VARIANT)
+
+def parse_grasp_check(response: str) -> List[str]:
+    log_payload("🔍 Grasp Check Questions:", response)
 
     try:
-        # If the LLM returned JSON: parse it
-        # e.g. questions_list = json.loads(response_text)
-        # Or if it returned newline-separated text:
-        questions_list = [line.strip("- ").strip() for line in response.splitlines() if line.strip()]
+        # JSON {"questions": [...]} as asked, or newline-separated text from models that ignore it
+        questions_list = extract_questions(response, task="grasp_check")
 
         # Validate with Pydantic
         validated = GraspCheck(questions=questions_list)
         return validated.questions
 
     except (ValidationError, json.JSONDecodeError) as e:
-        print("Error parsing or validating questions:", e)
+        logger.warning(f"Error parsing or validating questions: {e}")
+        return []
+
+def build_grasp_check(reason: str, outcome: str, resources: List[str]) -> List[str]:
+    """
+    Make an LLM request to generate 5–10 comprehension-check questions
+    based on the user's reason, desired outcome, and resources.
+    Returns [] if no usable questions could be had, e.g. under rate limiting.
+    """
+    messages = build_grasp_check_messages(reason, outcome, resources)
+    try:
+        return _complete_validated(get_client(), "grasp_check", messages, _require_grasp_check)
+    except Exception as e:
+        logger.warning(f"⚠️ Grasp check failed: {e}")
+        return []
+
+async def abuild_grasp_check(reason: str, outcome: str, resources: List[str],
+                             priority: int = INTERACTIVE) -> List[str]:
+    """ Async version of `build_grasp_check`; prefetches run at BACKGROUND priority. """
+    messages = build_grasp_check_messages(reason, outcome, resources)
+    try:
+        return await _acomplete_validated(get_async_client(), "grasp_check", messages, _require_grasp_check, priority)
+    except Exception as e:
+        logger.warning(f"⚠️ Grasp check failed: {e}")
         return []
 
+def _require_grasp_check(response: str) -> List[str]:
+    questions = parse_grasp_check(response)
+    if not questions:
+        raise ValueError("No grasp-check questions in model output")
+    return questions
+
+# Background grasp-check generation, started as soon as a plan is complete
+grasp_prefetcher = GraspCheckPrefetcher(
+    lambda reason, outcome, resources: abuild_grasp_check(reason, outcome, resources, BACKGROUND),
+    max_concurrent=config.PREFETCH_MAX_CONCURRENT,
+    max_pending=config.PREFETCH_MAX_PENDING,
+    ttl=config.PREFETCH_TTL_SECONDS,
+) if config.PREFETCH_ENABLED else None
+
+# === Topic Expansion ===
+def parse_topic_expansion(raw_response) -> TopicExpansion:
+    log_payload("🔍 Topic expansion:", raw_response)
+    return TopicExpansion(**clamp_expansion(decode_json(raw_response, task="expansion")))
+
+def expand_topic(topic: str, age) -> Union[dict, None]:
+    """
+    A deeper breakdown of one plan topic, {"breakdown": {subtopic: [...]}, "resources": [...]},
+    from `expansion_cache` when a learner at the same level expanded it before.
+    None if the model call fails.
+    """
+    level = learner_level(age)
+    key = expansion_key(topic, level)
+    cached = _cached_expansion(key)
+    if cached is not None:
+        return cached
+    try:
+        expansion = _complete_validated(get_client(), "expansion", build_expansion_messages(topic, level),
+                                        parse_topic_expansion)
+    except Exception as e:
+        logger.warning(f"⚠️ Topic expansion failed: {e}")
+        return None
+    return _store_expansion(key, expansion)
+
+# Expansions in flight by expansion_key: sessions expanding the same topic at once share one call
+_expanding = {}
+
+async def aexpand_topic(topic: str, age) -> Union[dict, None]:
+    """ Async version of `expand_topic`; concurrent requests for one topic await the same call. """
+    level = learner_level(age)
+    key = expansion_key(topic, level)
+    cached = await asyncio.to_thread(_cached_expansion, key)
+    if cached is not None:
+        return cached
+
+    task = _expanding.get(key)
+    if task is None:
+        task = _expanding[key] = asyncio.get_running_loop().create_task(_aexpand(key, topic, level))
+        task.add_done_callback(lambda _: _expanding.pop(key, None))
+    # Shielded, so one session going away doesn't cancel the call for the others
+    return await asyncio.shield(task)
+
+async def _aexpand(key, topic, level):
+    try:
+        expansion = await _acomplete_validated(get_async_client(), "expansion", build_expansion_messages(topic, level),
+                                               parse_topic_expansion)
+    except Exception as e:
+        logger.warning(f"⚠️ Topic expansion failed: {e}")
+        return None
+    return await asyncio.to_thread(_store_expansion, key, expansion)
+
+def _cached_expansion(key):
+    cached = expansion_cache.get(key) if expansion_cache is not None else None
+    if cached is None:
+        return None
+    try:
+        return TopicExpansion(**cached).model_dump()
+    except ValidationError:
+        return None
+
+def _store_expansion(key, expansion: TopicExpansion):
+    value = expansion.model_dump()
+    if expansion_cache is not None:
+        expansion_cache.set(key, value)
+    return value
+
+# === Metrics Export ===
+def _collect_stats():
+    """ Stats kept by the router, decoder, scheduler, caches and prefetcher, for the /metrics endpoint. """
+    tiers = model_router.stats()
+    yield ("learnflow_model_calls_total", "counter", "Model calls per tier",
+           [({"tier": tier, "model": stats["model"]}, stats["calls"]) for tier, stats in tiers.items()])
+    yield ("learnflow_model_fallbacks_total", "counter", "Fallbacks from a tier to the large model",
+           [({"tier": tier, "model": stats["model"]}, stats["fallbacks"]) for tier, stats in tiers.items()])
+    yield ("learnflow_decode_events_total", "counter", "Model replies, local JSON repairs, failures and retries",
+           [({"task": task, "event": event}, stats[event])
+            for task, stats in decode_stats.stats().items() for event in decode_stats.FIELDS])
+    scheduler_stats = llm_scheduler.stats()
+    yield ("learnflow_scheduler_waiting", "gauge", "Model calls waiting for the rate limiter",
+           [({}, scheduler_stats["waiting"])])
+    yield ("learnflow_scheduler_rate_scale", "gauge", "Share of the configured rate in use after 429s",
+           [({}, scheduler_stats["rate_scale"])])
+    caches = {"plan": plan_cache, "expansion": expansion_cache, "diagram": diagram_cache}
+    cache_stats = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    if cache_stats:
+        yield ("learnflow_cache_lookups_total", "counter", "Plan, topic expansion and diagram cache lookups",
+               [({"cache": name, "result": result}, stats[field])
+                for name, stats in cache_stats.items()
+                for result, field in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses"))])
+        yield ("learnflow_cache_memory_entries", "gauge", "Entries held in each cache's in-memory tier",
+               [({"cache": name}, stats["memory_entries"]) for name, stats in cache_stats.items()])
+    if plan_index is not None:
+        index_stats = plan_index.stats()
+        yield ("learnflow_similarity_lookups_total", "counter", "Similar-profile lookups",
+               [({"result": "hit"}, index_stats["hits"]), ({"result": "miss"}, index_stats["misses"])])
+        yield ("learnflow_similarity_entries", "gauge", "Profiles in the similarity index",
+               [({}, index_stats["entries"])])
+    if plan_store is not None:
+        store_stats = plan_store.stats()
+        yield ("learnflow_store_writes_total", "counter", "Plan store records committed, and the batches they went in",
+               [({"unit": "record"}, store_stats["writes"]), ({"unit": "batch"}, store_stats["batches"])])
+        yield ("learnflow_store_reads_total", "counter", "Stored plans opened from a link",
+               [({"result": "hit"}, store_stats["reads"]), ({"result": "miss"}, store_stats["read_misses"])])
+        yield ("learnflow_store_pending", "gauge", "Plan store writes queued for the writer thread",
+               [({}, store_stats["pending"])])
+        yield ("learnflow_store_plans", "gauge", "Plans in the plan store", [({}, store_stats["plans"])])
+    if grasp_prefetcher is not None:
+        prefetch_stats = grasp_prefetcher.stats()
+        yield ("learnflow_prefetch_total", "counter", "Grasp-check prefetches by what became of them",
+               [({"event": event}, prefetch_stats[event]) for event in ("started", "used", "skipped", "discarded")])
+        yield ("learnflow_prefetch_pending", "gauge", "Grasp-check prefetches held",
+               [({}, prefetch_stats["pending"])])
+
+metrics.registry.add_collector(_collect_stats)
+
 # === Studyflow Preparation ===
-def convert_studyflow_to_mermaid_text(studyflow):
+# Rendered SVG diagrams by content: unchanged plans (cache hits, revisions that keep the
+# workflow, reloads) are laid out once. Mermaid and DOT are plain text, cheaper to
+# build again than to look up, so only SVG is kept
+MEMOIZED_DIAGRAM_FORMATS = ("svg",)
+diagram_cache = ResponseCache(
+    path=None,
+    max_entries=config.DIAGRAM_CACHE_ENTRIES,
+    ttl=float("inf"),
+) if config.DIAGRAM_CACHE_ENTRIES > 0 else None
+
+@metrics.DIAGRAM_RENDER_SECONDS.time()
+def get_studyflow_diagram(studyflow, expansions=None, fmt=None, memoize=True):
   """
-  Convert a structured learning workflow dictionary to step titles and details for 
-  Mermaid diagram generation.
+  The study workflow as a diagram for the UI, in `fmt` (default config.DIAGRAM_FORMAT):
+  a Mermaid or Graphviz DOT code block, or a pre-laid-out SVG image (see diagram.py).
+  `expansions` maps topics to their `expand_topic` breakdown, drawn as extra
+  nodes hanging off that topic. Pass `memoize=False` for one-off drawings, like
+  partial stream snapshots, so they don't push finished plans out of `diagram_cache`.
   """
-  step_titles = []
-  step_details = []
+  fmt = fmt or config.DIAGRAM_FORMAT
+  memoized = memoize and diagram_cache is not None and fmt in MEMOIZED_DIAGRAM_FORMATS
+  key = diagram_key(studyflow, expansions, fmt) if memoized else None
+  diagram = diagram_cache.get(key) if key else None
+  if diagram is None:
+      diagram = render_diagram(studyflow, expansions, fmt)
+      if key:
+          diagram_cache.set(key, diagram)
+  return diagram
+
+# === Warm-Up ===
+SAMPLE_PLAN_RESPONSE = json.dumps({
+    "study_workflow": sample_studyflow,
+    "reason": sample_reason,
+    "expected_outcome": sample_outcome,
+    "resources": sample_resource,
+})
 
-  for topic, subtopics in studyflow.items():
-      step_titles.append(topic)
-      step_details.append(", ".join(subtopics))
+async def _prime_connections(connections):
+    """ Open `connections` keep-alive connections to the backend (TCP + TLS), so early requests skip the handshake. """
+    async_client = get_async_client()
 
-  step_titles = ", ".join(step_titles)
-  step_details = " | ".join(step_details)
+    async def ping():
+        try:
+            await async_client.models.list()
+        except Exception as e:  # any answer at all leaves the connection open
+            logger.info(f"Warm-up request failed: {e}")
 
-  # return ", ".join(step_titles), " | ".join(step_details)
-  print(step_titles, step_details)
-  return step_titles, step_details
+    await asyncio.gather(*(ping() for _ in range(connections)))
 
+async def awarmup(connections: Union[int, None] = None, timeout: Union[float, None] = None) -> Dict[str, float]:
+    """
+    Get a replica ready to serve before it takes traffic: build both clients, open
+    keep-alive connections on the calling event loop (run this on the loop that
+    serves requests, since pooled connections belong to it), load the caches and the
+    similarity index, and run the prompt, parse and diagram code once.
+    Returns the seconds each step took; a step that fails is logged and skipped.
+    """
+    connections = config.WARMUP_CONNECTIONS if connections is None else connections
+    timeout = config.WARMUP_TIMEOUT if timeout is None else timeout
+    timings = {}
 
-def get_studyflow_diagram(studyflow):
-  """
-  Expected inputs:
-  - step_titles: A comma-separated string (e.g., "Learn Python, Learn NumPy, Learn Pandas")
-  - step_details: A string with each step's details separated by |,
-    and details for a specific step separated by commas.
-    (e.g., "Variables, Loops, Functions | Arrays, Vector Math | DataFrames, Analysis")
-  """
-  step_titles, step_details = convert_studyflow_to_mermaid_text(studyflow)
-  # Process input strings into lists.
-  titles = [title.strip() for title in step_titles.split(",")]
-  details_list = [details.strip() for details in step_details.split("|")]
-  
-  # Define a list of colors to be used for the nodes.
-  # You can add as many colors as you like.
-  colors = ["#f9c74f", "#90be6d", "#f9844a", "#577590", "#277da1", "#ff595e", "#ffd166"]
-  
-  mermaid_code = "graph TD;\n"
-  previous_step = None
-
-  for i, title in enumerate(titles):
-      if i >= len(details_list):
-          break
-      
-      # Split the details for the current step and strip each one.
-      details = [detail.strip() for detail in details_list[i].split(",")]
-      # Create bullet points using HTML line breaks.
-      bullet_points = "<br/>".join([f"• {detail}" for detail in details])
-      # Combine title and bullet points in one node.
-      node_text = f"<b><u>{title}</u></b><br/>{bullet_points}"
-      main_node = f"A{i}[\"{node_text}\"]"
-      mermaid_code += f"    {main_node}\n"
-      
-      # Apply a custom color for this node.
-      # Using modulo (%) ensures that if there are more nodes than colors,
-      # the list will cycle through.
-      color = colors[i % len(colors)]
-      mermaid_code += f"    style A{i} fill:{color},stroke:#333,stroke-width:1.5px;\n"
-      
-      # Link this main node with the previous one to create a sequential flow.
-      if previous_step:
-          mermaid_code += f"    {previous_step} --> A{i}\n"
-      previous_step = f"A{i}"
-  
-  return f"```mermaid\n{mermaid_code}\n```"
\ No newline at end of file
+    async def step(name, work):
+        started = time.perf_counter()
+        try:
+            result = work()
+            if asyncio.iscoroutine(result):
+                await asyncio.wait_for(result, timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ Warm-up step {name} failed: {e}")
+        timings[name] = time.perf_counter() - started
+
+    await step("clients", lambda: (get_client(), get_async_client()))
+    if connections > 0:
+        await step("connections", lambda: _prime_connections(connections))
+    await step("caches", lambda: [cache.preload() for cache in (plan_cache, expansion_cache) if cache is not None])
+    if plan_index is not None:
+        await step("similarity_index", lambda: asyncio.to_thread(plan_index.preload))
+    await step("code_paths", lambda: (
+        build_plan_messages(18, "warm-up", "warm-up"),
+        parse_learning_suggestion(SAMPLE_PLAN_RESPONSE),
+        get_studyflow_diagram(sample_studyflow),
+    ))
+    logger.info("Warm-up done: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    return timings